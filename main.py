@@ -1,37 +1,41 @@
 import asyncio
-import base64
 import json
 import os
-import shutil
+import signal
 import time
 import traceback
-import gc
-import glob
-import re
+from concurrent.futures import ThreadPoolExecutor
 
 from src.services.db_service.census_db_service import (
-    fetch_pending_census_uploads,
+    claim_next_census_upload,
+    heartbeat_census_upload,
     update_upload_status,
-    insert_generated_census,
-    insert_failed_census,
-    update_census_portal_status,
-    save_base64_to_file
+    CensusResultBatch,
+    save_base64_to_file,
+    save_census_upload_to_file
 )
 from src.utils.load_yaml import (
-    ATTACHMENTS_SAVE_DIR,
-    ADNIC_GENERATED_CENSUS_DIR,
-    DAMAN_GENERATED_CENSUS_DIR,
-    GIG_GENERATED_CENSUS_DIR,
-    IQ2HEALTH_GENERATED_CENSUS_DIR,
-    SUKOON_GENERATED_CENSUS_DIR,
-    NLG_GENERATED_CENSUS_DIR,
-    AURA_GENERATED_CENSUS_DIR,
-    MAXHEALTH_GENERATED_CENSUS_DIR,
-    DUBAIINSURANCE_GENERATED_CENSUS_DIR,
-    ISON_GENERATED_CENSUS_DIR,
-    EMAIL_GENERATED_CENSUS_DIR
+    CENSUS_PARALLEL_PORTALS,
+    CENSUS_MAX_PORTAL_WORKERS,
+    CENSUS_MAX_CONCURRENT_REQUESTS,
+    CENSUS_WORKER_ID,
+    CENSUS_KEEP_WORKSPACES,
+    CENSUS_MAPPER_TIMEOUT_SECONDS,
+    CENSUS_LEASE_SECONDS,
+    CENSUS_HEARTBEAT_SECONDS,
+    CENSUS_POLL_MIN_SECONDS,
+    CENSUS_POLL_MAX_SECONDS,
+    CENSUS_WAKEUP_HOST,
+    CENSUS_WAKEUP_PORT
 )
 from src.utils.clear_folder import clear_files
+from src.utils.portal_resolver import EXACT, FUZZY, UNMATCHED, PortalResolver, clean_company_name
+from src.utils.request_workspace import WORKSPACE_REAPER, RequestWorkspace
+from src.utils.lease_heartbeat import LeaseHeartbeat
+from src.utils.census_metrics import CENSUS_METRICS, RequestTimings, record_request_timings
+from src.utils.job_wakeup import AdaptiveBackoff, JobWakeup
+from src.services.excel_service.census_frame import load_census_frame
+from src.services.excel_service.portal_executor import MapperJob, run_mapper_jobs, shutdown_portal_pool
 from src.utils.logger import logger
 
 # Import Census Mapping Functions
@@ -47,18 +51,18 @@ from src.services.excel_service.dubai_census_map import dubai_map_census_data
 from src.services.excel_service.ison_census_map import ison_map_census_data
 from src.services.excel_service.emails_cencus_map import email_map_census_data
 
-# Mapping of Portal Names to (Function, OutputDir, OutputFilename)
+# Mapping of Portal Names to (Function, OutputFilename)
 CENSUS_MAPPING = {
-    "ADNIC": (adnic_map_census_data, ADNIC_GENERATED_CENSUS_DIR, "MemberUpload.xlsx"),
-    "DAMAN": (daman_map_census_data, DAMAN_GENERATED_CENSUS_DIR, "SME_Member_Details_Template.xlsx"),
-    "GIG": (gig_map_census_data, GIG_GENERATED_CENSUS_DIR, "gig_map.xlsx"),
-    "IQ": (iq_map_census_data, IQ2HEALTH_GENERATED_CENSUS_DIR, "Census_Template_AE.xlsm"),
-    "SUKOON": (sukoon_map_census_data, SUKOON_GENERATED_CENSUS_DIR, "MemberCensusData.xlsx"),
-    "NLG": (nlg_map_census_data, NLG_GENERATED_CENSUS_DIR, "MemberUpload.xlsx"),
-    "AURA": (aura_map_census_data, AURA_GENERATED_CENSUS_DIR, "aura_map.xlsx"),
-    "MAXHEALTH": (maxHealth_map_census_data, MAXHEALTH_GENERATED_CENSUS_DIR, "MaxHealth.xlsx"),
-    "DUBAIINSURANCE": (dubai_map_census_data, DUBAIINSURANCE_GENERATED_CENSUS_DIR, "Dubaiinsurance_map.xlsx"),
-    "ISON": (ison_map_census_data, ISON_GENERATED_CENSUS_DIR, "ison_map.xlsx"),
+    "ADNIC": (adnic_map_census_data, "MemberUpload.xlsx"),
+    "DAMAN": (daman_map_census_data, "SME_Member_Details_Template.xlsx"),
+    "GIG": (gig_map_census_data, "gig_map.xlsx"),
+    "IQ": (iq_map_census_data, "Census_Template_AE.xlsm"),
+    "SUKOON": (sukoon_map_census_data, "MemberCensusData.xlsx"),
+    "NLG": (nlg_map_census_data, "MemberUpload.xlsx"),
+    "AURA": (aura_map_census_data, "aura_map.xlsx"),
+    "MAXHEALTH": (maxHealth_map_census_data, "MaxHealth.xlsx"),
+    "DUBAIINSURANCE": (dubai_map_census_data, "Dubaiinsurance_map.xlsx"),
+    "ISON": (ison_map_census_data, "ison_map.xlsx"),
 }
 
 # Email Portals Mapping - These portals don't generate census files
@@ -184,51 +188,43 @@ COMPANY_NAME_MAPPING = {
     "UNION_INSURANCE": "UNION_INSURANCE",
 }
 
-def find_generated_file(output_dir, expected_filename, portal_name, logger):
-    """
-    Find the generated census file, handling both exact matches and timestamped versions.
-    
-    For cases where file locking prevented saving with the exact filename,
-    looks for timestamped versions like: SME_Member_Details_Template_20260209_161234.xlsx
-    
-    Args:
-        output_dir: Directory where the file should be
-        expected_filename: The expected filename (e.g., "SME_Member_Details_Template.xlsx")
-        portal_name: Name of the portal for logging
-        logger: Logger instance
-        
-    Returns:
-        Tuple of (found_file_path, actual_filename) or (None, None) if not found
-    """
-    # First try the exact filename
-    exact_path = os.path.join(output_dir, expected_filename)
-    if os.path.exists(exact_path):
-        logger.info(f"Found exact match for {portal_name}: {expected_filename}")
-        return exact_path, expected_filename
-    
-    # If exact file not found, look for timestamped versions
-    # Pattern: filename_YYYYMMDD_HHMMSS.xlsx
-    base_name = os.path.splitext(expected_filename)[0]  # Remove .xlsx extension
-    pattern = f"{base_name}_[0-9]{{8}}_[0-9]{{6}}.xlsx"
-    
-    if os.path.exists(output_dir):
-        files_in_dir = os.listdir(output_dir)
-        timestamped_files = []
-        
-        for file in files_in_dir:
-            if re.match(pattern.replace("[", "\\[").replace("]", "\\]"), file):
-                timestamped_files.append(file)
-        
-        if timestamped_files:
-            # Sort and get the most recent (last alphabetically due to timestamp format)
-            most_recent = sorted(timestamped_files)[-1]
-            timestamped_path = os.path.join(output_dir, most_recent)
-            logger.warning(f"Expected file '{expected_filename}' not found for {portal_name}, using timestamped version: '{most_recent}'")
-            return timestamped_path, most_recent
-    
-    # No file found at all
-    return None, None
+# Substrings matched against the cleaned, uppercased company name; the first listed pattern found wins
+FUZZY_PORTAL_PATTERNS = {
+    "ADNIC": "ADNIC",
+    "DAMAN": "DAMAN",
+    "GIG": "GIG",
+    "SUKOON": "SUKOON",
+    "MAXHEALTH": "MAXHEALTH",
+    "MAX HEALTH": "MAXHEALTH",
+    "ISON": "ISON",
+    "FIDELITY": "FIDELITY",
+    "TAKAFUL": "TAKAFUL",
+    "ORIENT": "ORIENT",
+    "AURA": "AURA",
+    "QATAR": "QATAR",
+    "RAK": "RAK",
+    "MEDGULF": "MEDGULF",
+    "NGI": "NGI",
+    "NLGIC": "NLG",
+    "NLG": "NLG",
+    "ALLIANZ": "ALLIANZ",
+    "BUPA": "BUPA",
+    "CIGNA": "CIGNA",
+    "ALSAGR": "ALSAGR",
+    "AL SAGR": "ALSAGR",
+    "SAGE": "ALSAGR",
+    "ITTIHAD": "ALITTHIHAD",
+    "DUBAI": "DUBAIINSURANCE",
+    "WATANIA": "WATANIATAKAFUL",
+    "APRIL": "APRIL_INTERNATIONAL",
+    "HANSE": "HANSE_MERKUR",
+    "MERKUR": "HANSE_MERKUR",
+    "SALAMA": "SALAMA",
+    "UNION": "UNION_INSURANCE",
+}
 
+# Built once: exact and case-insensitive hash lookups, one-pass fuzzy matching, LRU of resolved names
+PORTAL_RESOLVER = PortalResolver(COMPANY_NAME_MAPPING, FUZZY_PORTAL_PATTERNS)
 
 def normalize_portal_name(company_name):
     """
@@ -244,71 +240,25 @@ def normalize_portal_name(company_name):
         logger.warning("Empty or None company name provided")
         return None
         
-    # Direct lookup first
-    if company_name in COMPANY_NAME_MAPPING:
-        normalized = COMPANY_NAME_MAPPING[company_name]
-        logger.debug(f"Direct mapping found: '{company_name}' -> '{normalized}'")
-        return normalized
-    
-    # Case-insensitive lookup
-    company_upper = company_name.upper().strip()
-    for key, value in COMPANY_NAME_MAPPING.items():
-        if key.upper() == company_upper:
-            logger.debug(f"Case-insensitive mapping found: '{company_name}' -> '{value}'")
-            return value
-    
-    # Fuzzy matching for common variations
-    company_clean = company_upper.replace("INSURANCE", "").replace("CO", "").replace("COMPANY", "").replace("PJSC", "").replace(".", "").strip()
-    
-    fuzzy_mappings = {
-        "ADNIC": "ADNIC",
-        "DAMAN": "DAMAN", 
-        "GIG": "GIG",
-        "SUKOON": "SUKOON",
-        "MAXHEALTH": "MAXHEALTH",
-        "MAX HEALTH": "MAXHEALTH",
-        "ISON": "ISON",
-        "FIDELITY": "FIDELITY", 
-        "TAKAFUL": "TAKAFUL",
-        "ORIENT": "ORIENT",
-        "AURA": "AURA",
-        "QATAR": "QATAR",
-        "RAK": "RAK",
-        "MEDGULF": "MEDGULF",
-        "NGI": "NGI",
-        "NLGIC": "NLG",
-        "NLG": "NLG",
-        "ALLIANZ": "ALLIANZ",
-        "BUPA": "BUPA",
-        "CIGNA": "CIGNA",
-        "ALSAGR": "ALSAGR",
-        "AL SAGR": "ALSAGR",
-        "SAGE": "ALSAGR",
-        "ITTIHAD": "ALITTHIHAD",
-        "DUBAI": "DUBAIINSURANCE",
-        "WATANIA": "WATANIATAKAFUL",
-        "APRIL": "APRIL_INTERNATIONAL",
-        "HANSE": "HANSE_MERKUR",
-        "MERKUR": "HANSE_MERKUR",
-        "SALAMA": "SALAMA",
-        "UNION": "UNION_INSURANCE",
-    }
-    
-    for pattern, portal in fuzzy_mappings.items():
-        if pattern in company_clean:
-            logger.debug(f"Fuzzy mapping found: '{company_name}' -> '{portal}' (matched on '{pattern}')")
-            return portal
-    
-    logger.warning(f"No mapping found for company name: '{company_name}' (cleaned: '{company_clean}')")
-    return None
+    match = PORTAL_RESOLVER.resolve(company_name)
+    if match.match_type == UNMATCHED:
+        logger.warning(f"No mapping found for company name: '{company_name}' (cleaned: '{clean_company_name(company_name.upper().strip())}')")
+    elif match.match_type == FUZZY:
+        logger.debug(f"Fuzzy mapping found: '{company_name}' -> '{match.portal}' (matched on '{match.pattern}')")
+    elif match.match_type == EXACT:
+        logger.debug(f"Direct mapping found: '{company_name}' -> '{match.portal}'")
+    else:
+        logger.debug(f"Case-insensitive mapping found: '{company_name}' -> '{match.portal}'")
+    return match.portal
 
-def get_mapper_for_portal(portal_name):
+def get_mapper_for_portal(portal_name, normalized_portal=None):
     """
-    Returns the mapper tuple for a given portal name.
+    Returns the (function, output filename) tuple for a given portal name.
     Handles standard mappings and email portal group.
+    Pass normalized_portal when the name has already been resolved.
     """
     # First normalize the portal name
-    normalized_portal = normalize_portal_name(portal_name)
+    normalized_portal = normalized_portal or normalize_portal_name(portal_name)
     if not normalized_portal:
         logger.warning(f"Portal name '{portal_name}' could not be normalized to a known portal")
         return None
@@ -321,7 +271,7 @@ def get_mapper_for_portal(portal_name):
     # Check email portals
     if normalized_portal in EMAIL_PORTALS:
         logger.info(f"Found email mapper for '{portal_name}' -> '{normalized_portal}'")
-        return (email_map_census_data, EMAIL_GENERATED_CENSUS_DIR, "Lifecare_Census Template.xlsx")
+        return (email_map_census_data, "Lifecare_Census Template.xlsx")
     
     # Check if it's a recognized company but mapper not implemented yet
     companies_without_mappers = [
@@ -336,283 +286,478 @@ def get_mapper_for_portal(portal_name):
     logger.error(f"No mapper implementation found for portal '{portal_name}' -> '{normalized_portal}'")
     return None
 
-async def run_census_loop():
-    logger.info("Starting Enhanced Census Processing Loop...")
-    logger.info(f"Available census mappers ({len(CENSUS_MAPPING)}): {list(CENSUS_MAPPING.keys())}")
-    logger.info(f"Available email portals ({len(EMAIL_PORTALS)}): {EMAIL_PORTALS}")
-    
-    # Log recognized companies without mappers
-    companies_without_mappers = ["ALITTHIHAD", "ALSAGR", "FIDELITY", "MEDGULF", "NGI", "ORIENT", "QATAR", "RAK", "TAKAFUL", "WATANIATAKAFUL"]
-    if companies_without_mappers:
-        logger.info(f"Recognized companies without mappers ({len(companies_without_mappers)}): {companies_without_mappers}")
-    
-    logger.info(f"Total supported company name variations: {len(COMPANY_NAME_MAPPING)}")
-    logger.info("Enhanced portal name mapping system activated - supports fuzzy matching and case-insensitive lookup")
-    logger.info("="*80)
+def process_census_request(req):
+    """
+    Process one Census_Excel_Uploads row end to end inside its own scratch workspace.
+
+    The caller is expected to have already claimed the row for CENSUS_WORKER_ID; the
+    claim's lease is renewed by a heartbeat until the request finishes. Requests
+    share no directories, so several can run at once in threads or separate processes.
+
+    Args:
+        req (dict): The Census_Excel_Uploads record
+
+    Stage timings are logged as one compact record when the request finishes and
+    added to the worker's metrics (served on /metrics and /metrics.json).
+
+    Returns:
+        str: Final status written for the request, or "Abandoned" when its lease was
+        lost to another worker and nothing was written
+    """
+    timings = RequestTimings(req['id'])
+    timings.queue_wait(req.get('created_at'))
+    final_status = "Failed"
+    try:
+        with timings.request.activate():
+            final_status = _process_census_request(req, timings)
+        return final_status
+    finally:
+        record_request_timings(timings, final_status)
+
+
+def _lease_lost(heartbeat, upload_id, next_step):
+    """True, with a log line, once another worker may have taken over the request."""
+    if heartbeat.lost:
+        logger.warning(f"Lease on request {upload_id} was lost; abandoning it before {next_step}")
+    return heartbeat.lost
+
+
+def _process_census_request(req, timings):
+    """Body of process_census_request; stages are timed into `timings`."""
+    # Processing tracking variables
+    requested_portals = []
+    completed_portals = []
+    failed_portals = []
+    processing_errors = []
+    
+    upload_id = req['id']
+    workspace = None
+    # Portal results are queued and written with the final status in one transaction
+    results = CensusResultBatch(upload_id, CENSUS_WORKER_ID)
+    heartbeat = LeaseHeartbeat(
+        lambda: heartbeat_census_upload(upload_id, CENSUS_WORKER_ID, CENSUS_LEASE_SECONDS),
+        CENSUS_HEARTBEAT_SECONDS,
+        name=f"census-heartbeat-{upload_id}"
+    ).start()
+    logger.info(f"="*60)
+    logger.info(f"Processing Request ID: {upload_id}")
+    logger.info(f"="*60)
     
-    while True:
-        # Processing tracking variables
-        requested_portals = []
-        completed_portals = []
-        failed_portals = []
-        processing_errors = []
+    try:
+        # Created inside the try so a disk error still releases the claim with a Failed status
+        workspace = RequestWorkspace(upload_id)
+        logger.info(f"Workspace: {workspace.path}")
+        
+        # 4. Save Input File; mappers receive it parsed, so no per-mapper copies or directory scans are needed
+        input_path = os.path.join(workspace.input_dir, "Census_Input.xlsx")
+        input_error = None
+        with timings.time("decode"):
+            if 'census_file' in req:
+                if not save_base64_to_file(req['census_file'], input_path):
+                    input_error = "Census file could not be decoded"
+            elif not save_census_upload_to_file(upload_id, input_path):
+                # Claimed rows carry no census_file; it is streamed from the DB in chunks
+                input_error = "Census file could not be read from the database"
+        
+        # 5. Parse Portals and Other Data
+        portals_json = req['portals']
+        other_data_json = req.get('other_data', '{}')
         
         try:
-            # 1. Clear directories
-            await clear_files()
-            
-            # 2. Fetch pending request
-            req = fetch_pending_census_uploads()
-            if not req:
-                time.sleep(10)
-                continue
+            if isinstance(portals_json, str):
+                portals = json.loads(portals_json)
+            else:
+                portals = portals_json 
                 
-            upload_id = req['id']
-            logger.info(f"="*60)
-            logger.info(f"Processing Request ID: {upload_id}")
-            logger.info(f"="*60)
-            
-            # 3. Update status to Processing
-            update_upload_status(upload_id, "Processing")
-            
-            # 4. Save Input File (Multiple copies to satisfy different mappers)
-            # Standard input required by most mappers
-            input_path = os.path.join(ATTACHMENTS_SAVE_DIR, "Census_Input.xlsx")
-            save_base64_to_file(req['census_file'], input_path)
+            requested_portals = portals.copy() if portals else []
+            logger.info(f"Requested Portals ({len(requested_portals)}): {requested_portals}")
             
-            # Copy for mappers expecting "Medical_" prefix (DAMAN)
-            medical_copy_path = os.path.join(ATTACHMENTS_SAVE_DIR, "Medical_Census_Input.xlsx")
-            shutil.copy(input_path, medical_copy_path)
-            
-            # Copy for Email mapper expecting specific name
-            email_copy_path = os.path.join(ATTACHMENTS_SAVE_DIR, "CensusData-TEMPLATE_Common with Nationality.xlsx")
-            shutil.copy(input_path, email_copy_path)
+            # Parse other_data JSON
+            try:
+                if isinstance(other_data_json, str):
+                    other_data = json.loads(other_data_json) if other_data_json else {}
+                else:
+                    other_data = other_data_json if other_data_json else {}
+                logger.info(f"Other Data: {other_data}")
+            except Exception as parse_error:
+                logger.warning(f"Failed to parse other_data JSON: {parse_error}, using empty dict")
+                other_data = {}
             
-            # 5. Parse Portals and Other Data
-            portals_json = req['portals']
-            other_data_json = req.get('other_data', '{}')
+        except Exception as e:
+            error_msg = f"Failed to parse portals JSON: {e}"
+            logger.error(error_msg)
+            processing_errors.append(error_msg)
+            results.flush("Failed")
+            return "Failed"
+        
+        if input_error:
+            logger.error(f"{input_error} (Upload ID: {upload_id})")
+            for portal in requested_portals:
+                results.add_failed(portal, input_error)
+            results.flush("Failed")
+            return "Failed"
+        
+        # Parse the census workbook once; every mapper works from this shared frame
+        try:
+            with timings.time("parse"):
+                census_frame = load_census_frame(input_path)
+        except Exception as e:
+            error_msg = f"Failed to parse census input: {e}"
+            logger.error(error_msg)
+            logger.error(f"Full traceback: {traceback.format_exc()}")
+            for portal in requested_portals:
+                results.add_failed(portal, f"Census input could not be parsed: {str(e)}")
+            results.flush("Failed")
+            return "Failed"
+        
+        # 6. Resolve portals to mappers with detailed tracking
+        mapper_jobs = []  # Unique mappers to run for this request
+        job_by_func = {}  # Track mappers to avoid re-running for same group (e.g. Email)
+        portal_jobs = []  # (portal, job) pairs awaiting mapper output
+        
+        for portal in portals:
+            logger.info(f"\n{'-'*50}")
+            logger.info(f"Processing portal: '{portal}'")
             
             try:
-                if isinstance(portals_json, str):
-                    portals = json.loads(portals_json)
+                # First try to normalize the portal name
+                normalized_portal = normalize_portal_name(portal)
+                if normalized_portal:
+                    logger.info(f"Portal mapped: '{portal}' -> '{normalized_portal}'")
                 else:
-                    portals = portals_json 
-                    
-                requested_portals = portals.copy() if portals else []
-                logger.info(f"Requested Portals ({len(requested_portals)}): {requested_portals}")
+                    error_msg = f"Portal '{portal}' could not be mapped to any known portal"
+                    logger.error(error_msg)
+                    failed_portals.append({"portal": portal, "reason": "Portal name not recognized"})
+                    processing_errors.append(error_msg)
+                    # Log failed portal to database
+                    results.add_failed(portal, "Portal name not recognized - no mapping available")
+                    continue
                 
-                # Parse other_data JSON
-                try:
-                    if isinstance(other_data_json, str):
-                        other_data = json.loads(other_data_json) if other_data_json else {}
+                # Get mapper for the normalized portal
+                mapper_info = get_mapper_for_portal(portal, normalized_portal)
+                if not mapper_info:
+                    error_msg = f"No mapper found for portal: '{portal}' (normalized: '{normalized_portal}')"
+                    logger.warning(error_msg)
+                    failed_portals.append({"portal": portal, "reason": "No mapper available"})
+                    processing_errors.append(error_msg)
+                    # Log failed portal to database with specific reason
+                    companies_without_mappers = ["ALITTHIHAD", "ALSAGR", "FIDELITY", "MEDGULF", "NGI", "ORIENT", "QATAR", "RAK", "TAKAFUL", "WATANIATAKAFUL"]
+                    if normalized_portal in companies_without_mappers:
+                        results.add_failed(portal, f"Mapper not yet implemented for {normalized_portal} - development in progress")
                     else:
-                        other_data = other_data_json if other_data_json else {}
-                    logger.info(f"Other Data: {other_data}")
-                except Exception as parse_error:
-                    logger.warning(f"Failed to parse other_data JSON: {parse_error}, using empty dict")
-                    other_data = {}
+                        results.add_failed(portal, f"No mapper implementation available for portal {normalized_portal}")
+                    continue
+                
+                func, filename = mapper_info
+                # Mappers return their output in memory; a copy lands in the workspace only when it is kept for debugging
+                output_dir = workspace.output_dir(normalized_portal) if CENSUS_KEEP_WORKSPACES else None
                 
+                # Check if this is an email portal (no census generation)
+                if normalized_portal in EMAIL_PORTALS:
+                    logger.info(f"Portal '{portal}' is an email portal - no census generation required")
+                    completed_portals.append(portal)  # Mark as completed since email portals don't generate files
+                    continue
+                
+                # Queue mapper only if not already queued (important for grouped email portals)
+                if func not in job_by_func:
+                    job_by_func[func] = MapperJob(portal, normalized_portal, func, output_dir, filename)
+                    mapper_jobs.append(job_by_func[func])
+                else:
+                    logger.info(f"Mapper function already queued for '{portal}' (shared mapper)")
+                portal_jobs.append((portal, job_by_func[func]))
+                    
             except Exception as e:
-                error_msg = f"Failed to parse portals JSON: {e}"
+                error_msg = f"Unexpected error processing {portal}: {str(e)}"
                 logger.error(error_msg)
+                logger.error(f"Full traceback for {portal}: {traceback.format_exc()}")
+                failed_portals.append({"portal": portal, "reason": f"Unexpected error: {str(e)}"})
                 processing_errors.append(error_msg)
-                update_upload_status(upload_id, "Failed")
-                continue
-            
-            # 6. Execute Mappers with detailed tracking
-            processed_mappers = set()  # Track executed mappers to avoid re-running for same group (e.g. Email)
+                # Log failed portal to database with unexpected error
+                results.add_failed(portal, f"Unexpected processing error: {str(e)}")
+        
+        if _lease_lost(heartbeat, upload_id, "running the mappers"):
+            return "Abandoned"
+        
+        # Run the mappers, concurrently when enabled
+        if CENSUS_PARALLEL_PORTALS:
+            logger.info(f"Running {len(mapper_jobs)} census mappers in parallel (max workers: {CENSUS_MAX_PORTAL_WORKERS})")
+        mapping_start_time = time.time()
+        with timings.time("map"):
+            mapper_results = run_mapper_jobs(
+                mapper_jobs, census_frame, other_data,
+                parallel=CENSUS_PARALLEL_PORTALS,
+                max_workers=CENSUS_MAX_PORTAL_WORKERS,
+                timeout=CENSUS_MAPPER_TIMEOUT_SECONDS
+            )
+        logger.info(f"All census mappers finished in {time.time() - mapping_start_time:.2f}s")
+        # Per-portal stages are keyed by normalized portal, once per mapper run
+        for job in mapper_jobs:
+            timings.add_portal_stages(job.normalized_portal, mapper_results[job.portal].stages)
+        
+        # 7. Check output and Insert
+        for portal, job in portal_jobs:
+            insert_start_time = time.time()
+            normalized_portal, func, output_dir, filename = job.normalized_portal, job.func, job.output_dir, job.filename
+            mapper_result = mapper_results[job.portal]
             
-            for portal in portals:
-                portal_start_time = time.time()
-                logger.info(f"\n{'-'*50}")
-                logger.info(f"Processing portal: '{portal}'")
+            try:
+                if not mapper_result.success:
+                    error_msg = f"Error running mapper for '{portal}': {mapper_result.error}"
+                    logger.error(error_msg)
+                    logger.error(f"Full traceback for '{portal}': {mapper_result.traceback}")
+                    failed_portals.append({"portal": portal, "reason": f"Mapper execution error: {mapper_result.error}"})
+                    processing_errors.append(error_msg)
+                    # Log failed portal to database with execution error
+                    results.add_failed(portal, f"Mapper execution failed: {mapper_result.error}")
+                    continue
+                logger.info(f"✅ Mapper function completed for '{portal}' in {mapper_result.duration:.2f}s")
                 
-                try:
-                    # First try to normalize the portal name
-                    normalized_portal = normalize_portal_name(portal)
-                    if normalized_portal:
-                        logger.info(f"Portal mapped: '{portal}' -> '{normalized_portal}'")
-                    else:
-                        error_msg = f"Portal '{portal}' could not be mapped to any known portal"
-                        logger.error(error_msg)
-                        failed_portals.append({"portal": portal, "reason": "Portal name not recognized"})
-                        processing_errors.append(error_msg)
-                        # Log failed portal to database
-                        insert_failed_census(upload_id, portal, "Portal name not recognized - no mapping available")
-                        continue
-                    
-                    # Get mapper for the normalized portal
-                    mapper_info = get_mapper_for_portal(portal)
-                    if not mapper_info:
-                        error_msg = f"No mapper found for portal: '{portal}' (normalized: '{normalized_portal}')"
-                        logger.warning(error_msg)
-                        failed_portals.append({"portal": portal, "reason": "No mapper available"})
-                        processing_errors.append(error_msg)
-                        # Log failed portal to database with specific reason
-                        companies_without_mappers = ["ALITTHIHAD", "ALSAGR", "FIDELITY", "MEDGULF", "NGI", "ORIENT", "QATAR", "RAK", "TAKAFUL", "WATANIATAKAFUL"]
-                        if normalized_portal in companies_without_mappers:
-                            insert_failed_census(upload_id, portal, f"Mapper not yet implemented for {normalized_portal} - development in progress")
-                        else:
-                            insert_failed_census(upload_id, portal, f"No mapper implementation available for portal {normalized_portal}")
-                        continue
-                    
-                    func, output_dir, filename = mapper_info
+                generated = mapper_result.census
+                if generated is not None:
+                    logger.info(f"📁 Output generated for '{portal}': {generated.filename} ({len(generated):,} bytes)")
                     
-                    # Check if this is an email portal (no census generation)
-                    if normalized_portal in EMAIL_PORTALS:
-                        logger.info(f"Portal '{portal}' is an email portal - no census generation required")
-                        completed_portals.append(portal)  # Mark as completed since email portals don't generate files
-                        continue
-                    
-                    # Run mapper only if not already run (important for grouped email portals)
-                    if func not in processed_mappers:
-                        logger.info(f"Running census mapper for '{portal}' (function: {func.__name__})...")
-                        try:
-                            # Pass other_data to mappers that support it (like GIG and DAMAN)
-                            if normalized_portal in ['GIG', 'DAMAN']:
-                                func('default', other_data)
-                            else:
-                                func('default')
-                            processed_mappers.add(func)
-                            logger.info(f"✅ Mapper function completed for '{portal}'")
-                        except Exception as e:
-                            error_msg = f"Error running mapper for '{portal}': {str(e)}"
-                            logger.error(error_msg)
-                            logger.error(f"Full traceback for '{portal}': {traceback.format_exc()}")
-                            failed_portals.append({"portal": portal, "reason": f"Mapper execution error: {str(e)}"})
-                            processing_errors.append(error_msg)
-                            # Log failed portal to database with execution error
-                            insert_failed_census(upload_id, portal, f"Mapper execution failed: {str(e)}")
-                            continue
+                    with timings.portal(normalized_portal).time("encode"):
+                        added = results.add_generated(portal, generated)
+                    if added:
+                        portal_duration = mapper_result.duration + (time.time() - insert_start_time)
+                        logger.info(f"✅ SUCCESS - {portal} completed in {portal_duration:.2f}s (mapper {mapper_result.duration:.2f}s)")
+                        completed_portals.append(portal)
                     else:
-                        logger.info(f"Mapper function already executed for '{portal}' (shared mapper)")
-                    
-                    # 7. Check output and Insert
-                    # Use helper function to find file (handles timestamped versions)
-                    output_path, actual_filename = find_generated_file(output_dir, filename, portal, logger)
-                    
-                    if output_path and os.path.exists(output_path):
-                        file_size = os.path.getsize(output_path)
-                        logger.info(f"📁 Output file found for '{portal}': {actual_filename} ({file_size:,} bytes)")
-                        
-                        # Add a brief delay for Excel COM files to ensure they're fully closed
-                        if normalized_portal in ['DAMAN', 'IQ'] and func.__name__ in ['daman_map_data', 'iq_map_data']:
-                            logger.info(f"Waiting for Excel file to be fully released for '{portal}'...")
-                            time.sleep(2.0)
-                            import gc
-                            gc.collect()  # Force garbage collection to help release Excel handles
-                        
-                        if insert_generated_census(upload_id, portal, output_path):
-                            portal_duration = time.time() - portal_start_time
-                            logger.info(f"✅ SUCCESS - {portal} completed in {portal_duration:.2f}s")
-                            completed_portals.append(portal)
-                        else:
-                            error_msg = f"Failed to insert census for {portal} to database"
-                            logger.error(error_msg)
-                            failed_portals.append({"portal": portal, "reason": "Database insertion failed"})
-                            processing_errors.append(error_msg)
-                            # Log failed portal to database
-                            insert_failed_census(upload_id, portal, f"Database insertion failed - could not store census file in Census_Portal_Excels table")
-                    else:
-                        error_msg = f"Expected output file not found for {portal}: {os.path.join(output_dir, filename)}"
+                        error_msg = f"Failed to insert census for {portal} to database"
                         logger.error(error_msg)
-                        # List what files are actually in the directory
-                        if os.path.exists(output_dir):
-                            actual_files = os.listdir(output_dir)
-                            logger.error(f"Files found in {output_dir}: {actual_files}")
-                        else:
-                            logger.error(f"Output directory does not exist: {output_dir}")
-                        
-                        failed_portals.append({"portal": portal, "reason": "Output file not generated"})
+                        failed_portals.append({"portal": portal, "reason": "Database insertion failed"})
                         processing_errors.append(error_msg)
-                        # Log failed portal to database with file generation failure
-                        insert_failed_census(upload_id, portal, f"Census file not generated - expected file {filename} not found at {os.path.join(output_dir, filename)}")
-                        
-                except Exception as e:
-                    error_msg = f"Unexpected error processing {portal}: {str(e)}"
+                        # Log failed portal to database
+                        results.add_failed(portal, f"Database insertion failed - could not store census file in Census_Portal_Excels table")
+                else:
+                    # The mapper handled an error itself and returned nothing
+                    error_msg = f"Mapper for {portal} returned no census (expected {filename})"
                     logger.error(error_msg)
-                    logger.error(f"Full traceback for {portal}: {traceback.format_exc()}")
-                    failed_portals.append({"portal": portal, "reason": f"Unexpected error: {str(e)}"})
+                    failed_portals.append({"portal": portal, "reason": "Output file not generated"})
                     processing_errors.append(error_msg)
-                    # Log failed portal to database with unexpected error
-                    insert_failed_census(upload_id, portal, f"Unexpected processing error: {str(e)}")
-            
-            # 8. Generate Processing Summary
-            logger.info(f"\n" + "="*60)
-            logger.info(f"PROCESSING SUMMARY - Request ID: {upload_id}")
-            logger.info(f"="*60)
-            
-            # Portal statistics
-            total_requested = len(requested_portals)
-            total_completed = len(completed_portals)
-            total_failed = len(failed_portals)
-            success_rate = (total_completed / total_requested * 100) if total_requested > 0 else 0
-            
-            logger.info(f"Total Requested Portals: {total_requested}")
-            logger.info(f"Successfully Completed: {total_completed}")
-            logger.info(f"Failed: {total_failed}")
-            logger.info(f"Success Rate: {success_rate:.1f}%")
-            
-            # Detailed results
-            if completed_portals:
-                logger.info(f"\n✅ COMPLETED PORTALS ({len(completed_portals)}):")
-                for portal in completed_portals:
-                    logger.info(f"   - {portal}")
-            
-            if failed_portals:
-                logger.error(f"\n❌ FAILED PORTALS ({len(failed_portals)}):")
-                for failed in failed_portals:
-                    logger.error(f"   - {failed['portal']}: {failed['reason']}")
-            
-            # Check for any requested portals that weren't processed
-            not_processed = [p for p in requested_portals if p not in completed_portals and p not in [f['portal'] for f in failed_portals]]
-            if not_processed:
-                logger.warning(f"\n⚠️  PORTALS NOT PROCESSED ({len(not_processed)}):")
-                for portal in not_processed:
-                    logger.warning(f"   - {portal}: Not attempted")
-            
-            # Log all errors encountered
-            if processing_errors:
-                logger.error(f"\n🚨 PROCESSING ERRORS ({len(processing_errors)}):")
-                for idx, error in enumerate(processing_errors, 1):
-                    logger.error(f"   {idx}. {error}")
-            
-            # Final status determination
-            if total_completed == total_requested and not processing_errors:
-                final_status = "Completed"
-                logger.info(f"\n🎉 ALL PORTALS COMPLETED SUCCESSFULLY!")
-            elif total_completed > 0:
-                final_status = "Partial"
-                logger.warning(f"\n⚠️  PARTIAL SUCCESS: {total_completed}/{total_requested} portals completed")
-            else:
-                final_status = "Failed"
-                logger.error(f"\n💥 ALL PORTALS FAILED")
-            
-            # 9. Update Final Status
-            update_upload_status(upload_id, final_status)
-            logger.info(f"\nRequest {upload_id} finished with status: {final_status}")
-            logger.info(f"="*60 + "\n")
-            
-            # Sleep briefly before next poll
-            time.sleep(5)
-            
-        except Exception as e:
-            error_msg = f"Critical error in main loop: {e}"
-            logger.error(error_msg)
-            logger.error(f"Full traceback: {traceback.format_exc()}")
-            
-            # Try to update status if we have upload_id
+                    # Log failed portal to database with file generation failure
+                    results.add_failed(portal, f"Census file not generated - mapper returned no {filename}")
+                    
+            except Exception as e:
+                error_msg = f"Unexpected error processing {portal}: {str(e)}"
+                logger.error(error_msg)
+                logger.error(f"Full traceback for {portal}: {traceback.format_exc()}")
+                failed_portals.append({"portal": portal, "reason": f"Unexpected error: {str(e)}"})
+                processing_errors.append(error_msg)
+                # Log failed portal to database with unexpected error
+                results.add_failed(portal, f"Unexpected processing error: {str(e)}")
+        
+        # 8. Generate Processing Summary
+        logger.info(f"\n" + "="*60)
+        logger.info(f"PROCESSING SUMMARY - Request ID: {upload_id}")
+        logger.info(f"="*60)
+        
+        # Portal statistics
+        total_requested = len(requested_portals)
+        total_completed = len(completed_portals)
+        total_failed = len(failed_portals)
+        success_rate = (total_completed / total_requested * 100) if total_requested > 0 else 0
+        
+        logger.info(f"Total Requested Portals: {total_requested}")
+        logger.info(f"Successfully Completed: {total_completed}")
+        logger.info(f"Failed: {total_failed}")
+        logger.info(f"Success Rate: {success_rate:.1f}%")
+        
+        # Detailed results
+        if completed_portals:
+            logger.info(f"\n✅ COMPLETED PORTALS ({len(completed_portals)}):")
+            for portal in completed_portals:
+                logger.info(f"   - {portal}")
+        
+        if failed_portals:
+            logger.error(f"\n❌ FAILED PORTALS ({len(failed_portals)}):")
+            for failed in failed_portals:
+                logger.error(f"   - {failed['portal']}: {failed['reason']}")
+        
+        # Check for any requested portals that weren't processed
+        not_processed = [p for p in requested_portals if p not in completed_portals and p not in [f['portal'] for f in failed_portals]]
+        if not_processed:
+            logger.warning(f"\n⚠️  PORTALS NOT PROCESSED ({len(not_processed)}):")
+            for portal in not_processed:
+                logger.warning(f"   - {portal}: Not attempted")
+        
+        # Log all errors encountered
+        if processing_errors:
+            logger.error(f"\n🚨 PROCESSING ERRORS ({len(processing_errors)}):")
+            for idx, error in enumerate(processing_errors, 1):
+                logger.error(f"   {idx}. {error}")
+        
+        # Final status determination
+        if total_completed == total_requested and not processing_errors:
+            final_status = "Completed"
+            logger.info(f"\n🎉 ALL PORTALS COMPLETED SUCCESSFULLY!")
+        elif total_completed > 0:
+            final_status = "Partial"
+            logger.warning(f"\n⚠️  PARTIAL SUCCESS: {total_completed}/{total_requested} portals completed")
+        else:
+            final_status = "Failed"
+            logger.error(f"\n💥 ALL PORTALS FAILED")
+        
+        # 9. Update Final Status
+        if _lease_lost(heartbeat, upload_id, "saving its results"):
+            return "Abandoned"
+        if not results.flush(final_status):
+            logger.error(f"Results and status for request {upload_id} were not saved")
+        logger.info(f"\nRequest {upload_id} finished with status: {final_status}")
+        logger.info(f"="*60 + "\n")
+        return final_status
+        
+    except Exception as e:
+        error_msg = f"Critical error processing request {upload_id}: {e}"
+        logger.error(error_msg)
+        logger.error(f"Full traceback: {traceback.format_exc()}")
+        
+        try:
+            # Keep whatever results were gathered; if they cannot be written, still release the request
+            if not results.flush("Failed"):
+                update_upload_status(upload_id, "Failed", worker_id=CENSUS_WORKER_ID)
+            logger.error(f"Request {upload_id} marked as failed due to critical error")
+        except Exception as status_error:
+            logger.error(f"Failed to update status after critical error: {status_error}")
+        return "Failed"
+    
+    finally:
+        heartbeat.stop()
+        if workspace is not None:
             try:
-                if 'upload_id' in locals():
-                    update_upload_status(upload_id, "Failed")
-                    logger.error(f"Request {upload_id} marked as failed due to critical error")
-            except Exception as status_error:
-                logger.error(f"Failed to update status after critical error: {status_error}")
-            
-            time.sleep(10)
+                workspace.cleanup()
+            except Exception as cleanup_error:
+                logger.error(f"Failed to clean up workspace for request {upload_id}: {cleanup_error}")
+
+
+async def run_census_loop():
+    logger.info("Starting Enhanced Census Processing Loop...")
+    logger.info(f"Available census mappers ({len(CENSUS_MAPPING)}): {list(CENSUS_MAPPING.keys())}")
+    logger.info(f"Available email portals ({len(EMAIL_PORTALS)}): {EMAIL_PORTALS}")
+    
+    # Log recognized companies without mappers
+    companies_without_mappers = ["ALITTHIHAD", "ALSAGR", "FIDELITY", "MEDGULF", "NGI", "ORIENT", "QATAR", "RAK", "TAKAFUL", "WATANIATAKAFUL"]
+    if companies_without_mappers:
+        logger.info(f"Recognized companies without mappers ({len(companies_without_mappers)}): {companies_without_mappers}")
+    
+    logger.info(f"Total supported company name variations: {len(COMPANY_NAME_MAPPING)}")
+    logger.info(f"Enhanced portal name mapping system activated - supports fuzzy matching ({len(FUZZY_PORTAL_PATTERNS)} patterns) and case-insensitive lookup")
+    logger.info(f"Worker ID: {CENSUS_WORKER_ID} (lease {CENSUS_LEASE_SECONDS}s, heartbeat every {CENSUS_HEARTBEAT_SECONDS}s)")
+    logger.info(f"Concurrent requests per worker: {CENSUS_MAX_CONCURRENT_REQUESTS}")
+    logger.info("="*80)
+    
+    # Generated files now live in per-request workspaces; clear anything left in the legacy shared dirs once.
+    # Polls themselves touch no files: finished workspaces are renamed away and deleted by the reaper.
+    await clear_files()
+    leftovers = await asyncio.to_thread(WORKSPACE_REAPER.sweep)
+    if leftovers:
+        logger.info(f"Removing {leftovers} workspace(s) left by an earlier run")
+    
+    loop = asyncio.get_running_loop()
+    request_pool = ThreadPoolExecutor(
+        max_workers=CENSUS_MAX_CONCURRENT_REQUESTS,
+        thread_name_prefix="census-request"
+    )
+    # Queue queries get their own thread: a slow DB call delays the next claim, never the event loop
+    db_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="census-db")
+    active_requests = set()
+    claim = None
+    poll_state = {"last_poll": time.monotonic(), "db_call_started": None, "stopping": False}
+    
+    def health():
+        now = time.monotonic()
+        db_call_started = poll_state["db_call_started"]
+        return {
+            "status": "stopping" if poll_state["stopping"] else "ok",
+            "worker_id": CENSUS_WORKER_ID,
+            "active_requests": len(active_requests),
+            "max_concurrent_requests": CENSUS_MAX_CONCURRENT_REQUESTS,
+            "seconds_since_poll": round(now - poll_state["last_poll"], 1),
+            "db_call_seconds": round(now - db_call_started, 1) if db_call_started is not None else None,
+        }
+    
+    def request_done(future):
+        # Drop finished requests at once so /health is accurate, and surface anything that escaped them
+        active_requests.discard(future)
+        if not future.cancelled() and future.exception() is not None:
+            logger.error(f"Census request thread failed: {future.exception()!r}")
+    
+    def start_request(req):
+        future = loop.run_in_executor(request_pool, process_census_request, req)
+        active_requests.add(future)
+        future.add_done_callback(request_done)
+    
+    backoff = AdaptiveBackoff(CENSUS_POLL_MIN_SECONDS, CENSUS_POLL_MAX_SECONDS)
+    wakeup = JobWakeup({"/health": health, "/metrics": CENSUS_METRICS.prometheus, "/metrics.json": CENSUS_METRICS.snapshot})
+    await wakeup.start(CENSUS_WAKEUP_HOST, CENSUS_WAKEUP_PORT)
+    
+    # SIGTERM stops the loop like Ctrl+C does: no new claims, running requests are finished
+    main_task = asyncio.current_task()
+    try:
+        loop.add_signal_handler(signal.SIGTERM, main_task.cancel)
+    except (NotImplementedError, AttributeError):
+        pass  # Not available on Windows
+    
+    try:
+        while True:
+            try:
+                # 1. Wait for a free request slot
+                if len(active_requests) >= CENSUS_MAX_CONCURRENT_REQUESTS:
+                    await asyncio.wait(set(active_requests), return_when=asyncio.FIRST_COMPLETED)
+                    continue
+                
+                # 2. Claim a pending request; the row is 'Processing' and leased to this worker once returned
+                poll_state["db_call_started"] = time.monotonic()
+                claim = loop.run_in_executor(db_pool, claim_next_census_upload, CENSUS_WORKER_ID, CENSUS_LEASE_SECONDS)
+                req = await asyncio.shield(claim)
+                claim = None
+                poll_state["last_poll"] = time.monotonic()
+                poll_state["db_call_started"] = None
+                if not req:
+                    # Queue is empty: back off exponentially, but wake at once on a push notification
+                    if await wakeup.wait(backoff.next_delay()):
+                        logger.info("Wakeup received, polling for new uploads")
+                        backoff.reset()
+                    continue
+                
+                # 3. Hand the claimed request to a request thread and drain the queue without sleeping
+                backoff.reset()
+                start_request(req)
+                
+            except Exception as e:
+                claim = None
+                poll_state["db_call_started"] = None
+                error_msg = f"Critical error in main loop: {e}"
+                logger.error(error_msg)
+                logger.error(f"Full traceback: {traceback.format_exc()}")
+                await asyncio.sleep(CENSUS_POLL_MAX_SECONDS)
+    finally:
+        poll_state["stopping"] = True
+        try:
+            # A claim still in flight may hand this worker a row; process it rather than leave it leased
+            if claim is not None:
+                try:
+                    req = await claim
+                except Exception as e:
+                    req = None
+                    logger.error(f"Claim in flight at shutdown failed: {e}")
+                if req:
+                    start_request(req)
+            # Claimed requests keep their lease heartbeats until they finish; let them write their status
+            if active_requests:
+                logger.info(f"Stopping: waiting for {len(active_requests)} active request(s) to finish")
+                await asyncio.wait(set(active_requests))
+        finally:
+            await wakeup.close()
+            request_pool.shutdown(wait=False, cancel_futures=True)
+            db_pool.shutdown(wait=False, cancel_futures=True)
+            # Frequent fuzzy hits are worth adding to COMPANY_NAME_MAPPING
+            logger.info(f"Portal name resolution since startup: {PORTAL_RESOLVER.stats()}")
 
 if __name__ == "__main__":
     try:
         asyncio.run(run_census_loop())
     except KeyboardInterrupt:
-        print("Shutting down...")
\ No newline at end of file
+        print("Shutting down...")
+    finally:
+        shutdown_portal_pool()
\ No newline at end of file
@@ -1,23 +1,114 @@
+import sqlite3
+import threading
+
 import mysql.connector
 from mysql.connector import Error
+from mysql.connector.constants import ClientFlag
+from mysql.connector.pooling import MySQLConnectionPool
+
+
+class MySQLConnectionManager:
+    """
+    Thread-safe pool of MySQL connections shared by every MySQLDatabase that uses it.
+
+    The pool is created on first use. Borrowers block (up to acquire_timeout seconds)
+    while all connections are out, and each borrowed connection is pinged so one
+    dropped by the server while idle is reconnected before it is handed out.
+    """
+
+    def __init__(self, host, database, user, password, pool_size=5, pool_name="census_pool",
+                 acquire_timeout=30, ping_attempts=3, ping_delay=1):
+        self.pool_name = pool_name
+        self.pool_size = pool_size
+        self.acquire_timeout = acquire_timeout
+        self.ping_attempts = ping_attempts
+        self.ping_delay = ping_delay
+        self._connection_config = {
+            "host": host,
+            "database": database,
+            "user": user,
+            "password": password,
+            # Report matched (not just changed) rows so conditional updates can be checked
+            "client_flags": [ClientFlag.FOUND_ROWS],
+            # The pure-Python protocol streams file-like parameters with COM_STMT_SEND_LONG_DATA
+            "use_pure": True
+        }
+        self._pool = None
+        self._pool_lock = threading.Lock()
+        # MySQLConnectionPool raises when exhausted instead of waiting, so gate borrowers here
+        self._slots = threading.BoundedSemaphore(pool_size)
+
+    def _get_pool(self):
+        with self._pool_lock:
+            if self._pool is None:
+                self._pool = MySQLConnectionPool(
+                    pool_name=self.pool_name,
+                    pool_size=self.pool_size,
+                    pool_reset_session=True,
+                    **self._connection_config
+                )
+                print(f"MySQL connection pool '{self.pool_name}' created with {self.pool_size} connections")
+            return self._pool
+
+    def acquire(self):
+        """Borrow a healthy connection from the pool; return it with release()."""
+        if not self._slots.acquire(timeout=self.acquire_timeout):
+            raise Error(f"Timed out after {self.acquire_timeout}s waiting for a connection from pool '{self.pool_name}'")
+        connection = None
+        try:
+            connection = self._get_pool().get_connection()
+            # Health check: reconnects a connection the server closed while it sat idle
+            connection.ping(reconnect=True, attempts=self.ping_attempts, delay=self.ping_delay)
+            return connection
+        except Exception:
+            if connection is not None:
+                connection.close()
+            self._slots.release()
+            raise
+
+    def release(self, connection):
+        """Hand a borrowed connection back to the pool."""
+        try:
+            connection.close()  # Pooled connections go back to the pool on close()
+        finally:
+            self._slots.release()
+
 
 class MySQLDatabase:
-    def __init__(self, host, database, user, password):
+    # Row locks with SKIP LOCKED let concurrent workers pick different queue rows
+    supports_skip_locked = True
+    # Lease times come from the server clock, so workers on hosts with skewed clocks still agree
+    now_sql = "NOW()"
+    now_plus_seconds_sql = "NOW() + INTERVAL %s SECOND"
+
+    def __init__(self, host, database, user, password, pool=None):
         self.host = host
         self.database = database
         self.user = user
         self.password = password
+        self.pool = pool  # Optional MySQLConnectionManager to borrow connections from
         self.connection = None
         self.cursor = None
 
     def connect(self):
-        """Establish a connection to the MySQL database."""
+        """Establish a connection to the MySQL database, borrowing from the pool when one is set."""
+        if self.pool is not None:
+            try:
+                self.connection = self.pool.acquire()
+                self.cursor = self.connection.cursor(dictionary=True)
+                return True
+            except Error as e:
+                print(f"Error borrowing pooled MySQL connection: {e}")
+                self.connection = None
+                return False
         try:
             self.connection = mysql.connector.connect(
                 host=self.host,
                 database=self.database,
                 user=self.user,
-                password=self.password
+                password=self.password,
+                # Report matched (not just changed) rows so conditional updates can be checked
+                client_flags=[ClientFlag.FOUND_ROWS]
             )
             if self.connection.is_connected():
                 self.cursor = self.connection.cursor(dictionary=True)  # Return results as dictionaries
@@ -28,7 +119,16 @@ class MySQLDatabase:
             return False
 
     def disconnect(self):
-        """Close the database connection."""
+        """Close the database connection, or return it to the pool."""
+        if self.pool is not None:
+            if self.connection is not None:
+                try:
+                    self.cursor.close()
+                except Error:
+                    pass
+                self.pool.release(self.connection)
+                self.connection = None
+            return
         if self.connection and self.connection.is_connected():
             self.cursor.close()
             self.connection.close()
@@ -46,6 +146,58 @@ class MySQLDatabase:
             print(f"Error executing query: {e}")
             return False
 
+    def execute_update(self, query, params=None, commit=True):
+        """
+        Execute an UPDATE/DELETE and return the number of matched rows, or None on error.
+
+        With commit=False the change stays in the open transaction until commit().
+        """
+        try:
+            self.cursor.execute(query, params or ())
+            rowcount = self.cursor.rowcount
+            if commit:
+                self.connection.commit()
+            return rowcount
+        except Error as e:
+            self.connection.rollback()
+            print(f"Error executing update: {e}")
+            return None
+
+    def execute_many(self, query, rows, commit=True):
+        """
+        Execute one statement for each parameter tuple in `rows` (batched into a
+        multi-row INSERT where the driver can) and return the affected row count, or None on error.
+
+        With commit=False the rows stay in the open transaction until commit().
+        """
+        try:
+            self.cursor.executemany(query, rows)
+            rowcount = self.cursor.rowcount
+            if commit:
+                self.connection.commit()
+            return rowcount
+        except Error as e:
+            self.connection.rollback()
+            print(f"Error executing batch: {e}")
+            return None
+
+    def commit(self):
+        """Commit the open transaction; returns False (after rolling back) on error."""
+        try:
+            self.connection.commit()
+            return True
+        except Error as e:
+            self.connection.rollback()
+            print(f"Error committing transaction: {e}")
+            return False
+
+    def rollback(self):
+        """Roll back the open transaction, releasing any row locks it holds."""
+        try:
+            self.connection.rollback()
+        except Error as e:
+            print(f"Error rolling back transaction: {e}")
+
     def fetch_all(self, query, params=None):
         """Fetch all rows from a SELECT query."""
         try:
@@ -72,8 +224,179 @@ class MySQLDatabase:
         self.execute_query(query, tuple(data.values()))
         return self.cursor.lastrowid  # Return the last inserted ID
 
+    def insert_record_streamed(self, table, data, commit=True):
+        """
+        Insert a record whose file-like values (objects with read()) are streamed to the
+        server in chunks by a prepared statement instead of being built into the query.
+
+        With commit=False the row stays in the open transaction until commit().
+
+        Returns:
+            int: The last inserted ID, or None on error
+        """
+        columns = ', '.join(data.keys())
+        placeholders = ', '.join(['%s'] * len(data))
+        query = f"INSERT INTO {table} ({columns}) VALUES ({placeholders})"
+        cursor = self.connection.cursor(prepared=True)
+        try:
+            cursor.execute(query, tuple(data.values()))
+            if commit:
+                self.connection.commit()
+            return cursor.lastrowid
+        except Error as e:
+            self.connection.rollback()
+            print(f"Error executing streamed insert: {e}")
+            return None
+        finally:
+            cursor.close()
+
+    def update_record(self, table, data, condition):
+        """Update a record in a table (data = {'column': new_value}, condition = 'id=1')."""
+        set_clause = ', '.join([f"{key}=%s" for key in data.keys()])
+        query = f"UPDATE {table} SET {set_clause} WHERE {condition}"
+        return self.execute_query(query, tuple(data.values()))
+
+
+class SQLiteDatabase:
+    """
+    SQLite stand-in exposing the same interface as MySQLDatabase.
+
+    Used for local runs and tests of the queue logic; queries are written with
+    MySQL-style %s placeholders and translated here.
+    """
+    supports_skip_locked = False
+    # 'YYYY-MM-DD HH:MM:SS' text, which compares like MySQL DATETIME values; local time like NOW()
+    now_sql = "datetime('now', 'localtime')"
+    now_plus_seconds_sql = "datetime('now', 'localtime', '+' || %s || ' seconds')"
+
+    def __init__(self, path):
+        self.path = path
+        self.connection = None
+        self.cursor = None
+
+    @staticmethod
+    def _sql(query):
+        return query.replace("%s", "?")
+
+    def connect(self):
+        """Open the SQLite database file."""
+        try:
+            self.connection = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            self.connection.row_factory = lambda cursor, row: {col[0]: row[idx] for idx, col in enumerate(cursor.description)}
+            self.cursor = self.connection.cursor()
+            return True
+        except sqlite3.Error as e:
+            print(f"Error connecting to SQLite: {e}")
+            return False
+
+    def disconnect(self):
+        """Close the database connection."""
+        if self.connection:
+            self.cursor.close()
+            self.connection.close()
+            self.connection = None
+
+    def execute_query(self, query, params=None):
+        """Execute a SQL query (SELECT, INSERT, UPDATE, DELETE)."""
+        try:
+            self.cursor.execute(self._sql(query), params or ())
+            self.connection.commit()
+            return True
+        except sqlite3.Error as e:
+            self.connection.rollback()
+            print(f"Error executing query: {e}")
+            return False
+
+    def execute_update(self, query, params=None, commit=True):
+        """
+        Execute an UPDATE/DELETE and return the number of matched rows, or None on error.
+
+        With commit=False the change stays in the open transaction until commit().
+        """
+        try:
+            self.cursor.execute(self._sql(query), params or ())
+            rowcount = self.cursor.rowcount
+            if commit:
+                self.connection.commit()
+            return rowcount
+        except sqlite3.Error as e:
+            self.connection.rollback()
+            print(f"Error executing update: {e}")
+            return None
+
+    def execute_many(self, query, rows, commit=True):
+        """
+        Execute one statement for each parameter tuple in `rows` (batched into a
+        multi-row INSERT where the driver can) and return the affected row count, or None on error.
+
+        With commit=False the rows stay in the open transaction until commit().
+        """
+        try:
+            self.cursor.executemany(self._sql(query), rows)
+            rowcount = self.cursor.rowcount
+            if commit:
+                self.connection.commit()
+            return rowcount
+        except sqlite3.Error as e:
+            self.connection.rollback()
+            print(f"Error executing batch: {e}")
+            return None
+
+    def commit(self):
+        """Commit the open transaction; returns False (after rolling back) on error."""
+        try:
+            self.connection.commit()
+            return True
+        except sqlite3.Error as e:
+            self.connection.rollback()
+            print(f"Error committing transaction: {e}")
+            return False
+
+    def rollback(self):
+        """Roll back the open transaction."""
+        try:
+            self.connection.rollback()
+        except sqlite3.Error as e:
+            print(f"Error rolling back transaction: {e}")
+
+    def fetch_all(self, query, params=None):
+        """Fetch all rows from a SELECT query."""
+        try:
+            self.cursor.execute(self._sql(query), params or ())
+            return self.cursor.fetchall()
+        except sqlite3.Error as e:
+            print(f"Error fetching data: {e}")
+            return None
+
+    def fetch_one(self, query, params=None):
+        """Fetch a single row from a SELECT query."""
+        try:
+            self.cursor.execute(self._sql(query), params or ())
+            return self.cursor.fetchone()
+        except sqlite3.Error as e:
+            print(f"Error fetching data: {e}")
+            return None
+
+    def insert_record(self, table, data):
+        """Insert a record into a table (data is a dictionary: {'column': value})."""
+        columns = ', '.join(data.keys())
+        placeholders = ', '.join(['%s'] * len(data))
+        query = f"INSERT INTO {table} ({columns}) VALUES ({placeholders})"
+        self.execute_query(query, tuple(data.values()))
+        return self.cursor.lastrowid
+
+    def insert_record_streamed(self, table, data, commit=True):
+        """Insert a record, reading file-like values (SQLite has no long-data protocol)."""
+        values = tuple(value.read() if hasattr(value, "read") else value for value in data.values())
+        columns = ', '.join(data.keys())
+        placeholders = ', '.join(['%s'] * len(data))
+        query = f"INSERT INTO {table} ({columns}) VALUES ({placeholders})"
+        if self.execute_update(query, values, commit=commit) is None:
+            return None
+        return self.cursor.lastrowid
+
     def update_record(self, table, data, condition):
         """Update a record in a table (data = {'column': new_value}, condition = 'id=1')."""
         set_clause = ', '.join([f"{key}=%s" for key in data.keys()])
         query = f"UPDATE {table} SET {set_clause} WHERE {condition}"
-        return self.execute_query(query, tuple(data.values()))
\ No newline at end of file
+        return self.execute_query(query, tuple(data.values()))
@@ -1,20 +1,83 @@
-import base64
 import os
 import json
-import time
-import gc
+from itertools import groupby
 from src.services.db_config.config import DB_HOST, DB_NAME, DB_USER, DB_PASSWORD
-from src.services.db_config.db_connect import MySQLDatabase
+from src.services.db_config.db_connect import MySQLDatabase, MySQLConnectionManager
+from src.utils.load_yaml import (
+    DB_POOL_SIZE,
+    DB_POOL_ACQUIRE_TIMEOUT,
+    CENSUS_STORAGE_MODE,
+    CENSUS_STORAGE_COMPRESSION,
+    CENSUS_FILE_STORE_DIR,
+    CENSUS_RESULT_STREAM_BYTES
+)
+from src.utils.base64_stream import (
+    DEFAULT_CHUNK_CHARS,
+    Base64EncodingReader,
+    Base64StreamDecoder,
+    base64_encoded_length,
+    decode_base64_to_file
+)
+from src.utils.census_storage import (
+    FORMAT_BASE64,
+    FORMAT_BLOB,
+    FORMAT_BLOB_GZIP,
+    FORMAT_FILE,
+    FORMAT_FILE_GZIP,
+    ContentAddressedStore,
+    DecompressingWriter,
+    GzipCompressingReader,
+    PassThroughReader,
+    is_gzip_format,
+    storage_format as census_storage_format
+)
+from src.utils.atomic_file import atomic_write
+from src.utils.census_metrics import stage
+from src.utils.generated_census import GeneratedCensus
 from src.utils.logger import logger
 
+# One pool per worker process; connect()/disconnect() below borrow and return its connections
+_connection_manager = MySQLConnectionManager(
+    DB_HOST, DB_NAME, DB_USER, DB_PASSWORD,
+    pool_size=DB_POOL_SIZE,
+    acquire_timeout=DB_POOL_ACQUIRE_TIMEOUT
+)
+
+
+# How new Census_Portal_Excels rows store the generated file (validated at import)
+CENSUS_STORAGE_FORMAT = census_storage_format(CENSUS_STORAGE_MODE, CENSUS_STORAGE_COMPRESSION)
+_census_file_store = ContentAddressedStore(CENSUS_FILE_STORE_DIR)
+
+
+def _pooled_db():
+    """Return a MySQLDatabase that borrows its connection from the shared pool."""
+    return MySQLDatabase(DB_HOST, DB_NAME, DB_USER, DB_PASSWORD, pool=_connection_manager)
+
+
+def _stream_column(db, table, column, row_id, consume, chunk_size):
+    """Read one TEXT/BLOB cell in SUBSTRING chunks, passing each chunk to `consume`."""
+    query = f"SELECT SUBSTRING({column}, %s, %s) AS chunk FROM {table} WHERE id = %s"
+    position = 1  # SUBSTRING is 1-based
+    while True:
+        row = db.fetch_one(query, (position, chunk_size, row_id))
+        if row is None:
+            raise ValueError(f"{table} row {row_id} could not be read")
+        chunk = row['chunk']
+        if not chunk:
+            return
+        consume(chunk)
+        position += chunk_size
+
+
 def fetch_pending_census_uploads():
     """
     Fetch the first pending census upload request from Census_Excel_Uploads.
     Returns:
         dict: The request record or None.
     """
+    db = None
     try:
-        db = MySQLDatabase(DB_HOST, DB_NAME, DB_USER, DB_PASSWORD)
+        db = _pooled_db()
         if not db.connect():
             logger.error("Failed to connect to database")
             return None
@@ -28,8 +91,6 @@ def fetch_pending_census_uploads():
             logger.info(f"Found pending request: ID={data[0].get('id')}")
         else:
             logger.info("No pending requests found")
-            
-        db.disconnect()
         
         if data and len(data) > 0:
             return data[0]
@@ -39,142 +100,341 @@ def fetch_pending_census_uploads():
         import traceback
         logger.error(traceback.format_exc())
         return None
+    finally:
+        if db is not None:
+            db.disconnect()
 
-def update_upload_status(id, status):
+# Everything the worker needs from a claimed row except census_file, which is streamed separately
+UPLOAD_METADATA_COLUMNS = "id, portals, other_data, status, created_at, worker_id, lease_expires_at, heartbeat_at"
+
+# A row can be claimed when it is waiting, or when the worker holding it stopped heartbeating;
+# {now} is the database's current time (db.now_sql), never the worker's clock
+CLAIMABLE_UPLOAD_CONDITION = "(status = 'Pending' OR (status = 'Processing' AND lease_expires_at < {now}))"
+
+
+def claim_next_census_upload(worker_id, lease_seconds, db=None, max_attempts=5):
     """
-    Update the status of a Census_Excel_Uploads record.
+    Atomically claim the oldest claimable Census_Excel_Uploads row for this worker.
+
+    The row is moved to 'Processing' with a compare-and-set UPDATE, so when several
+    workers race for the same row exactly one of them wins. On MySQL the candidate is
+    also selected FOR UPDATE SKIP LOCKED so competing workers move straight on to
+    the next row instead of waiting. Rows whose lease has expired are claimed again.
+    Lease times are computed by the database, so workers with skewed clocks agree on them.
+    The base64 census_file column is not fetched; use save_census_upload_to_file.
+
+    Args:
+        worker_id (str): Identifier of the claiming worker
+        lease_seconds (int): How long the claim is valid without a heartbeat
+        db: Connected database to use (a new MySQL connection when omitted)
+        max_attempts (int): Candidate rows to try before giving up on this poll
+
+    Returns:
+        dict: The claimed request record or None.
     """
+    owns_db = db is None
     try:
-        db = MySQLDatabase(DB_HOST, DB_NAME, DB_USER, DB_PASSWORD)
-        if not db.connect():
+        if owns_db:
+            db = _pooled_db()
+            if not db.connect():
+                logger.error("Failed to connect to database")
+                return None
+
+        claimable = CLAIMABLE_UPLOAD_CONDITION.format(now=db.now_sql)
+        select_query = (f"SELECT id, status, worker_id FROM Census_Excel_Uploads "
+                        f"WHERE {claimable} ORDER BY created_at ASC, id ASC LIMIT 1")
+        if db.supports_skip_locked:
+            select_query += " FOR UPDATE SKIP LOCKED"
+        claim_query = ("UPDATE Census_Excel_Uploads SET status = 'Processing', worker_id = %s, "
+                       f"lease_expires_at = {db.now_plus_seconds_sql}, heartbeat_at = {db.now_sql} "
+                       f"WHERE id = %s AND {claimable}")
+
+        for _ in range(max_attempts):
+            candidate = db.fetch_one(select_query)
+            if not candidate:
+                db.rollback()
+                return None
+
+            claimed = db.execute_update(claim_query, (worker_id, int(lease_seconds), candidate['id']))
+            if claimed == 1:
+                if candidate['status'] == 'Processing':
+                    logger.warning(f"Re-claimed request ID={candidate['id']} after lease of worker "
+                                   f"'{candidate['worker_id']}' expired")
+                req = db.fetch_one(f"SELECT {UPLOAD_METADATA_COLUMNS} FROM Census_Excel_Uploads WHERE id = %s",
+                                   (candidate['id'],))
+                logger.info(f"Worker '{worker_id}' claimed request ID={candidate['id']} "
+                            f"until {req['lease_expires_at'] if req else 'unknown'}")
+                return req
+
+            # Another worker claimed the row between our SELECT and UPDATE
+            logger.info(f"Request ID={candidate['id']} was claimed by another worker, trying next")
+
+        return None
+    except Exception as e:
+        logger.error(f"Error claiming pending upload: {e}")
+        import traceback
+        logger.error(traceback.format_exc())
+        return None
+    finally:
+        if owns_db and db is not None:
+            db.disconnect()
+
+def heartbeat_census_upload(id, worker_id, lease_seconds, db=None):
+    """
+    Extend this worker's lease on a claimed Census_Excel_Uploads record.
+
+    Args:
+        id (int): The upload ID
+        worker_id (str): Worker that claimed the record
+        lease_seconds (int): New lease length from now
+        db: Connected database to use (a new MySQL connection when omitted)
+
+    Returns:
+        bool: True while the worker still holds the lease, False if it was lost
+    """
+    owns_db = db is None
+    try:
+        if owns_db:
+            db = _pooled_db()
+            if not db.connect():
+                return False
+
+        query = (f"UPDATE Census_Excel_Uploads SET heartbeat_at = {db.now_sql}, "
+                 f"lease_expires_at = {db.now_plus_seconds_sql} "
+                 "WHERE id = %s AND worker_id = %s AND status = 'Processing'")
+        updated = db.execute_update(query, (int(lease_seconds), id, worker_id))
+        if updated != 1:
+            logger.warning(f"Worker '{worker_id}' no longer holds the lease on request {id}")
             return False
-            
-        result = db.update_record("Census_Excel_Uploads", {"status": status}, f"id = {id}")
-        db.disconnect()
-        return result
+        return True
+    except Exception as e:
+        logger.error(f"Error sending heartbeat for upload {id}: {e}")
+        return False
+    finally:
+        if owns_db and db is not None:
+            db.disconnect()
+
+def update_upload_status(id, status, worker_id=None, db=None):
+    """
+    Update the status of a Census_Excel_Uploads record.
+
+    When worker_id is given the update only applies while that worker still holds
+    the claim, and the lease is released so the row is not picked up again.
+    """
+    owns_db = db is None
+    try:
+        if owns_db:
+            db = _pooled_db()
+            if not db.connect():
+                return False
+
+        if worker_id is None:
+            return db.update_record("Census_Excel_Uploads", {"status": status}, f"id = {id}")
+        return _set_claimed_status(db, id, status, worker_id)
     except Exception as e:
         logger.error(f"Error updating upload status for id {id}: {e}")
         return False
+    finally:
+        if owns_db and db is not None:
+            db.disconnect()
+
+def _set_claimed_status(db, id, status, worker_id, commit=True):
+    """Set the status of a claimed upload and release its lease; False if worker_id no longer holds the claim."""
+    query = ("UPDATE Census_Excel_Uploads SET status = %s, lease_expires_at = NULL "
+             "WHERE id = %s AND worker_id = %s")
+    updated = db.execute_update(query, (status, id, worker_id), commit=commit)
+    if updated != 1:
+        logger.warning(f"Status '{status}' for request {id} not saved: worker '{worker_id}' lost its claim")
+        return False
+    return True
 
 def save_base64_to_file(base64_str, output_path):
     """
-    Decodes a base64 string and saves it to a file.
+    Decodes a base64 string and saves it to a file, chunk by chunk.
     """
     try:
-        file_data = base64.b64decode(base64_str)
-        with open(output_path, 'wb') as f:
-            f.write(file_data)
+        decode_base64_to_file(base64_str, output_path)
         return True
     except Exception as e:
         logger.error(f"Error saving base64 to file {output_path}: {e}")
         return False
 
-def wait_for_file_unlock(file_path, max_attempts=10, delay=1.0):
+def save_census_upload_to_file(upload_id, output_path, chunk_chars=DEFAULT_CHUNK_CHARS, db=None):
     """
-    Wait for a file to be unlocked and readable.
-    Returns True if file is accessible, False if still locked after max attempts.
+    Stream the base64 census_file of a Census_Excel_Uploads row to disk.
+
+    The column is read with SUBSTRING in chunk_chars pieces and decoded as it
+    arrives, so neither the base64 text nor the decoded file is held in memory whole.
+    The file is renamed into place once complete, so readers never see a partial upload.
+
+    Args:
+        upload_id (int): The upload ID
+        output_path (str): Where to write the decoded workbook
+        chunk_chars (int): Base64 characters fetched per query
+        db: Connected database to use (a pooled connection when omitted)
+
+    Returns:
+        bool: True if the file was written, False otherwise
     """
-    for attempt in range(max_attempts):
-        try:
-            # Try to open the file in read+write mode to check if it's locked
-            with open(file_path, "rb") as f:
-                f.read(1024)  # Try to read a small portion
-            logger.info(f"File {os.path.basename(file_path)} is now accessible (attempt {attempt + 1})")
-            return True
-        except (PermissionError, IOError) as e:
-            if "Permission denied" in str(e) or "being used by another process" in str(e):
-                logger.warning(f"File {os.path.basename(file_path)} is locked, waiting... (attempt {attempt + 1}/{max_attempts})")
-                time.sleep(delay)
-                # Force garbage collection to help release any lingering file handles
-                gc.collect()
-            else:
-                logger.error(f"Unexpected file error: {e}")
+    owns_db = db is None
+    try:
+        if owns_db:
+            db = _pooled_db()
+            if not db.connect():
+                logger.error(f"Failed to connect to database to read upload {upload_id}")
                 return False
-        except Exception as e:
-            logger.error(f"Error checking file accessibility: {e}")
-            return False
-    
-    logger.error(f"File {os.path.basename(file_path)} remains locked after {max_attempts} attempts")
-    return False
 
-def insert_generated_census(upload_id, portal, file_path):
+        with atomic_write(output_path) as f:
+            decoder = Base64StreamDecoder(f)
+            _stream_column(db, "Census_Excel_Uploads", "census_file", upload_id, decoder.feed, chunk_chars)
+            decoder.close()
+
+        logger.info(f"Saved census upload {upload_id} to {os.path.basename(output_path)} ({decoder.bytes_written:,} bytes)")
+        return True
+    except Exception as e:
+        logger.error(f"Error saving census upload {upload_id} to file {output_path}: {e}")
+        return False
+    finally:
+        if owns_db and db is not None:
+            db.disconnect()
+
+def _generated_census_record(upload_id, portal, f, fmt, filename, file_size, content_sha256=None):
+    """Census_Portal_Excels values for a generated file, its content as readers over `f` for insert_record_streamed."""
+    data = {
+        "upload_id": upload_id,
+        "portal": portal,
+        "census": Base64EncodingReader(f) if fmt == FORMAT_BASE64 else "",
+        "status": "Completed",
+        "log": f"Successfully generated census file: {filename} ({file_size:,} bytes)"
+    }
+    if fmt != FORMAT_BASE64:
+        # Columns added by migrations/002_census_portal_blob_storage.sql
+        data["storage_format"] = fmt
+        data["content_length"] = file_size
+    if fmt == FORMAT_BLOB:
+        data["census_blob"] = PassThroughReader(f)
+    elif fmt == FORMAT_BLOB_GZIP:
+        data["census_blob"] = GzipCompressingReader(f)
+    if content_sha256:
+        data["content_sha256"] = content_sha256
+    return data
+
+def insert_generated_census(upload_id, portal, census, storage_format=None, db=None):
     """
-    Reads a file, encodes it to base64, and inserts a record into Census_Portal_Excels.
-    Includes retry logic for file locking issues.
+    Insert a generated census into Census_Portal_Excels, stored per CENSUS_STORAGE_FORMAT:
+    base64 text in `census` (legacy), raw or gzipped bytes in `census_blob`, or a
+    content-addressed file referenced by `content_sha256`. The content is streamed
+    to the driver as it is read, never built whole.
+
+    Args:
+        census: GeneratedCensus returned by a mapper, or the path of a generated file
+        storage_format: Overrides CENSUS_STORAGE_FORMAT for this row
+        db: Connected database to use (a pooled connection when omitted)
     """
+    owns_db = db is None
+    in_memory = isinstance(census, GeneratedCensus)
     try:
-        if not os.path.exists(file_path):
-            logger.error(f"Generated file not found: {file_path}")
-            return False
+        if in_memory:
+            filename, file_size, open_census = census.filename, len(census), census.open
+        else:
+            if not os.path.exists(census):
+                logger.error(f"Generated file not found: {census}")
+                return False
+            filename, file_size = os.path.basename(census), os.path.getsize(census)
+            open_census = lambda: open(census, "rb")
         
-        # Check file size to ensure it's been fully written
-        file_size = os.path.getsize(file_path)
+        # An empty workbook means the mapper did not finish writing it
         if file_size == 0:
-            logger.error(f"Generated file is empty: {file_path}")
+            logger.error(f"Generated census is empty: {filename}")
             return False
         
-        logger.info(f"Attempting to read census file: {os.path.basename(file_path)} ({file_size:,} bytes)")
+        logger.info(f"Storing census file: {filename} ({file_size:,} bytes)")
         
-        # Wait for file to be unlocked (important for Excel COM-generated files)
-        if not wait_for_file_unlock(file_path):
-            logger.error(f"Unable to access file due to locking: {file_path}")
-            return False
+        if owns_db:
+            db = _pooled_db()
+            if not db.connect():
+                logger.error(f"Failed to connect to database for {portal}")
+                return False
         
-        # Read the file with retry mechanism
-        encoded_string = None
-        for attempt in range(3):
-            try:
-                with open(file_path, "rb") as f:
-                    file_content = f.read()
-                    encoded_string = base64.b64encode(file_content).decode('utf-8')
-                    logger.info(f"Successfully read and encoded file (attempt {attempt + 1})")
-                    break
-            except (PermissionError, IOError) as e:
-                logger.warning(f"File read attempt {attempt + 1} failed: {e}")
-                if attempt < 2:
-                    time.sleep(2.0)  # Wait 2 seconds before retry
-                    gc.collect()
-                else:
-                    raise e
-        
-        if not encoded_string:
-            logger.error(f"Failed to read file content after retries: {file_path}")
-            return False
-            
-        # Insert into database
-        db = MySQLDatabase(DB_HOST, DB_NAME, DB_USER, DB_PASSWORD)
-        if not db.connect():
-            logger.error(f"Failed to connect to database for {portal}")
+        fmt = storage_format or CENSUS_STORAGE_FORMAT
+        content_sha256 = None
+        if fmt in (FORMAT_FILE, FORMAT_FILE_GZIP):
+            with open_census() as f:
+                content_sha256 = _census_file_store.put(f, compressed=is_gzip_format(fmt))
+        
+        with open_census() as f:
+            data = _generated_census_record(upload_id, portal, f, fmt, filename, file_size, content_sha256)
+            inserted_id = db.insert_record_streamed("Census_Portal_Excels", data)
+        
+        if inserted_id is None:
+            logger.error(f"Failed to insert generated census for {portal}: {filename}")
             return False
-            
-        data = {
-            "upload_id": upload_id,
-            "portal": portal,
-            "census": encoded_string,
-            "status": "Completed",
-            "log": f"Successfully generated census file: {os.path.basename(file_path)} ({file_size:,} bytes)"
-        }
         
-        db.insert_record("Census_Portal_Excels", data)
-        db.disconnect()
-        logger.info(f"Successfully inserted census for {portal} (Upload ID: {upload_id}) - {len(encoded_string):,} chars encoded")
+        if fmt == FORMAT_BASE64:
+            logger.info(f"Successfully inserted census for {portal} (Upload ID: {upload_id}) - {base64_encoded_length(file_size):,} chars encoded")
+        else:
+            logger.info(f"Successfully inserted census for {portal} (Upload ID: {upload_id}) - {file_size:,} bytes stored as {fmt}")
         return True
         
     except Exception as e:
         logger.error(f"Error inserting generated census for {portal}: {e}")
         logger.error(f"Full error details: {type(e).__name__}: {str(e)}")
-        
-        # Additional debugging info for permission errors
-        if "Permission denied" in str(e):
-            logger.error(f"File permissions issue detected. File: {file_path}")
-            if os.path.exists(file_path):
-                try:
-                    stat_info = os.stat(file_path)
-                    logger.error(f"File size: {stat_info.st_size} bytes, Modified: {time.ctime(stat_info.st_mtime)}")
-                except:
-                    logger.error("Unable to get file statistics")
-        
         return False
+    finally:
+        if owns_db and db is not None:
+            db.disconnect()
+
+def save_generated_census_to_file(census_id, output_path, chunk_size=DEFAULT_CHUNK_CHARS, db=None):
+    """
+    Write the generated census of a Census_Portal_Excels row to disk, whatever its storage format.
+
+    Rows written before blob storage (storage_format 'base64' or NULL) are decoded
+    from the `census` text, so old and new rows are served the same way.
+
+    Args:
+        census_id (int): Census_Portal_Excels ID
+        output_path (str): Where to write the workbook
+        chunk_size (int): Characters/bytes fetched per query
+        db: Connected database to use (a pooled connection when omitted)
+
+    Returns:
+        bool: True if the file was written, False otherwise
+    """
+    owns_db = db is None
+    try:
+        if owns_db:
+            db = _pooled_db()
+            if not db.connect():
+                logger.error(f"Failed to connect to database to read census {census_id}")
+                return False
+
+        row = db.fetch_one("SELECT storage_format, content_sha256 FROM Census_Portal_Excels WHERE id = %s", (census_id,))
+        if row is None:
+            logger.error(f"Census {census_id} not found")
+            return False
+        fmt = row['storage_format'] or FORMAT_BASE64
+
+        with atomic_write(output_path) as f:
+            if fmt == FORMAT_BASE64:
+                decoder = Base64StreamDecoder(f)
+                _stream_column(db, "Census_Portal_Excels", "census", census_id, decoder.feed, chunk_size)
+                decoder.close()
+            elif fmt in (FORMAT_BLOB, FORMAT_BLOB_GZIP):
+                writer = DecompressingWriter(f, compressed=is_gzip_format(fmt))
+                _stream_column(db, "Census_Portal_Excels", "census_blob", census_id, writer.write, chunk_size)
+                writer.close()
+            elif fmt in (FORMAT_FILE, FORMAT_FILE_GZIP):
+                _census_file_store.copy_to(row['content_sha256'], f, compressed=is_gzip_format(fmt))
+            else:
+                raise ValueError(f"Unknown storage format '{fmt}'")
+
+        return True
+    except Exception as e:
+        logger.error(f"Error saving census {census_id} to file {output_path}: {e}")
+        return False
+    finally:
+        if owns_db and db is not None:
+            db.disconnect()
 
 def insert_failed_census(upload_id, portal, failure_reason):
     """
@@ -188,8 +448,9 @@ def insert_failed_census(upload_id, portal, failure_reason):
     Returns:
         bool: True if successful, False otherwise
     """
+    db = None
     try:
-        db = MySQLDatabase(DB_HOST, DB_NAME, DB_USER, DB_PASSWORD)
+        db = _pooled_db()
         if not db.connect():
             logger.error(f"Failed to connect to database for failed {portal}")
             return False
@@ -203,13 +464,137 @@ def insert_failed_census(upload_id, portal, failure_reason):
         }
         
         db.insert_record("Census_Portal_Excels", data)
-        db.disconnect()
         logger.info(f"Inserted failed census record for {portal} (Upload ID: {upload_id}): {failure_reason}")
         return True
         
     except Exception as e:
         logger.error(f"Error inserting failed census record for {portal}: {e}")
         return False
+    finally:
+        if db is not None:
+            db.disconnect()
+
+class CensusResultBatch:
+    """
+    The Census_Portal_Excels rows of one request, written together with its final status.
+
+    add_generated()/add_failed() only queue rows; flush() inserts them and sets the
+    request status in the same transaction, on one connection. A request's results
+    and status therefore land together, or not at all when the worker has lost its
+    claim (another worker will redo it). Generated files are kept as the mappers
+    returned them and encoded while they are streamed to the driver during the
+    flush, so no encoded copy is ever held; failed rows go in one executemany.
+
+    Generated files larger than stream_bytes are streamed and committed as soon
+    as they are added instead, so big outputs are visible early and are not held
+    for the batch; those rows are outside the request transaction.
+    """
+
+    def __init__(self, upload_id, worker_id=None, storage_format=None, stream_bytes=None):
+        """
+        Args:
+            upload_id (int): The upload ID from Census_Excel_Uploads
+            worker_id (str): Claiming worker; the status update is fenced on it when set
+            storage_format: Overrides CENSUS_STORAGE_FORMAT for the generated files
+            stream_bytes: Overrides census_storage.stream_result_mb (0 batches every file)
+        """
+        self.upload_id = upload_id
+        self.worker_id = worker_id
+        self.storage_format = storage_format or CENSUS_STORAGE_FORMAT
+        self.stream_bytes = CENSUS_RESULT_STREAM_BYTES if stream_bytes is None else stream_bytes
+        self._rows = []
+
+    def __len__(self):
+        return len(self._rows)
+
+    def add_generated(self, portal, census, db=None):
+        """
+        Queue a GeneratedCensus for the portal (or store it right away when it is larger than stream_bytes).
+
+        Returns:
+            bool: False if the census is empty or could not be stored
+        """
+        if len(census) == 0:
+            logger.error(f"Generated census is empty: {census.filename}")
+            return False
+        if self.stream_bytes and len(census) > self.stream_bytes:
+            logger.info(f"Streaming {census.filename} for {portal} ({len(census):,} bytes) ahead of the batch")
+            return insert_generated_census(self.upload_id, portal, census, self.storage_format, db=db)
+
+        content_sha256 = None
+        if self.storage_format in (FORMAT_FILE, FORMAT_FILE_GZIP):
+            content_sha256 = _census_file_store.put(census.open(), compressed=is_gzip_format(self.storage_format))
+        self._rows.append((portal, census, content_sha256))
+        return True
+
+    def add_failed(self, portal, failure_reason):
+        """Queue a failed row for the portal with the reason in its log."""
+        logger.info(f"Failed census record queued for {portal} (Upload ID: {self.upload_id}): {failure_reason}")
+        self._rows.append((portal, None, f"FAILED: {failure_reason}"))
+
+    def flush(self, final_status, db=None):
+        """
+        Insert the queued rows and set the request's final status in one transaction.
+
+        Returns:
+            bool: True if committed; False if nothing was written (database error or lost claim)
+        """
+        with stage("db_insert"):
+            return self._flush(final_status, db)
+
+    def _flush(self, final_status, db):
+        owns_db = db is None
+        try:
+            if owns_db:
+                db = _pooled_db()
+                if not db.connect():
+                    logger.error(f"Failed to connect to database to finish request {self.upload_id}")
+                    return False
+
+            if not self._insert_rows(db):
+                logger.error(f"Failed to insert {len(self._rows)} census results for request {self.upload_id}")
+                db.rollback()
+                return False
+
+            if self.worker_id is None:
+                updated = db.execute_update("UPDATE Census_Excel_Uploads SET status = %s WHERE id = %s",
+                                            (final_status, self.upload_id), commit=False) is not None
+            else:
+                updated = _set_claimed_status(db, self.upload_id, final_status, self.worker_id, commit=False)
+            if not updated or not db.commit():
+                db.rollback()
+                return False
+
+            logger.info(f"Stored {len(self._rows)} census results and status '{final_status}' for request {self.upload_id}")
+            self._rows = []
+            return True
+        except Exception as e:
+            logger.error(f"Error finishing request {self.upload_id}: {e}")
+            if db is not None and db.connection is not None:
+                db.rollback()
+            return False
+        finally:
+            if owns_db and db is not None:
+                db.disconnect()
+
+    def _insert_rows(self, db):
+        """Insert the queued rows in order, inside the open transaction."""
+        # Failed rows fill only the base64-era columns; migration 002 defaults storage_format to 'base64'
+        failed_query = ("INSERT INTO Census_Portal_Excels (upload_id, portal, census, status, log) "
+                        "VALUES (%s, %s, %s, %s, %s)")
+        for generated, rows in groupby(self._rows, key=lambda row: row[1] is not None):
+            if not generated:
+                failed = [(self.upload_id, portal, "", "Failed", log) for portal, _, log in rows]
+                if db.execute_many(failed_query, failed, commit=False) is None:
+                    return False
+                continue
+            for portal, census, content_sha256 in rows:
+                with census.open() as f:
+                    data = _generated_census_record(self.upload_id, portal, f, self.storage_format,
+                                                    census.filename, len(census), content_sha256)
+                    if db.insert_record_streamed("Census_Portal_Excels", data, commit=False) is None:
+                        return False
+        return True
 
 def update_census_portal_status(upload_id, portal, status, log_message=None):
     """
@@ -224,8 +609,9 @@ def update_census_portal_status(upload_id, portal, status, log_message=None):
     Returns:
         bool: True if successful, False otherwise
     """
+    db = None
     try:
-        db = MySQLDatabase(DB_HOST, DB_NAME, DB_USER, DB_PASSWORD)
+        db = _pooled_db()
         if not db.connect():
             logger.error(f"Failed to connect to database for {portal}")
             return False
@@ -236,7 +622,6 @@ def update_census_portal_status(upload_id, portal, status, log_message=None):
             
         condition = f"upload_id = {upload_id} AND portal = '{portal}'"
         result = db.update_record("Census_Portal_Excels", update_data, condition)
-        db.disconnect()
         
         if result:
             logger.info(f"Updated {portal} status to {status} for upload {upload_id}")
@@ -248,3 +633,6 @@ def update_census_portal_status(upload_id, portal, status, log_message=None):
     except Exception as e:
         logger.error(f"Error updating census portal status for {portal}: {e}")
         return False
+    finally:
+        if db is not None:
+            db.disconnect()
@@ -0,0 +1,11 @@
+-- Claim/lease columns used by claim_next_census_upload so several census workers
+-- can share the Census_Excel_Uploads queue. Requires MySQL 8.0+ (SKIP LOCKED).
+
+ALTER TABLE Census_Excel_Uploads
+    ADD COLUMN worker_id VARCHAR(128) NULL,
+    ADD COLUMN lease_expires_at DATETIME NULL,
+    ADD COLUMN heartbeat_at DATETIME NULL;
+
+-- Serves the claim query: pending rows by age, and expired 'Processing' leases
+CREATE INDEX idx_census_uploads_claim ON Census_Excel_Uploads (status, created_at);
+CREATE INDEX idx_census_uploads_lease ON Census_Excel_Uploads (status, lease_expires_at);
@@ -0,0 +1,11 @@
+-- Binary storage for generated census files (census_storage.mode: blob | file).
+-- Existing rows keep their base64 `census` text and storage_format 'base64';
+-- save_generated_census_to_file reads both, so no data has to be rewritten.
+
+ALTER TABLE Census_Portal_Excels
+    ADD COLUMN storage_format VARCHAR(16) NOT NULL DEFAULT 'base64',
+    ADD COLUMN census_blob LONGBLOB NULL,
+    ADD COLUMN content_sha256 CHAR(64) NULL,
+    ADD COLUMN content_length BIGINT NULL;
+
+CREATE INDEX idx_census_portal_sha256 ON Census_Portal_Excels (content_sha256);
@@ -1,54 +1,32 @@
 import pandas as pd
 from datetime import datetime
-import os
-from src.utils.load_yaml import ATTACHMENTS_SAVE_DIR 
-from src.utils.load_yaml import ATTACHMENTS_SAVE_DIR, AURA_GENERATED_CENSUS_DIR, REFERRAL_FILE_STORE_DIR
-from src.utils.support_functions import get_replaced_referral_id
+from src.services.excel_service.census_frame import resolve_census_frame
+from src.services.excel_service.census_transforms import category_labels, parse_dates, relation_labels
+from src.services.excel_service.template_writer import write_new_sheet
+from src.utils.generated_census import generated_census
 
 # Define a function to calculate age based on DOB
 def calculate_age(dob):
     today = datetime.today()
     return today.year - dob.year - ((today.month, today.day) < (dob.month, dob.day))
 
-def aura_map_census_data(id):
+def aura_map_census_data(id, census_frame=None, output_dir=None):
 
-    census_filename = ""
-    if id == 'default':
-        for file_name in os.listdir(ATTACHMENTS_SAVE_DIR):
-            if not file_name.startswith("Medical__") and file_name.endswith(".xlsx"):
-                census_filename = file_name
-        
-        census_filepath = os.path.join(ATTACHMENTS_SAVE_DIR, census_filename)
-
-    else:
-        for file_name in os.listdir(os.path.join(REFERRAL_FILE_STORE_DIR, get_replaced_referral_id(id))):
-            if not file_name.startswith("Medical__") and file_name.endswith(".xlsx"):
-                census_filename = file_name
-
-        census_filepath = os.path.join(REFERRAL_FILE_STORE_DIR,get_replaced_referral_id(id), census_filename)
-
-    
-    # Load the Excel file
-    census_filepath = os.path.join(ATTACHMENTS_SAVE_DIR, census_filename)
+    census = resolve_census_frame(id, census_frame)
 
     # Load the data from 'Sheet1'
-    sheet1_data = pd.read_excel(census_filepath, sheet_name='Sheet1')
-    # Load the data from 'Nationality_Updated'
-    nationality_df = pd.read_excel(
-            census_filepath, sheet_name="Nationality_Updated")
-
-    # Mappings
-    nationality_mapping = dict(
-        zip(nationality_df['AL SAGR'], nationality_df['TAKAFUL EMARAT']))
+    sheet1_data = census.members()
+    # Nationality codes from 'Nationality_Updated'
+    nationalities = census.nationality_index().lookup(sheet1_data['Nationality'], 'TAKAFUL EMARAT')
     # Create the auto-incrementing 'S. No.' and 'Employee No.' columns
     sheet1_data['S. No.'] = range(1, len(sheet1_data) + 1)
     sheet1_data['Employee No'] = range(1, 1 + len(sheet1_data))  
 
     # Replace 'Principal' with 'Employee' in the 'Relation' column
-    sheet1_data['Relation'] = sheet1_data['Relation'].replace('Principal', 'Employee')
+    sheet1_data['Relation'] = relation_labels(sheet1_data['Relation'])
 
     # Modify the 'Category' column to add "Category" before each value
-    sheet1_data['Category'] = sheet1_data['Category'].apply(lambda x: f"Category {x}")
+    sheet1_data['Category'] = category_labels(sheet1_data['Category'], "Category ")
 
     # Map the original data to the new structure
     new_structure = pd.DataFrame({
@@ -57,22 +35,19 @@ def aura_map_census_data(id):
         'Employee Name': sheet1_data['Beneficiary First Name'],	
         'Relationship': sheet1_data['Relation'],
         # 'Date of Birth (MM/DD/YY)': pd.to_datetime(sheet1_data['DOB']).dt.strftime('%m/%d/%y'),
-        'Date of Birth (DD/MM/YY)': pd.to_datetime(sheet1_data['DOB']).dt.date,
+        'Date of Birth (DD/MM/YY)': parse_dates(sheet1_data['DOB'], engine=census.dates).dt.date,
         'Gender': sheet1_data['Gender'],
         'Marital Status': sheet1_data['Marital status'],
-        'Nationality': sheet1_data['Nationality'].map(nationality_mapping),
+        'Nationality': nationalities,
         'Visa Issuance Emirates': sheet1_data['Visa Issued Emirates'],
         'Category': sheet1_data['Category'],
         'Member Type': sheet1_data['Salary Type'],
     })
 
-    # Define the file path for saving
-    output_file_path = os.path.join(AURA_GENERATED_CENSUS_DIR, "aura_map.xlsx")
-
-    # Create the directory if it doesn't exist
-    os.makedirs(os.path.dirname(output_file_path), exist_ok=True)
-
-    # Save the new structure to an Excel file
-    new_structure.to_excel(output_file_path, index=False)
+    # Build the new structure as an Excel file, streamed row by row; missing values write no cell, as in to_excel
+    rows = new_structure.astype(object).where(new_structure.notna(), None).values.tolist()
+    generated = generated_census("aura_map.xlsx", lambda output: write_new_sheet(output, rows, header=list(new_structure.columns)),
+                                 output_dir)
 
-    print(f"File saved at: {output_file_path}")
+    print(f"File generated: {generated.filename} ({len(generated):,} bytes)")
+    return generated
@@ -0,0 +1,174 @@
+import os
+from dataclasses import dataclass, field
+
+import pandas as pd
+
+from src.services.excel_service.date_engine import DateEngine
+from src.services.excel_service.nationality_index import NationalityIndex
+from src.utils.load_yaml import ATTACHMENTS_SAVE_DIR, REFERRAL_FILE_STORE_DIR
+from src.utils.support_functions import get_replaced_referral_id
+from src.utils.logger import logger
+
+CENSUS_SHEET_NAME = "Sheet1"
+REQUEST_SHEET_NAME = "Sheet2"
+# Referral uploads historically used "National_Updated" for the same sheet
+NATIONALITY_SHEET_NAMES = ("Nationality_Updated", "National_Updated")
+
+
+def _normalize_columns(df):
+    """Strip stray whitespace from header names so mappers can index columns reliably."""
+    df.columns = [col.strip() if isinstance(col, str) else col for col in df.columns]
+    return df
+
+
+@dataclass(frozen=True, eq=False)
+class CensusFrame:
+    """
+    Parsed census workbook shared by every mapper of a request.
+
+    The workbook is read once; mappers get their own copies of the sheets through
+    the accessor methods so one portal's transformations never leak into another's.
+    The nationality sheet is also compiled once into a read-only NationalityIndex,
+    and `dates` parses date columns for all of the request's mappers with one memo.
+    """
+    source_path: str
+    _members: pd.DataFrame
+    _nationality: pd.DataFrame = None
+    _request_details: pd.DataFrame = None
+    _nationality_index: NationalityIndex = field(default=None, init=False, repr=False)
+    dates: DateEngine = field(default_factory=DateEngine, init=False, repr=False)
+
+    def __post_init__(self):
+        if self._nationality is not None:
+            object.__setattr__(self, "_nationality_index", NationalityIndex(self._nationality))
+
+    def __len__(self):
+        return len(self._members)
+
+    @property
+    def has_nationality(self):
+        return self._nationality is not None
+
+    @property
+    def has_request_details(self):
+        return self._request_details is not None
+
+    def members(self):
+        """Return a copy of the member rows (Sheet1)."""
+        return self._members.copy()
+
+    def nationality(self):
+        """
+        Return a copy of the nationality mapping table.
+
+        Raises:
+            ValueError: If the workbook had no nationality sheet, matching pandas.read_excel.
+        """
+        if self._nationality is None:
+            raise ValueError(f"Worksheet named '{NATIONALITY_SHEET_NAMES[0]}' not found in {os.path.basename(self.source_path)}")
+        return self._nationality.copy()
+
+    def nationality_index(self):
+        """
+        Return the shared lookup index over the nationality sheet.
+
+        Raises:
+            ValueError: If the workbook had no nationality sheet, as nationality() does.
+        """
+        if self._nationality_index is None:
+            raise ValueError(f"Worksheet named '{NATIONALITY_SHEET_NAMES[0]}' not found in {os.path.basename(self.source_path)}")
+        return self._nationality_index
+
+    def request_details(self):
+        """
+        Return a copy of the request details sheet (Sheet2).
+
+        Raises:
+            ValueError: If the workbook had no Sheet2, matching pandas.read_excel.
+        """
+        if self._request_details is None:
+            raise ValueError(f"Worksheet named '{REQUEST_SHEET_NAME}' not found in {os.path.basename(self.source_path)}")
+        return self._request_details.copy()
+
+
+def load_census_frame(file_path):
+    """
+    Parse a census workbook once into a CensusFrame.
+
+    Args:
+        file_path: Path to the uploaded census workbook
+
+    Returns:
+        CensusFrame: Members, nationality table and request details (when present)
+    """
+    if not os.path.exists(file_path):
+        raise FileNotFoundError(f"Census file not found at: {file_path}")
+
+    with pd.ExcelFile(file_path) as workbook:
+        members = _normalize_columns(workbook.parse(CENSUS_SHEET_NAME))
+
+        nationality = None
+        for sheet_name in NATIONALITY_SHEET_NAMES:
+            if sheet_name in workbook.sheet_names:
+                nationality = _normalize_columns(workbook.parse(sheet_name))
+                break
+
+        request_details = None
+        if REQUEST_SHEET_NAME in workbook.sheet_names:
+            request_details = _normalize_columns(workbook.parse(REQUEST_SHEET_NAME))
+
+    logger.info(f"Census parsed from {os.path.basename(file_path)}: {len(members)} members, "
+                f"nationality sheet {'found' if nationality is not None else 'missing'}")
+    return CensusFrame(file_path, members, nationality, request_details)
+
+
+def census_input_dir(id):
+    """Directory holding the census for a processing id: the attachments dir for 'default', else the referral folder."""
+    if id == 'default':
+        return ATTACHMENTS_SAVE_DIR
+    return os.path.join(REFERRAL_FILE_STORE_DIR, get_replaced_referral_id(id))
+
+
+def find_census_file(id):
+    """
+    Locate the census workbook for a processing id.
+
+    Only used when a mapper is called without an explicit input. Medical__ files
+    are not census workbooks; when several workbooks remain, the most recently
+    written one is used (ties broken by name) rather than whichever listdir
+    returned last.
+
+    Args:
+        id: 'default' for the attachments directory, otherwise a referral id
+
+    Returns:
+        str: Path to the census workbook
+    """
+    directory = census_input_dir(id)
+    candidates = [os.path.join(directory, file_name) for file_name in os.listdir(directory)
+                  if not file_name.startswith("Medical__") and file_name.endswith(".xlsx")]
+
+    if not candidates:
+        raise FileNotFoundError(f"No census file found in {directory}")
+    if len(candidates) > 1:
+        logger.warning(f"{len(candidates)} census workbooks in {directory}; using the most recent")
+
+    return max(candidates, key=lambda path: (os.path.getmtime(path), path))
+
+
+def resolve_census_frame(id, census_frame=None):
+    """
+    Return the census a mapper should work from.
+
+    Args:
+        id: Processing id, only used to look the workbook up when no input is given
+        census_frame: The request's parsed CensusFrame, or the path of the census workbook
+
+    Returns:
+        CensusFrame: The shared frame as is, otherwise the parsed workbook
+    """
+    if isinstance(census_frame, CensusFrame):
+        return census_frame
+    if census_frame is not None:
+        return load_census_frame(os.fspath(census_frame))
+    return load_census_frame(find_census_file(id))
@@ -0,0 +1,79 @@
+import numpy as np
+import pandas as pd
+
+from src.services.excel_service.date_engine import DateEngine
+
+INVALID_DOB = "Invalid DOB"
+
+# Value maps shared by the portal mappers; values not listed are passed through unchanged
+RELATION_LABELS = {'Principal': 'Employee'}
+GENDER_CODES = {'Male': 'M', 'Female': 'F'}
+MARITAL_CODES = {'Single': 'S', 'Married': 'M'}
+EMIRATE_CODES = {'Dubai': 'DXB'}
+
+
+def column_or(df, column, default=""):
+    """Whole-column equivalent of row.get(column, default)."""
+    if column in df.columns:
+        return df[column]
+    return pd.Series(default, index=df.index, dtype=object)
+
+
+def replace_values(series, mapping):
+    """Whole-column equivalent of mapping.get(x, x): mapped values are replaced, others kept."""
+    return series.map(mapping).where(series.isin(list(mapping)), series)
+
+
+def map_values(series, mapping, default):
+    """Whole-column equivalent of mapping.get(x, default)."""
+    return series.map(mapping).where(series.isin(list(mapping)), default)
+
+
+def choose(condition, if_true, if_false):
+    """Whole-column equivalent of `if_true if condition else if_false`."""
+    return pd.Series(np.where(condition, if_true, if_false), index=condition.index, dtype=object)
+
+
+def relation_labels(series):
+    return replace_values(series, RELATION_LABELS)
+
+
+def gender_codes(series):
+    return replace_values(series, GENDER_CODES)
+
+
+def marital_codes(series):
+    return replace_values(series, MARITAL_CODES)
+
+
+def emirate_codes(series, extra=None):
+    return replace_values(series, {**EMIRATE_CODES, **(extra or {})})
+
+
+def category_labels(series, prefix):
+    """Prefix every category, e.g. 'A' -> 'Category A'."""
+    return prefix + series.astype(str)
+
+
+def parse_dates(series, dayfirst=False, formats=None, engine=None):
+    """
+    Parse a whole column of dates at once.
+
+    Without `formats` every value is read the way pandas.to_datetime reads a single
+    value (format='mixed'). With `formats`, datetime values are kept, strings are
+    stripped and tried against each format in turn (first match wins, like a
+    strptime loop) and anything else is invalid.
+
+    Pass the upload's CensusFrame.dates as `engine` so strings already parsed by
+    another mapper of the request are not parsed again.
+
+    Returns:
+        pd.Series: datetime64 values, NaT where the value could not be parsed
+    """
+    return (engine or DateEngine()).parse(series, dayfirst=dayfirst, formats=formats)
+
+
+def format_dates(series, output_format, dayfirst=False, formats=None, invalid=INVALID_DOB, engine=None):
+    """Parse a column of dates (see parse_dates) and format them as strings, `invalid` where unparseable."""
+    parsed = parse_dates(series, dayfirst=dayfirst, formats=formats, engine=engine)
+    return parsed.dt.strftime(output_format).where(parsed.notna(), invalid)
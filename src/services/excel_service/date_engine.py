@@ -0,0 +1,153 @@
+import threading
+import warnings
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+from pandas.tseries.api import guess_datetime_format
+
+from src.utils.logger import logger
+
+# Raw values remembered per parsing mode; beyond this only the latest column's values are kept
+MEMO_LIMIT = 200_000
+# Resolution pd.to_datetime gives parsed dates (ns on pandas 2, us on pandas 3)
+DATETIME_DTYPE = pd.to_datetime(pd.Series(["2000-01-01", datetime(2000, 1, 1)], dtype=object), format='mixed').dtype
+# Whether mixed parsing reads ISO strings as year-month-day with dayfirst set (pandas 3 reads year-day-month)
+ISO_IGNORES_DAYFIRST = pd.to_datetime(pd.Series(["2000-01-02"]), dayfirst=True, format='mixed')[0].day == 2
+
+
+class DateEngine:
+    """
+    Whole-column date parsing shared by the mappers of one upload.
+
+    Each distinct raw string is parsed once: values are deduplicated per column and
+    remembered across calls, so the ten mappers of a request that all read the same
+    DOB column do the work once. Strings are parsed format by format over the
+    still-unparsed remainder, each pass a single vectorized to_datetime.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._memo = {}      # (dayfirst, formats) -> (Index of raw strings, their datetime64 values)
+        self._inferred = {}  # dayfirst -> ISO format guessed from the upload's first date string, or None
+        self._counts = {"values": 0, "parsed_strings": 0, "unparseable": 0}
+
+    def __getstate__(self):
+        # Sent to mapper processes without the lock; each process keeps its own memo
+        state = self.__dict__.copy()
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def parse(self, series, dayfirst=False, formats=None):
+        """
+        Parse a column of dates. See census_transforms.parse_dates for the rules.
+
+        Returns:
+            pd.Series: datetime64 values, NaT where the value could not be parsed
+        """
+        if pd.api.types.is_datetime64_dtype(series):
+            return series
+
+        values = series.to_numpy(dtype=object)
+        is_str = np.fromiter((isinstance(value, str) for value in values), dtype=bool, count=len(values))
+        parsed = np.full(len(values), np.datetime64("NaT"), dtype=DATETIME_DTYPE)
+        if formats is None:
+            if not is_str.all():
+                parsed[~is_str] = pd.to_datetime(series[~is_str], errors='coerce', dayfirst=dayfirst, format='mixed')
+            strings = values[is_str]
+        else:
+            is_datetime = np.fromiter((isinstance(value, datetime) and pd.notnull(value) for value in values),
+                                      dtype=bool, count=len(values))
+            if is_datetime.any():
+                parsed[is_datetime] = pd.to_datetime(series[is_datetime], errors='coerce')
+            strings = np.array([value.strip() for value in values[is_str]], dtype=object)
+
+        if len(strings):
+            parsed[is_str] = self._parse_strings(strings, dayfirst, tuple(formats) if formats else None)
+
+        parsed = pd.Series(parsed, index=series.index)
+        unparseable = int(parsed.isna().sum())
+        with self._lock:
+            self._counts["values"] += len(series)
+            self._counts["unparseable"] += unparseable
+        if unparseable:
+            logger.warning(f"{unparseable} of {len(series)} dates could not be parsed")
+        return parsed
+
+    def _parse_strings(self, strings, dayfirst, formats):
+        """Return the parsed dates of an array of strings, parsing only the distinct values not seen before."""
+        key = (dayfirst, formats)
+        with self._lock:
+            known, known_dates = self._memo.get(key, (pd.Index([], dtype=object), np.array([], dtype=DATETIME_DTYPE)))
+
+        distinct = pd.unique(strings)
+        unseen = distinct[known.get_indexer(distinct) < 0]
+        if len(unseen):
+            known = known.append(pd.Index(unseen, dtype=object))
+            known_dates = np.concatenate([known_dates, self._parse_distinct(unseen, dayfirst, formats)])
+        # Looked up before the memo is trimmed, so every string of this column is in `known`
+        parsed = known_dates[known.get_indexer(strings)]
+
+        if len(unseen):
+            if len(known) > MEMO_LIMIT:
+                positions = known.get_indexer(distinct)
+                known, known_dates = pd.Index(distinct, dtype=object), known_dates[positions]
+            with self._lock:
+                self._memo[key] = (known, known_dates)
+                self._counts["parsed_strings"] += len(unseen)
+
+        return parsed
+
+    def _parse_distinct(self, strings, dayfirst, formats):
+        """Parse distinct strings format by format, each pass over what the previous passes left."""
+        dates = np.full(len(strings), np.datetime64("NaT"), dtype=DATETIME_DTYPE)
+        if formats is None:
+            inferred = self._inferred_format(strings[0], dayfirst)
+            passes = [inferred, 'mixed'] if inferred else ['mixed']
+        else:
+            passes = list(formats)
+
+        pending = np.arange(len(strings))
+        for fmt in passes:
+            if not len(pending):
+                break
+            if fmt == 'mixed':
+                attempt = pd.to_datetime(strings[pending], errors='coerce', dayfirst=dayfirst, format=fmt)
+            else:
+                attempt = pd.to_datetime(strings[pending], errors='coerce', format=fmt)
+            matched = attempt.notna()
+            dates[pending[matched]] = attempt[matched]
+            pending = pending[~matched]
+        return dates
+
+    def _inferred_format(self, sample, dayfirst):
+        """
+        Guess the upload's date format from its first string, once per upload.
+
+        Only ISO dates (year-month-day) are guessed: pandas parses an explicit ISO
+        format faster than mixed, and mixed parsing reads them the same way whatever
+        `dayfirst` says. Other formats are parsed faster by the mixed pass itself.
+        Strings the guess does not fit fall through to mixed parsing.
+        """
+        if dayfirst and not ISO_IGNORES_DAYFIRST:
+            return None
+        with self._lock:
+            if dayfirst in self._inferred:
+                return self._inferred[dayfirst]
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            fmt = guess_datetime_format(sample.strip())
+        if not (fmt and fmt.startswith("%Y-%m-%d")) or "%z" in fmt or "%Z" in fmt:
+            fmt = None
+        with self._lock:
+            self._inferred[dayfirst] = fmt
+        return fmt
+
+    def stats(self):
+        """Values seen, distinct strings actually parsed and unparseable values, since the engine was created."""
+        with self._lock:
+            return dict(self._counts)
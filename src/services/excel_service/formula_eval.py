@@ -0,0 +1,617 @@
+import fnmatch
+import math
+import re
+from datetime import date, datetime, timedelta
+
+from openpyxl.formula.tokenizer import Token, Tokenizer
+from openpyxl.utils.cell import column_index_from_string
+from openpyxl.utils.datetime import to_excel
+
+
+class FormulaError(Exception):
+    """A formula uses something this evaluator does not support (function, sheet reference, defined name...)."""
+
+
+class ExcelError:
+    """An Excel error value (#N/A, #VALUE!, ...) produced by a formula; it propagates like in Excel."""
+    __slots__ = ("code",)
+
+    def __init__(self, code):
+        self.code = code
+
+    def __eq__(self, other):
+        return isinstance(other, ExcelError) and other.code == self.code
+
+    def __hash__(self):
+        return hash(self.code)
+
+    def __repr__(self):
+        return self.code
+
+
+NA = ExcelError("#N/A")
+VALUE = ExcelError("#VALUE!")
+DIV0 = ExcelError("#DIV/0!")
+NUM = ExcelError("#NUM!")
+REF = ExcelError("#REF!")
+_ERRORS = {error.code: error for error in (NA, VALUE, DIV0, NUM, REF, ExcelError("#NAME?"), ExcelError("#NULL!"))}
+
+# Locale every headless stand-in for Excel reads ambiguous text dates in: en-US, month first, so
+# "03/04/1990" is 4 March. Excel does the same with text written through COM, and requests send
+# effective dates that way ("03/15/2025"). Mappers parsing text the way Excel would use it too.
+EXCEL_TEXT_DATES_DAYFIRST = False
+# Text that arithmetic coerces to dates ("03/15/2025" - A1)
+_SLASH_DATE_FORMATS = ("%d/%m/%Y", "%d/%m/%y") if EXCEL_TEXT_DATES_DAYFIRST else ("%m/%d/%Y", "%m/%d/%y")
+_DATE_TEXT_FORMATS = _SLASH_DATE_FORMATS + ("%Y-%m-%d", "%d-%b-%Y", "%d-%b-%y", "%d %B %Y", "%Y-%m-%d %H:%M:%S")
+_REF_RE = re.compile(r'^\$?([A-Z]{1,3})\$?(\d+)(?::\$?([A-Z]{1,3})\$?(\d+))?$')
+
+# Binary operator precedence, lowest first; unary minus binds tighter than all of them, % tighter still
+_PRECEDENCE = {"=": 1, "<>": 1, "<": 1, ">": 1, "<=": 1, ">=": 1, "&": 2, "+": 3, "-": 3, "*": 4, "/": 4, "^": 5}
+_UNARY_PRECEDENCE = 6
+
+
+# --- Parsing ----------------------------------------------------------------------------------
+
+class _Parser:
+    """Recursive-descent parser from openpyxl's formula tokens to nested tuples."""
+
+    def __init__(self, formula):
+        self.formula = formula
+        self.tokens = [token for token in Tokenizer(f"={formula}").items if token.type != Token.WSPACE]
+        self.position = 0
+
+    def parse(self):
+        node = self._expression(0)
+        if self.position != len(self.tokens):
+            raise FormulaError(f"Unexpected '{self.tokens[self.position].value}' in {self.formula}")
+        return node
+
+    def _peek(self):
+        return self.tokens[self.position] if self.position < len(self.tokens) else None
+
+    def _next(self):
+        token = self._peek()
+        if token is None:
+            raise FormulaError(f"Unexpected end of {self.formula}")
+        self.position += 1
+        return token
+
+    def _expression(self, min_precedence):
+        left = self._prefix()
+        while True:
+            token = self._peek()
+            if token is not None and token.type == Token.OP_POST:
+                self.position += 1
+                left = ("percent", left)
+                continue
+            if token is None or token.type != Token.OP_IN or _PRECEDENCE.get(token.value, 0) < min_precedence:
+                return left
+            if token.value not in _PRECEDENCE:
+                raise FormulaError(f"Unsupported operator '{token.value}' in {self.formula}")
+            self.position += 1
+            precedence = _PRECEDENCE[token.value]
+            right = self._expression(precedence + 1)
+            left = ("op", token.value, left, right)
+
+    def _prefix(self):
+        token = self._next()
+        if token.type == Token.OP_PRE:
+            operand = self._expression(_UNARY_PRECEDENCE)
+            return ("negate", operand) if token.value == "-" else operand
+        if token.type == Token.OPERAND:
+            return self._operand(token)
+        if token.type == Token.FUNC and token.subtype == Token.OPEN:
+            return self._call(token.value[:-1].upper())
+        if token.type == Token.PAREN and token.subtype == Token.OPEN:
+            node = self._expression(0)
+            closing = self._next()
+            if closing.type != Token.PAREN:
+                raise FormulaError(f"Unbalanced parentheses in {self.formula}")
+            return node
+        raise FormulaError(f"Unexpected '{token.value}' in {self.formula}")
+
+    def _operand(self, token):
+        if token.subtype == Token.NUMBER:
+            return ("value", float(token.value))
+        if token.subtype == Token.TEXT:
+            return ("value", token.value[1:-1].replace('""', '"'))
+        if token.subtype == Token.LOGICAL:
+            return ("value", token.value.upper() == "TRUE")
+        if token.subtype == Token.ERROR:
+            return ("value", _ERRORS.get(token.value.upper(), VALUE))
+        match = _REF_RE.match(token.value.upper())
+        if match is None:
+            raise FormulaError(f"Unsupported reference '{token.value}' in {self.formula}")
+        first_column, first_row, last_column, last_row = match.groups()
+        min_col, min_row = column_index_from_string(first_column), int(first_row)
+        max_col, max_row = (column_index_from_string(last_column), int(last_row)) if last_column else (min_col, min_row)
+        return ("ref", min(min_row, max_row), min(min_col, max_col), max(min_row, max_row), max(min_col, max_col))
+
+    def _call(self, name):
+        args = []
+        while True:
+            token = self._peek()
+            if token is None:
+                raise FormulaError(f"Unclosed {name}( in {self.formula}")
+            if token.type == Token.FUNC and token.subtype == Token.CLOSE:
+                self.position += 1
+                if self.tokens[self.position - 2].type == Token.SEP:  # Trailing empty argument, e.g. IF(A1,B1,)
+                    args.append(("missing",))
+                return ("call", name, args)
+            if token.type == Token.SEP:
+                self.position += 1
+                args.append(("missing",))
+                continue
+            args.append(self._expression(0))
+            token = self._next()
+            if token.type == Token.FUNC and token.subtype == Token.CLOSE:
+                return ("call", name, args)
+            if token.type != Token.SEP:
+                raise FormulaError(f"Expected ',' in {name}( in {self.formula}")
+
+
+def parse_formula(formula):
+    """Parse a formula (without the leading '=') into an expression tree."""
+    return _Parser(formula).parse()
+
+
+# --- Values -----------------------------------------------------------------------------------
+
+class Range:
+    """A rectangular block of cells, evaluated lazily through the sheet."""
+
+    def __init__(self, sheet, min_row, min_col, max_row, max_col):
+        self.sheet = sheet
+        self.min_row, self.min_col, self.max_row, self.max_col = min_row, min_col, max_row, max_col
+
+    @property
+    def shape(self):
+        return self.max_row - self.min_row + 1, self.max_col - self.min_col + 1
+
+    def rows(self):
+        return [[self.sheet.value(row, column) for column in range(self.min_col, self.max_col + 1)]
+                for row in range(self.min_row, self.max_row + 1)]
+
+    def values(self):
+        return [value for row in self.rows() for value in row]
+
+    def non_empty_count(self):
+        """COUNTA: cells with a value, including formulas that return ""."""
+        return sum(1 for row in range(self.min_row, self.max_row + 1) for column in range(self.min_col, self.max_col + 1)
+                   if self.sheet.has_formula(row, column) or self.sheet.value(row, column) is not None)
+
+
+def _scalar(value):
+    if isinstance(value, Range):
+        if value.shape == (1, 1):
+            return value.sheet.value(value.min_row, value.min_col)
+        return VALUE
+    return value
+
+
+def _text_to_number(text):
+    try:
+        return float(text.strip())
+    except ValueError:
+        pass
+    for fmt in _DATE_TEXT_FORMATS:
+        try:
+            return float(to_excel(datetime.strptime(text.strip(), fmt)))
+        except ValueError:
+            continue
+    return VALUE
+
+
+def to_number(value):
+    value = _scalar(value)
+    if value is None:
+        return 0.0
+    if isinstance(value, bool):
+        return float(value)
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str):
+        return _text_to_number(value) if value else VALUE
+    return value  # ExcelError
+
+
+def to_text(value):
+    value = _scalar(value)
+    if value is None:
+        return ""
+    if isinstance(value, bool):
+        return "TRUE" if value else "FALSE"
+    if isinstance(value, (int, float)):
+        return format_number(value)
+    return value
+
+
+def to_bool(value):
+    value = _scalar(value)
+    if value is None:
+        return False
+    if isinstance(value, (bool, int, float)):
+        return bool(value)
+    if isinstance(value, str):
+        if value.upper() in ("TRUE", "FALSE"):
+            return value.upper() == "TRUE"
+        return VALUE
+    return value
+
+
+def format_number(number):
+    """A number as Excel's General format shows it in text (1.0 -> "1")."""
+    if float(number).is_integer() and abs(number) < 1e15:
+        return str(int(number))
+    return format(number, ".15g")
+
+
+def _type_rank(value):
+    return 2 if isinstance(value, bool) else 1 if isinstance(value, str) else 0
+
+
+def _compare(left, right):
+    """-1 / 0 / 1 with Excel's ordering: numbers < text < logicals, text compared case-insensitively."""
+    if left is None:
+        left = "" if isinstance(right, str) else False if isinstance(right, bool) else 0.0
+    if right is None:
+        right = "" if isinstance(left, str) else False if isinstance(left, bool) else 0.0
+    left_rank, right_rank = _type_rank(left), _type_rank(right)
+    if left_rank != right_rank:
+        return -1 if left_rank < right_rank else 1
+    if isinstance(left, str):
+        left, right = left.lower(), right.lower()
+    return (left > right) - (left < right)
+
+
+def _first_error(*values):
+    return next((value for value in values if isinstance(value, ExcelError)), None)
+
+
+def _criteria_matcher(criteria):
+    """Predicate for COUNTIF-style criteria: 5, "Yes", ">=21", "<>Error", "A*"."""
+    criteria = _scalar(criteria)
+    if isinstance(criteria, bool) or isinstance(criteria, (int, float)):
+        return lambda value: not isinstance(value, ExcelError) and value is not None and \
+            _type_rank(value) == _type_rank(criteria) and _compare(value, criteria) == 0
+    text = to_text(criteria)
+    operator = next((op for op in ("<=", ">=", "<>", "<", ">", "=") if text.startswith(op)), "")
+    operand = text[len(operator):]
+    number = _text_to_number(operand) if operand else VALUE
+    if not isinstance(number, ExcelError):
+        def numeric(value):
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                return operator == "<>"
+            result = _compare(float(value), number)
+            return {"": result == 0, "=": result == 0, "<>": result != 0, "<": result < 0,
+                    ">": result > 0, "<=": result <= 0, ">=": result >= 0}[operator]
+        return numeric
+    if operator in ("", "=", "<>"):
+        if operand == "":
+            blank = (lambda value: value is None or value == "")
+            return (lambda value: not blank(value)) if operator == "<>" else blank
+        pattern = operand.lower().replace("[", "[[]")
+        equal = (lambda value: isinstance(value, str) and fnmatch.fnmatchcase(value.lower(), pattern))
+        return (lambda value: not equal(value)) if operator == "<>" else equal
+
+    def ordered(value):
+        if not isinstance(value, str):
+            return False
+        result = _compare(value, operand)
+        return {"<": result < 0, ">": result > 0, "<=": result <= 0, ">=": result >= 0}[operator]
+    return ordered
+
+
+def _lookup_equal(value, candidate):
+    if isinstance(value, str) and ("*" in value or "?" in value):
+        return isinstance(candidate, str) and fnmatch.fnmatchcase(candidate.lower(), value.lower())
+    return candidate is not None and _type_rank(value) == _type_rank(candidate) and _compare(value, candidate) == 0
+
+
+def _lookup_position(value, candidates, exact):
+    """0-based position of `value` in `candidates` (exact, or the last entry <= value for sorted data)."""
+    if exact:
+        return next((index for index, candidate in enumerate(candidates) if _lookup_equal(value, candidate)), None)
+    position = None
+    for index, candidate in enumerate(candidates):
+        if candidate is None or _type_rank(candidate) != _type_rank(value):
+            continue
+        if _compare(candidate, value) > 0:
+            break
+        position = index
+    return position
+
+
+# --- Functions --------------------------------------------------------------------------------
+
+def _fn_and(*args):
+    return _logical(args, all)
+
+
+def _fn_or(*args):
+    return _logical(args, any)
+
+
+def _logical(args, combine):
+    flags = []
+    for arg in args:
+        values = arg.values() if isinstance(arg, Range) else [arg]
+        for value in values:
+            if isinstance(value, ExcelError):
+                return value
+            if isinstance(arg, Range) and (value is None or isinstance(value, str)):
+                continue  # Text and blanks in ranges are ignored
+            flag = to_bool(value)
+            if isinstance(flag, ExcelError):
+                return flag
+            flags.append(flag)
+    return combine(flags) if flags else VALUE
+
+
+def _fn_counta(*args):
+    return float(sum(arg.non_empty_count() if isinstance(arg, Range) else int(arg is not None) for arg in args))
+
+
+def _fn_count(*args):
+    count = 0
+    for arg in args:
+        if isinstance(arg, Range):
+            count += sum(1 for value in arg.values() if isinstance(value, (int, float)) and not isinstance(value, bool))
+        elif not isinstance(to_number(arg), ExcelError):
+            count += 1
+    return float(count)
+
+
+def _fn_countif(cells, criteria):
+    if not isinstance(cells, Range):
+        return VALUE
+    matches = _criteria_matcher(criteria)
+    return float(sum(1 for value in cells.values() if matches(value)))
+
+
+def _fn_sum(*args):
+    total = 0.0
+    for arg in args:
+        if isinstance(arg, Range):
+            for value in arg.values():
+                if isinstance(value, ExcelError):
+                    return value
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    total += value
+        else:
+            number = to_number(arg)
+            if isinstance(number, ExcelError):
+                return number
+            total += number
+    return total
+
+
+def _fn_left(text, count=1.0):
+    return _slice_text(text, count, lambda value, n: value[:n])
+
+
+def _fn_right(text, count=1.0):
+    return _slice_text(text, count, lambda value, n: value[-n:] if n else "")
+
+
+def _slice_text(text, count, take):
+    text, count = to_text(text), to_number(count)
+    error = _first_error(text, count)
+    if error:
+        return error
+    if count < 0:
+        return VALUE
+    return take(text, int(count))
+
+
+def _fn_find(needle, haystack, start=1.0):
+    needle, haystack, start = to_text(needle), to_text(haystack), to_number(start)
+    error = _first_error(needle, haystack, start)
+    if error:
+        return error
+    if start < 1 or start > len(haystack) + 1:
+        return VALUE
+    position = haystack.find(needle, int(start) - 1)
+    return float(position + 1) if position >= 0 else VALUE
+
+
+def _fn_vlookup(value, table, column, approximate=True):
+    value, column, approximate = _scalar(value), to_number(column), to_bool(approximate)
+    error = _first_error(value, column, approximate)
+    if error:
+        return error
+    if not isinstance(table, Range):
+        return VALUE
+    rows = table.rows()
+    if column < 1 or column > table.shape[1]:
+        return REF
+    position = _lookup_position(value, [row[0] for row in rows], exact=not approximate)
+    if position is None:
+        return NA
+    result = rows[position][int(column) - 1]
+    return 0.0 if result is None else result
+
+
+def _fn_match(value, cells, match_type=1.0):
+    value, match_type = _scalar(value), to_number(match_type)
+    error = _first_error(value, match_type)
+    if error:
+        return error
+    if not isinstance(cells, Range) or 1 not in cells.shape:
+        return NA
+    if match_type < 0:
+        raise FormulaError("MATCH with match_type -1 is not supported")
+    position = _lookup_position(value, cells.values(), exact=match_type == 0)
+    return NA if position is None else float(position + 1)
+
+
+def _fn_index(cells, row, column=None):
+    row, column = to_number(row), to_number(column) if column is not None else None
+    error = _first_error(row, column)
+    if error:
+        return error
+    if not isinstance(cells, Range):
+        return VALUE
+    rows, columns = cells.shape
+    if column is None:
+        row, column = (row, 1.0) if columns == 1 else (1.0, row) if rows == 1 else (row, 0.0)
+    if not (1 <= row <= rows and 1 <= column <= columns):
+        return REF
+    result = cells.sheet.value(cells.min_row + int(row) - 1, cells.min_col + int(column) - 1)
+    return 0.0 if result is None else result
+
+
+def _fn_date(year, month, day):
+    year, month, day = to_number(year), to_number(month), to_number(day)
+    error = _first_error(year, month, day)
+    if error:
+        return error
+    year, month, day = int(year), int(month), int(day)
+    if year < 1900:
+        year += 1900
+    year, month = year + (month - 1) // 12, (month - 1) % 12 + 1
+    try:
+        return float(to_excel(date(year, month, 1) + timedelta(days=day - 1)))
+    except (ValueError, OverflowError):
+        return NUM
+
+
+_FUNCTIONS = {
+    "AND": _fn_and, "OR": _fn_or, "COUNTA": _fn_counta, "COUNT": _fn_count, "COUNTIF": _fn_countif,
+    "SUM": _fn_sum, "LEFT": _fn_left, "RIGHT": _fn_right, "FIND": _fn_find, "VLOOKUP": _fn_vlookup,
+    "MATCH": _fn_match, "INDEX": _fn_index, "DATE": _fn_date,
+}
+_COUNTS_ERRORS = {"COUNTA", "COUNT"}   # Take error values as arguments instead of returning them
+
+
+# --- Sheet evaluation -------------------------------------------------------------------------
+
+class SheetEvaluator:
+    """
+    Evaluates the formulas of one worksheet over its constant cell values.
+
+    Args:
+        values: {(row, column): value} of the non-formula cells (float, str, bool, ExcelError)
+        formulas: {(row, column): formula text without the leading '='}
+        today: Date TODAY() returns (defaults to the current date)
+    """
+
+    def __init__(self, values, formulas, today=None):
+        self.values = values
+        self.formulas = formulas
+        self.today = today or date.today()
+        self.results = {}
+        self._evaluating = set()
+
+    def has_formula(self, row, column):
+        return (row, column) in self.formulas
+
+    def value(self, row, column):
+        key = (row, column)
+        if key not in self.formulas:
+            return self.values.get(key)
+        if key in self.results:
+            return self.results[key]
+        if key in self._evaluating:
+            raise FormulaError(f"Circular reference at row {row}, column {column}")
+        self._evaluating.add(key)
+        try:
+            result = _scalar(self._evaluate(parse_formula(self.formulas[key])))
+        finally:
+            self._evaluating.discard(key)
+        self.results[key] = 0.0 if result is None else result
+        return self.results[key]
+
+    def evaluate_all(self):
+        """{(row, column): result} for every formula cell."""
+        for row, column in self.formulas:
+            self.value(row, column)
+        return self.results
+
+    def _evaluate(self, node):
+        kind = node[0]
+        if kind == "value":
+            return node[1]
+        if kind == "missing":
+            return None
+        if kind == "ref":
+            return Range(self, *node[1:])
+        if kind == "negate":
+            number = to_number(self._evaluate(node[1]))
+            return number if isinstance(number, ExcelError) else -number
+        if kind == "percent":
+            number = to_number(self._evaluate(node[1]))
+            return number if isinstance(number, ExcelError) else number / 100
+        if kind == "op":
+            return self._operator(node[1], self._evaluate(node[2]), self._evaluate(node[3]))
+        return self._call(node[1], node[2])
+
+    def _operator(self, operator, left, right):
+        if operator == "&":
+            left, right = to_text(left), to_text(right)
+            return _first_error(left, right) or left + right
+        if operator in ("=", "<>", "<", ">", "<=", ">="):
+            left, right = _scalar(left), _scalar(right)
+            error = _first_error(left, right)
+            if error:
+                return error
+            result = _compare(left, right)
+            return {"=": result == 0, "<>": result != 0, "<": result < 0, ">": result > 0,
+                    "<=": result <= 0, ">=": result >= 0}[operator]
+        left, right = to_number(left), to_number(right)
+        error = _first_error(left, right)
+        if error:
+            return error
+        if operator == "+":
+            return left + right
+        if operator == "-":
+            return left - right
+        if operator == "*":
+            return left * right
+        if operator == "/":
+            return DIV0 if right == 0 else left / right
+        try:
+            result = left ** right
+        except (OverflowError, ZeroDivisionError):
+            return NUM
+        return NUM if isinstance(result, complex) or math.isinf(result) else result
+
+    def _call(self, name, args):
+        # IF and IFERROR only evaluate the branch they return, like Excel
+        if name == "IF":
+            if not 1 <= len(args) <= 3:
+                raise FormulaError("IF takes 1 to 3 arguments")
+            condition = to_bool(self._evaluate(args[0]))
+            if isinstance(condition, ExcelError):
+                return condition
+            if condition:
+                return self._evaluate(args[1]) if len(args) > 1 else True
+            return self._evaluate(args[2]) if len(args) > 2 else False
+        if name == "IFERROR":
+            value = _scalar(self._evaluate(args[0]))
+            return _scalar(self._evaluate(args[1])) if isinstance(value, ExcelError) else value
+        if name == "TODAY":
+            return float(to_excel(self.today))
+
+        function = _FUNCTIONS.get(name)
+        if function is None:
+            raise FormulaError(f"Unsupported function {name}")
+        values = [self._evaluate(arg) for arg in args]
+        if name not in _COUNTS_ERRORS:
+            error = _first_error(*(value for value in values if not isinstance(value, Range)))
+            if error:
+                return error
+        try:
+            return function(*values)
+        except TypeError as e:
+            raise FormulaError(f"Wrong number of arguments for {name}: {e}")
+
+
+def evaluate_formulas(values, formulas, today=None):
+    """
+    Results of every formula on a sheet, as Excel would cache them after recalculating.
+
+    Raises:
+        FormulaError: If a formula uses a function or reference this evaluator does not support
+    """
+    return SheetEvaluator(values, formulas, today).evaluate_all()
@@ -1,90 +1,47 @@
-import openpyxl 
-import pandas
 import os
-from src.utils.load_yaml import ATTACHMENTS_SAVE_DIR,GIG_TEMPLATES_DIR,REFERRAL_FILE_STORE_DIR, GIG_GENERATED_CENSUS_DIR
-from src.utils.support_functions import get_replaced_referral_id
+from src.utils.load_yaml import GIG_TEMPLATES_DIR
+from src.services.excel_service.census_frame import resolve_census_frame
+from src.services.excel_service.census_transforms import (
+    INVALID_DOB, choose, gender_codes, marital_codes, parse_dates, relation_labels, replace_values
+)
+from src.services.excel_service.template_patch import Block, TemplateSpec, open_template
 from datetime import datetime
 import pandas as pd
-from openpyxl.styles import NamedStyle
-from src.services.excel_service.read_excel import read_excel
 from src.utils.logger import logger
 
 
-def parse_date_format(date_str):
-    """
-    Parse date string in various formats (dd/mm/yyyy, d/m/yyyy, dd-mm-yyyy, etc.)
-    Returns a datetime object or None if parsing fails
-    """
-    if not isinstance(date_str, str):
-        if isinstance(date_str, datetime):
-            return date_str  # Already a datetime object
-        return None
-        
-    date_str = date_str.strip()
-    # Try multiple date formats
-    formats = [
-        "%d/%m/%Y",  # dd/mm/yyyy
-        "%d-%m-%Y",  # dd-mm-yyyy
-        "%d/%m/%y",  # dd/mm/yy
-        "%d-%m-yy",  # dd-mm-yy
-        "%m/%d/%Y",  # mm/dd/yyyy (in case it comes in US format)
-        "%m-%d-%Y",  # mm-dd-yyyy
-    ]
-    
-    for fmt in formats:
-        try:
-            return datetime.strptime(date_str, fmt)
-        except ValueError:
-            continue
-            
-    logger.error(f"Could not parse date: {date_str}")
-    return None
-
-
-def gig_map_census_data(id, other_data=None):
-    census_filename = ""
-    if id == 'default':
-        for file_name in os.listdir(ATTACHMENTS_SAVE_DIR):
-            if not file_name.startswith("Medical__") and file_name.endswith(".xlsx"):
-                census_filename = file_name
-                break
-        
-        if not census_filename:
-            raise FileNotFoundError("No suitable census file found in attachments directory")
+# Accepted DOB formats, tried in order (dd/mm/yyyy, d/m/yyyy, dd-mm-yyyy, etc.)
+GIG_DOB_FORMATS = [
+    "%d/%m/%Y",  # dd/mm/yyyy
+    "%d-%m-%Y",  # dd-mm-yyyy
+    "%d/%m/%y",  # dd/mm/yy
+    "%d-%m-yy",  # dd-mm-yy
+    "%m/%d/%Y",  # mm/dd/yyyy (in case it comes in US format)
+    "%m-%d-%Y",  # mm-dd-yyyy
+]
+GIG_CATEGORY_CODES = {'A': 'CAT 1', 'B': 'CAT 2', 'C': 'CAT 3'}
+# Members fill B:I (only parsed DOBs in G get the date format); the effective date goes in Z2
+GIG_TEMPLATE = TemplateSpec(os.path.join(GIG_TEMPLATES_DIR, "MemberUpload.xlsx"), "Census", {
+    "members": Block(2, "B:I", {"G": "DD-MM-YY"}),
+    "effective_date": Block(2, "Z", {"Z": "DD/MM/YYYY"}),
+})
 
-        census_filepath = os.path.normpath(os.path.join(ATTACHMENTS_SAVE_DIR, census_filename))
-        print(f"GIG Debug: Reading from {census_filepath}")
-        
-        if not os.path.exists(census_filepath):
-            raise FileNotFoundError(f"Census file not found at: {census_filepath}")
-            
-        excel_data_df = pandas.read_excel(census_filepath, sheet_name='Sheet1')
-        
-        # Try to read nationality sheet, with fallback
-        try:
-            nationality_df = pandas.read_excel(census_filepath, sheet_name='Nationality_Updated')
-        except ValueError:
-            # Create a basic nationality mapping if sheet doesn't exist
-            print("Warning: Nationality_Updated sheet not found, using basic mapping")
-            unique_nationalities = excel_data_df['Nationality'].unique() if 'Nationality' in excel_data_df.columns else ['UAE']
-            nationality_df = pandas.DataFrame({
-                'AL SAGR': unique_nationalities,
-                'GIG': unique_nationalities
-            })
 
-    else:
-        for file_name in os.listdir(os.path.join(REFERRAL_FILE_STORE_DIR, get_replaced_referral_id(id))):
-            if not file_name.startswith("Medical__") and file_name.endswith(".xlsx"):
-                census_filename = file_name
+def gig_map_census_data(id, other_data=None, census_frame=None, output_dir=None):
+    census = resolve_census_frame(id, census_frame)
+    print(f"GIG Debug: Reading from {census.source_path}")
 
-        excel_data_df = pandas.read_excel(os.path.join(REFERRAL_FILE_STORE_DIR, get_replaced_referral_id(id), census_filename), sheet_name='Sheet1')
-        nationality_df = pandas.read_excel(os.path.join(REFERRAL_FILE_STORE_DIR, get_replaced_referral_id(id), census_filename), sheet_name='Nationality_Updated')
+    members_df = census.members()
 
-    nationality_df.columns = nationality_df.columns.str.strip()
-    merged_df = pandas.merge(excel_data_df, nationality_df, left_on='Nationality', right_on='AL SAGR', how='left')
+    # Try to read nationality sheet, with fallback
+    try:
+        nationality_index = census.nationality_index()
+    except ValueError:
+        # Without the sheet nationalities are written as they are
+        print("Warning: Nationality_Updated sheet not found, using basic mapping")
+        nationality_index = None
 
-    wb = openpyxl.load_workbook(os.path.join(GIG_TEMPLATES_DIR, "MemberUpload.xlsx"))
-    ws = wb['Census']
+    template = open_template(GIG_TEMPLATE)
 
 
 
@@ -108,7 +65,7 @@ def gig_map_census_data(id, other_data=None):
     if not effective_date:
         if not other_data:  # Only show this message if no other_data was provided at all
             logger.info("Effective date not found in database, trying to read from Excel file...")
-        df1, df2 = read_excel('GIG Insurance', 'default')
+        df1 = census.members()
         
         # Check if the dataframes are empty
         if df1.empty:
@@ -139,109 +96,43 @@ def gig_map_census_data(id, other_data=None):
 
 
     #Data mapping for census
-    for index, row in merged_df.iterrows():
-        
-        #Name
-        ws.cell(row=index+2, column=2).value = row['Beneficiary First Name']  
-
-        #Member Type
-        relation = row['Relation']
-        if relation == 'Principal':
-            relation = 'Employee'
-        gender = row['Gender']
-        marital_status = row['Marital status']
-
-        if relation == 'Employee' :
-            member_type=F'{relation} {gender} – {marital_status}'
-        else :
-            member_type=F'{relation} – {gender}'
-
-        ws.cell(row=index+2, column=6).value = member_type
-
-        #Relation
-        if relation == 'Employee':
-            relation = 'E' 
-        elif relation == 'Spouse' and gender == 'Male':
-            relation = 'H'
-        elif relation == 'Spouse' and gender == 'Female':
-            relation = 'W'
-        elif relation == 'Child' and gender == 'Male':
-            relation = 'S'
-        elif relation == 'Child' and gender == 'Female':
-            relation = 'D'
-        ws.cell(row=index+2, column=3).value = relation
-
-        #Gender
-        if gender == 'Male':
-            gender = 'M'
-        elif gender == 'Female':
-            gender = 'F'
-        ws.cell(row=index+2, column=4).value = gender
-
-        #Marital Status        
-        if marital_status == 'Single':
-            marital_status = 'S'
-        elif marital_status == 'Married':
-            marital_status = 'M'
-        ws.cell(row=index+2, column=5).value = marital_status
-
-
-        #Date of Birth
-        dob = row['DOB']
-
-        # Define a date format style (only needs to be done once)
-        date_style = NamedStyle(name="date_style", number_format="DD-MM-YY")
-
-        # Check if the style already exists to avoid duplicate errors
-        if "date_style" not in ws.parent.named_styles:
-            ws.parent.add_named_style(date_style)
-
-        # Parse and set the DOB with flexible format handling
-        dob_cell = ws.cell(row=index+2, column=7)
-        if dob:
-            parsed_dob = parse_date_format(dob)
-            if parsed_dob:
-                dob_cell.value = parsed_dob  # Set the datetime object
-                dob_cell.number_format = "DD-MM-YY"  # Apply consistent date format
-            else:
-                dob_cell.value = "Invalid DOB"
-                logger.warning(f"Invalid DOB format for row {index+2}: {dob}")
-        else:
-            dob_cell.value = "Invalid DOB"
-
-
-        ##Nationality
-
-        # Mappings with error handling
-        if 'GIG INSURANCE' in nationality_df.columns and 'AL SAGR' in nationality_df.columns:
-            nationality_mapping = dict(
-                zip(nationality_df['AL SAGR'], nationality_df['GIG INSURANCE']))
-        else:
-            available_cols = nationality_df.columns.tolist()
-            print(f"Warning: GIG INSURANCE column not found. Available columns: {available_cols}")
-            if 'AL SAGR' in nationality_df.columns:
-                nationality_mapping = dict(zip(nationality_df['AL SAGR'], nationality_df['AL SAGR']))
-            else:
-                nationality_mapping = {}
-        
-        # Fetch the mapped nationality; if not found, use the original value
-        mapped_nationality = nationality_mapping.get(row['Nationality'], row['Nationality'])
-
-        # Assign the mapped nationality to the Excel cell
-        ws.cell(row=index+2, column=8).value = mapped_nationality
-        # nationality = row['Nationality']
-        # ws.cell(row=index+2, column=8).value = nationality
-    
-
-        ##Category
-        cat=row['Category']
-        if cat == 'A':
-            cat = 'CAT 1'
-        if cat == 'B':
-            cat = 'CAT 2'
-        if cat == 'C':
-            cat = 'CAT 3'
-        ws.cell(row=index+2, column=9).value = cat
+    relation = relation_labels(members_df['Relation'])
+    gender = members_df['Gender']
+    marital_status = members_df['Marital status']
+    is_employee = relation == 'Employee'
+
+    #Member Type
+    member_type = choose(is_employee,
+                         relation.astype(str) + ' ' + gender.astype(str) + ' – ' + marital_status.astype(str),
+                         relation.astype(str) + ' – ' + gender.astype(str))
+
+    #Relation
+    relation_code = (relation.mask(is_employee, 'E')
+                     .mask((relation == 'Spouse') & (gender == 'Male'), 'H')
+                     .mask((relation == 'Spouse') & (gender == 'Female'), 'W')
+                     .mask((relation == 'Child') & (gender == 'Male'), 'S')
+                     .mask((relation == 'Child') & (gender == 'Female'), 'D'))
+
+    #Date of Birth
+    dob = parse_dates(members_df['DOB'], formats=GIG_DOB_FORMATS, engine=census.dates)
+    valid_dob = dob.notna()
+    if (~valid_dob).any():
+        logger.warning(f"Invalid DOB format for rows {[index + 2 for index in members_df.index[~valid_dob]]}")
+    dob_values = dob.astype(object).where(valid_dob, INVALID_DOB)
+
+    ##Nationality
+    # Fetch the mapped nationality; if not found, use the original value
+    nationality = members_df['Nationality']
+    if nationality_index is not None and 'GIG INSURANCE' in nationality_index:
+        nationality = nationality_index.lookup(nationality, 'GIG INSURANCE', default=nationality)
+    elif nationality_index is not None:
+        print(f"Warning: GIG INSURANCE column not found. Available columns: {nationality_index.insurers}")
+
+    ##Category
+    category = replace_values(members_df['Category'], GIG_CATEGORY_CODES)
+
+    members = zip(members_df['Beneficiary First Name'], relation_code, gender_codes(gender),
+                  marital_codes(marital_status), member_type, dob_values, nationality, category)
 
 
     # Use the effective_date we determined above (from database or Excel fallback)
@@ -254,35 +145,11 @@ def gig_map_census_data(id, other_data=None):
         logger.error(f"Invalid date format: {effective_date}")
         date_obj = None  # Handle invalid date case
 
-    # Define a date format style
-    date_style = NamedStyle(name="date_style", number_format="DD/MM/YYYY")
-
-    # Avoid duplicate named styles
-    if "date_style" not in ws.parent.named_styles:
-        ws.parent.add_named_style(date_style)
-
-    # Select the cell where the date should be entered
-    effective_date_cell = ws.cell(row=2, column=26)
-
-    # Assign value and apply formatting
-    if date_obj:
-        effective_date_cell.value = date_obj  # Use datetime object so Excel recognizes it
-        effective_date_cell.number_format = "DD/MM/YYYY"  # Ensure it's formatted as a date
-        
-        #**Force Excel to detect it as a date by reassigning**
-        temp_value = effective_date_cell.value  # Store the value
-        effective_date_cell.value = None  # Clear the cell
-        effective_date_cell.value = temp_value  # Reassign the value
-
-    else:
-        effective_date_cell.value = "Invalid DOB"  # Handle errors properly
-
-    logger.debug("Formatted effective date written to Excel.")
-    
-    # ws.cell(row=2, column=26).value = effective_date
+    # A datetime value (formatted DD/MM/YYYY) so Excel recognizes it as a date
+    effective_date_value = date_obj if date_obj else "Invalid DOB"  # Handle errors properly
     logger.debug(f"Effective Date: {effective_date}")
 
-    wb.save(os.path.join(GIG_GENERATED_CENSUS_DIR, "gig_map.xlsx"))
+    return template.census("gig_map.xlsx", {"members": members, "effective_date": [[effective_date_value]]}, output_dir)
 
 
 
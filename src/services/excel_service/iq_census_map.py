@@ -1,76 +1,54 @@
-import xlwings as xw
-import pandas as pd
 import os
-from src.utils.load_yaml import ATTACHMENTS_SAVE_DIR, IQ2HEALTH_TEMPLATES_DIR, IQ2HEALTH_GENERATED_CENSUS_DIR, REFERRAL_FILE_STORE_DIR
-from src.utils.support_functions import get_replaced_referral_id
+from src.utils.load_yaml import IQ2HEALTH_TEMPLATES_DIR
+from src.services.excel_service.census_frame import resolve_census_frame
+from src.services.excel_service.census_transforms import category_labels, choose, column_or, parse_dates
+from src.services.excel_service.formula_eval import EXCEL_TEXT_DATES_DAYFIRST
+from src.services.excel_service.template_patch import Block, TemplateSpec, open_template
+
+# Macro workbook: the census sheet is filled in the package, vbaProject.bin is copied untouched
+IQ_TEMPLATE = TemplateSpec(os.path.join(IQ2HEALTH_TEMPLATES_DIR, "Census_Template_AE.xlsm"), "INPUT - Census",
+                           {"members": Block(2, "B:I")})
  
-def iq_map_census_data(id):
+def iq_map_census_data(id, census_frame=None, output_dir=None):
     try:
 
-        census_filename = ""
-        if id == 'default':
-            for file_name in os.listdir(ATTACHMENTS_SAVE_DIR):
-                if not file_name.startswith("Medical__") and file_name.endswith(".xlsx"):
-                    census_filename = file_name
-            excel_file_path = os.path.join(ATTACHMENTS_SAVE_DIR, census_filename)
-
-        else:
-            for file_name in os.listdir(os.path.join(REFERRAL_FILE_STORE_DIR, get_replaced_referral_id(id))):
-                if not file_name.startswith("Medical__") and file_name.endswith(".xlsx"):
-                    census_filename = file_name
-            excel_file_path = os.path.join(REFERRAL_FILE_STORE_DIR, get_replaced_referral_id(id), census_filename)
+        census = resolve_census_frame(id, census_frame)
 
-        print(f"Reading Excel file from {excel_file_path}")
-        excel_data_df = pd.read_excel(excel_file_path, sheet_name='Sheet1')
-        nationality_df = pd.read_excel(excel_file_path, sheet_name='Nationality_Updated')
- 
+        print(f"Reading census data from {census.source_path}")
+        members_df = census.members()
+        nationality_index = census.nationality_index()
      
-        if 'Nationality' not in excel_data_df.columns or 'IQ Portal' not in nationality_df.columns:
+        if 'Nationality' not in members_df.columns or 'IQ Portal' not in nationality_index:
             raise ValueError("Required Nationlaity columns are missing from the dataframes.")
  
-        # Merge the dataframes
-        merged_df = pd.merge(
-        excel_data_df,
-        nationality_df[['AL SAGR', 'IQ Portal']],
-        left_on='Nationality',
-        right_on='AL SAGR',
-        how='left',
-        suffixes=('', '_new')
-        )
- 
         # Replace the Nationality values with the corresponding IQ Portal values
-        merged_df['Nationality'] = merged_df['IQ Portal'].combine_first(merged_df['Nationality'])
- 
-        # Drop the additional columns used for merging
-        merged_df = merged_df.drop(columns=['AL SAGR', 'IQ Portal'])
+        members_df['Nationality'] = nationality_index.lookup(members_df['Nationality'], 'IQ Portal').combine_first(members_df['Nationality'])
  
-        merged_df['Salary Type'] = merged_df['Salary Type'].apply(lambda x: 'NLSB' if x == 'HSB' else 'LSB')
+        members_df['Salary Type'] = choose(members_df['Salary Type'] == 'HSB', 'NLSB', 'LSB')
  
         print("Excel DataFrames loaded successfully.")
  
-        # Load the existing .xlsm file using xlwings
-        template_file_path = os.path.join(IQ2HEALTH_TEMPLATES_DIR, "Census_Template_AE.xlsm")
- 
-        with xw.App(visible=False) as app:
-            wb = app.books.open(template_file_path)
-            ws = wb.sheets['INPUT - Census']
-            print("Inserting data to macro XLSM template...")
- 
-            for index, row in merged_df.iterrows():
-                ws.range(f"B{index + 2}").value = row['DOB']
-                ws.range(f"C{index + 2}").value = row['Relation']
-                ws.range(f"D{index + 2}").value = 'Category ' + str(row['Category'])
-                ws.range(f"E{index + 2}").value = row['Gender']
-                ws.range(f"F{index + 2}").value = row['Marital status']
-                ws.range(f"G{index + 2}").value = row['Nationality']
-                ws.range(f"H{index + 2}").value = row.get('Visa Issued Emirates', 'N/A')  # Handle missing values
-                ws.range(f"I{index + 2}").value = row['Salary Type']
- 
-            # Save the workbook with macros preserved
-            output_file_path = os.path.join(IQ2HEALTH_GENERATED_CENSUS_DIR, "Census_Template_AE.xlsm")
-            wb.save(output_file_path)
+        # Excel turned DOB text into dates when it was written through COM; the age column needs numbers
+        parsed_dob = parse_dates(members_df['DOB'], dayfirst=EXCEL_TEXT_DATES_DAYFIRST, engine=census.dates)
+        dob = parsed_dob.astype(object).where(parsed_dob.notna(), members_df['DOB'])
+
+        print("Inserting data to macro XLSM template...")
+        members = zip(
+            dob,
+            members_df['Relation'],
+            category_labels(members_df['Category'], 'Category '),
+            members_df['Gender'],
+            members_df['Marital status'],
+            members_df['Nationality'],
+            column_or(members_df, 'Visa Issued Emirates', 'N/A'),  # Handle missing values
+            members_df['Salary Type'],
+        )
+
+        # Build the workbook with macros preserved
+        generated = open_template(IQ_TEMPLATE).census("Census_Template_AE.xlsm", {"members": members}, output_dir)
  
         print("Cencus Data mapping macro sheet and saving successful.")
+        return generated
  
     except Exception as e:
         print(f"Error: {e}")
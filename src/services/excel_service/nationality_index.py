@@ -0,0 +1,64 @@
+import numpy as np
+import pandas as pd
+
+from src.utils.census_metrics import stage
+
+# Census nationalities are spelled the way the AL SAGR column of the nationality sheet spells them
+NATIONALITY_KEY_COLUMN = "AL SAGR"
+
+
+class NationalityIndex:
+    """
+    The nationality sheet compiled for lookups: canonical name -> each insurer's code.
+
+    CensusFrame builds one per request. Mappers translate the whole Nationality
+    column with lookup() instead of merging the census against every column of
+    the sheet or building their own dicts.
+    """
+
+    def __init__(self, table, key_column=NATIONALITY_KEY_COLUMN):
+        if key_column not in table.columns:
+            self._keys = pd.Index([], dtype=object)
+            self._codes = {}
+            return
+        keys = table[key_column]
+        unique = ~keys.duplicated(keep="last")  # A repeated name uses its last row, as dict(zip(...)) did
+        self._keys = pd.Index(keys[unique].to_numpy())
+        self._codes = {column: table[column][unique].to_numpy() for column in table.columns}
+
+    def __len__(self):
+        return len(self._keys)
+
+    def __contains__(self, insurer):
+        return insurer in self._codes
+
+    @property
+    def insurers(self):
+        """Columns that can be looked up, the key column included."""
+        return list(self._codes)
+
+    def lookup(self, nationalities, insurer, default=np.nan):
+        """
+        Translate a column of nationality names into `insurer`'s codes.
+
+        Args:
+            nationalities: Series of names as written in the census
+            insurer: Nationality sheet column, e.g. 'GIG INSURANCE'
+            default: Value for names not in the sheet; a scalar, or a Series aligned
+                     with `nationalities` (pass `nationalities` to keep the name)
+
+        Returns:
+            pd.Series: Codes indexed like `nationalities`
+
+        Raises:
+            KeyError: If the sheet has no `insurer` column.
+        """
+        with stage("nationality"):
+            codes = self._codes[insurer]
+            positions = self._keys.get_indexer(nationalities)
+            found = positions >= 0
+            if len(codes):
+                values = codes[np.where(found, positions, 0)]
+            else:
+                values = np.full(len(positions), np.nan, dtype=object)
+            return pd.Series(values, index=nationalities.index).where(found, default)
@@ -1,55 +1,30 @@
-import openpyxl 
-import pandas
 import os
-from src.utils.load_yaml import ATTACHMENTS_SAVE_DIR,NLG_TEMPLATES_DIR,NLG_GENERATED_CENSUS_DIR,REFERRAL_FILE_STORE_DIR
-from src.utils.support_functions import get_replaced_referral_id
-from datetime import datetime
-
-
-def nlg_map_census_data(id):
-    census_filename = ""
-    if id == 'default':
-        for file_name in os.listdir(ATTACHMENTS_SAVE_DIR):
-            if not file_name.startswith("Medical__") and file_name.endswith(".xlsx"):
-                census_filename = file_name
-
-        excel_data_df = pandas.read_excel(os.path.join(ATTACHMENTS_SAVE_DIR, census_filename), sheet_name='Sheet1')
-        nationality_df = pandas.read_excel(os.path.join(ATTACHMENTS_SAVE_DIR, census_filename), sheet_name='Nationality_Updated')
-
+from src.utils.load_yaml import NLG_TEMPLATES_DIR
+from src.services.excel_service.census_frame import resolve_census_frame
+from src.services.excel_service.census_transforms import choose, emirate_codes, format_dates, relation_labels
+from src.services.excel_service.template_patch import Block, TemplateSpec, open_template
+
+NLG_TEMPLATE = TemplateSpec(os.path.join(NLG_TEMPLATES_DIR, "MemberUpload.xlsx"), "loader",
+                            {"members": Block(2, "A:H")})
+
+
+def nlg_map_census_data(id, census_frame=None, output_dir=None):
+    census = resolve_census_frame(id, census_frame)
+    members_df = census.members()
+    nationality_index = census.nationality_index()
+    # NLGIC codes come with the census, or from the nationality sheet when it carries them
+    if 'NLGIC Code' in members_df.columns:
+        nlgic_codes = members_df['NLGIC Code']
     else:
-        for file_name in os.listdir(os.path.join(REFERRAL_FILE_STORE_DIR, get_replaced_referral_id(id))):
-            if not file_name.startswith("Medical__") and file_name.endswith(".xlsx"):
-                census_filename = file_name
-
-        excel_data_df = pandas.read_excel(os.path.join(REFERRAL_FILE_STORE_DIR, get_replaced_referral_id(id), census_filename), sheet_name='Sheet1')
-        nationality_df = pandas.read_excel(os.path.join(REFERRAL_FILE_STORE_DIR, get_replaced_referral_id(id), census_filename), sheet_name='National_Updated')
-
-    merged_df = pandas.merge(excel_data_df, nationality_df, left_on='Nationality', right_on='AL SAGR', how='left')
-    merged_df['Salary Type']=merged_df['Salary Type'].apply(lambda x: 'Enhanced' if x == 'HSB' else 'LSB')
-    merged_df['Relation']=merged_df['Relation'].apply(lambda x: 'Employee' if x == 'Principal' else x)
-    merged_df['Visa Issued Emirates']=merged_df['Visa Issued Emirates'].apply(lambda x: 'DXB' if x == 'Dubai' else x)
-
-    wb = openpyxl.load_workbook(os.path.join(NLG_TEMPLATES_DIR, "MemberUpload.xlsx"))
-    ws = wb['loader']
-
-    for index, row in merged_df.iterrows():
-        ws.cell(row=index+2,column=1).value=row['Relation']
-        ws.cell(row=index+2,column=2).value=row['Gender']
-        # Convert the DOB to a datetime object if it's a string
-        dob = row['DOB']
-        if isinstance(dob, str):
-            try:
-                dob = datetime.strptime(dob.strip(), "%Y-%m-%d") 
-            except ValueError:
-                dob = None  
-        if dob:
-            ws.cell(row=index + 2, column=3).value = dob.strftime("%d-%b-%Y")
-        else:
-            ws.cell(row=index + 2, column=3).value = "Invalid DOB"
-        ws.cell(row=index+2,column=4).value=row['Salary Type']
-        ws.cell(row=index+2,column=5).value=row['Visa Issued Emirates']
-        ws.cell(row=index+2,column=6).value='Cat ' + row['Category'] 
-        ws.cell(row=index+2,column=7).value=row['Marital status']
-        ws.cell(row=index+2,column=8).value=row['NLGIC Code']
-
-    wb.save(os.path.join(NLG_GENERATED_CENSUS_DIR, "MemberUpload.xlsx"))
\ No newline at end of file
+        nlgic_codes = nationality_index.lookup(members_df['Nationality'], 'NLGIC Code')
+
+    relation = relation_labels(members_df['Relation'])
+    # DOB strings are read as yyyy-mm-dd; anything unparseable or missing is flagged
+    dob = format_dates(members_df['DOB'], "%d-%b-%Y", formats=["%Y-%m-%d"], engine=census.dates)
+    salary_type = choose(members_df['Salary Type'] == 'HSB', 'Enhanced', 'LSB')
+    visa = emirate_codes(members_df['Visa Issued Emirates'])
+    category = 'Cat ' + members_df['Category']
+
+    members = zip(relation, members_df['Gender'], dob, salary_type, visa, category,
+                  members_df['Marital status'], nlgic_codes)
+    return open_template(NLG_TEMPLATE).census("MemberUpload.xlsx", {"members": members}, output_dir)
\ No newline at end of file
@@ -0,0 +1,245 @@
+import multiprocessing
+import os
+import threading
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass
+
+from src.utils.census_metrics import StageTimer
+from src.utils.logger import logger
+
+# Mappers that only touch openpyxl/pandas and return their output in memory
+PROCESS_POOL_PORTALS = {
+    "ADNIC", "NLG", "GIG", "SUKOON", "ISON", "DUBAIINSURANCE", "MAXHEALTH", "AURA", "EMAIL", "DAMAN", "IQ"
+}
+
+# Mappers whose signature accepts the request's other_data
+OTHER_DATA_PORTALS = {"GIG", "DAMAN"}
+
+_portal_pool = None
+_portal_pool_size = 0
+# Requests run on several threads and share one pool
+_portal_pool_lock = threading.Lock()
+
+
+class PortalPool(ProcessPoolExecutor):
+    """
+    Process pool whose workers report their PIDs when they start.
+
+    Lets a retired pool's hung workers be terminated after shutdown() without
+    reaching into the executor's internals.
+    """
+
+    def __init__(self, max_workers):
+        self.worker_pids = multiprocessing.SimpleQueue()
+        super().__init__(max_workers=max_workers, initializer=_report_worker_pid, initargs=(self.worker_pids,))
+        self._known_pids = set()
+
+    def worker_processes(self):
+        """Live child processes of this interpreter that started as workers of this pool."""
+        while not self.worker_pids.empty():
+            self._known_pids.add(self.worker_pids.get())
+        return [process for process in multiprocessing.active_children() if process.pid in self._known_pids]
+
+
+def _report_worker_pid(worker_pids):
+    worker_pids.put(os.getpid())
+
+
+@dataclass
+class MapperJob:
+    """A mapper to run for one request, keyed by the first portal that asked for it."""
+    portal: str
+    normalized_portal: str
+    func: object
+    output_dir: str  # Where to also write the output for debugging, None to keep it in memory only
+    filename: str
+
+
+@dataclass
+class MapperResult:
+    """
+    Outcome of running a single mapper; `census` is the GeneratedCensus it returned, if any,
+    and `stages` the seconds spent per stage inside the mapper ('transform' is the remainder).
+    """
+    portal: str
+    success: bool
+    duration: float
+    error: str = None
+    traceback: str = None
+    census: object = None
+    stages: dict = None
+
+
+def run_mapper(portal, normalized_portal, func, other_data=None, census_frame=None, output_dir=None):
+    """
+    Run a single census mapper and capture its outcome.
+
+    Module-level so it can be pickled into a process pool worker.
+
+    Returns:
+        MapperResult: Success flag, wall time, generated census and error details for the mapper
+    """
+    start_time = time.time()
+    timer = StageTimer()
+    try:
+        with timer.activate():
+            if normalized_portal in OTHER_DATA_PORTALS:
+                census = func('default', other_data, census_frame=census_frame, output_dir=output_dir)
+            else:
+                census = func('default', census_frame=census_frame, output_dir=output_dir)
+        duration = time.time() - start_time
+        return MapperResult(portal, True, duration, census=census, stages=_with_transform(timer, duration))
+    except Exception as e:
+        duration = time.time() - start_time
+        return MapperResult(portal, False, duration, str(e), traceback.format_exc(), stages=_with_transform(timer, duration))
+
+
+def _with_transform(timer, duration):
+    """Stage seconds of a mapper run, with the time outside the timed stages counted as 'transform'."""
+    timer.add("transform", max(0.0, duration - sum(timer.stages.values())))
+    return timer.stages
+
+
+def _get_portal_pool(max_workers):
+    """
+    Return the shared mapper pool, creating it on first use or when the size changes.
+
+    The pool lives for the whole worker so process start-up and module imports are
+    paid once rather than per request; workers are spawned on demand up to max_workers.
+    Call with _portal_pool_lock held.
+    """
+    global _portal_pool, _portal_pool_size
+    if _portal_pool is None or _portal_pool_size != max_workers:
+        _shutdown_portal_pool()
+        logger.info(f"Starting census mapper process pool with {max_workers} workers")
+        _portal_pool = PortalPool(max_workers)
+        _portal_pool_size = max_workers
+    return _portal_pool
+
+
+def shutdown_portal_pool():
+    """Stop the shared mapper pool, if one is running."""
+    with _portal_pool_lock:
+        _shutdown_portal_pool()
+
+
+def _shutdown_portal_pool():
+    global _portal_pool, _portal_pool_size
+    if _portal_pool is not None:
+        _portal_pool.shutdown(wait=True, cancel_futures=True)
+        _portal_pool = None
+        _portal_pool_size = 0
+
+
+def _retire_portal_pool(pool, terminate_after=None):
+    """
+    Stop sharing `pool` after a request found it broken or hung, leaving any newer pool alone.
+
+    Requests still waiting on the retired pool keep their futures. With terminate_after,
+    its workers are killed once that many seconds have passed - enough for the other
+    requests' mappers to finish or reach their own deadlines - since a hung mapper never returns.
+    """
+    global _portal_pool, _portal_pool_size
+    with _portal_pool_lock:
+        if _portal_pool is pool:
+            _portal_pool = None
+            _portal_pool_size = 0
+        pool.shutdown(wait=False, cancel_futures=terminate_after is None)
+    if terminate_after is not None:
+        timer = threading.Timer(terminate_after, _terminate_workers, args=(pool,))
+        timer.daemon = True
+        timer.start()
+
+
+def _terminate_workers(pool):
+    for process in pool.worker_processes():
+        logger.warning(f"Terminating census mapper worker {process.pid} of a retired process pool")
+        process.terminate()
+
+
+def _run_local_mapper(job, census_frame, other_data, timeout):
+    """
+    Run a mapper in this process, failing it after `timeout` seconds.
+
+    A thread cannot be stopped: a hung mapper is left running on its daemon thread
+    and the request moves on without its output.
+    """
+    args = (job.portal, job.normalized_portal, job.func, other_data, census_frame, job.output_dir)
+    if not timeout:
+        return run_mapper(*args)
+    outcome = []
+    thread = threading.Thread(target=lambda: outcome.append(run_mapper(*args)), daemon=True,
+                              name=f"census-mapper-{job.portal}")
+    thread.start()
+    thread.join(timeout)
+    if thread.is_alive():
+        logger.error(f"Census mapper for '{job.portal}' did not finish within {timeout:.0f}s; abandoning its thread")
+        return MapperResult(job.portal, False, timeout, f"Mapper did not finish within {timeout:.0f}s")
+    return outcome[0]
+
+
+def run_mapper_jobs(jobs, census_frame, other_data=None, parallel=False, max_workers=1, timeout=None):
+    """
+    Run the mappers for a request, optionally fanning them out to a process pool.
+
+    Mappers outside PROCESS_POOL_PORTALS run in the calling process, while pooled
+    mappers execute concurrently in the background.
+
+    Args:
+        jobs: List of MapperJob to execute
+        census_frame: Parsed census shared by the request
+        other_data: Request other_data passed to mappers that accept it
+        parallel: Use the process pool for mappers in PROCESS_POOL_PORTALS
+        max_workers: Upper bound on pool workers
+        timeout: Seconds each mapper gets before it fails. Pooled mappers are timed from their
+            submission, so any wait for a free worker counts; results are collected as soon as each
+            finishes, and a pool with a mapper still running at its deadline is retired. Local
+            mappers are timed from their start, and a hung one is abandoned on its thread
+
+    Returns:
+        dict: portal -> MapperResult, one entry per job
+    """
+    results = {}
+    pooled_jobs = [job for job in jobs if parallel and job.normalized_portal in PROCESS_POOL_PORTALS]
+    local_jobs = [job for job in jobs if not (parallel and job.normalized_portal in PROCESS_POOL_PORTALS)]
+
+    futures = {}
+    if pooled_jobs:
+        # Submitted under the lock so another request cannot retire the pool halfway through
+        with _portal_pool_lock:
+            pool = _get_portal_pool(max(1, max_workers))
+            for job in pooled_jobs:
+                logger.info(f"Submitting census mapper for '{job.portal}' to process pool (function: {job.func.__name__})...")
+                future = pool.submit(run_mapper, job.portal, job.normalized_portal, job.func, other_data, census_frame, job.output_dir)
+                futures[job.portal] = (future, time.monotonic() + timeout if timeout else None)
+
+    for job in local_jobs:
+        logger.info(f"Running census mapper for '{job.portal}' (function: {job.func.__name__})...")
+        results[job.portal] = _run_local_mapper(job, census_frame, other_data, timeout)
+
+    pool_broken = timed_out = False
+    for portal, (future, deadline) in futures.items():
+        try:
+            remaining = max(0.0, deadline - time.monotonic()) if deadline else None
+            results[portal] = future.result(timeout=remaining)
+        except FutureTimeoutError:
+            timed_out = True
+            future.cancel()
+            results[portal] = MapperResult(portal, False, timeout, f"Mapper did not finish within {timeout:.0f}s")
+        except BrokenProcessPool as e:
+            pool_broken = True
+            results[portal] = MapperResult(portal, False, 0.0, f"Mapper worker process died: {e}", traceback.format_exc())
+        except Exception as e:
+            results[portal] = MapperResult(portal, False, 0.0, str(e), traceback.format_exc())
+
+    if timed_out:
+        logger.error(f"Census mappers timed out, retiring their process pool; its workers are stopped in {timeout:.0f}s")
+        _retire_portal_pool(pool, terminate_after=timeout)
+    elif pool_broken:
+        logger.error("Census mapper process pool is broken, it will be restarted for the next request")
+        _retire_portal_pool(pool)
+
+    return results
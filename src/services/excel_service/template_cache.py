@@ -0,0 +1,138 @@
+import hashlib
+import io
+import os
+import pickle
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+
+import openpyxl
+
+from src.utils.load_yaml import CENSUS_TEMPLATE_CACHE_MB
+from src.utils.logger import logger
+
+_HASH_BLOCK = 1024 * 1024
+
+
+def _file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(_HASH_BLOCK), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+@dataclass
+class _Snapshot:
+    stat_key: tuple      # (mtime_ns, size) when the snapshot was taken
+    sha256: str
+    pickled: bool        # True: `data` is a pickled Workbook; False: raw file bytes, parsed per copy
+    data: bytes
+
+
+class TemplateCache:
+    """
+    Process-wide cache of parsed template workbooks.
+
+    Each template is parsed once and kept as a pickled snapshot; every caller
+    gets its own fresh Workbook unpickled from it, so one request's cell writes
+    never reach another's. Workbooks that cannot be pickled (e.g. .xlsm loaded
+    with keep_vba) are cached as raw bytes and parsed per copy instead.
+
+    Snapshots are revalidated against the file's mtime and size on every use;
+    when those change, the content checksum decides whether to re-parse. The
+    least recently used snapshots are evicted once `max_bytes` is exceeded.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._snapshots = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def size_bytes(self):
+        return sum(len(snapshot.data) for snapshot in self._snapshots.values())
+
+    def load_workbook(self, path, **load_kwargs):
+        """
+        Return a fresh Workbook for the template at `path`, as openpyxl.load_workbook(path, **load_kwargs) would.
+
+        Raises:
+            FileNotFoundError: If the template does not exist
+        """
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        stat_key = (stat.st_mtime_ns, stat.st_size)
+        key = (path, tuple(sorted(load_kwargs.items())))
+
+        with self._lock:
+            snapshot = self._snapshots.get(key)
+            if snapshot is not None and snapshot.stat_key != stat_key:
+                if snapshot.sha256 == _file_sha256(path):
+                    snapshot.stat_key = stat_key  # Touched or copied over with the same content
+                else:
+                    logger.info(f"Template changed on disk, reloading: {os.path.basename(path)}")
+                    del self._snapshots[key]
+                    snapshot = None
+            if snapshot is not None:
+                self._snapshots.move_to_end(key)
+                self.hits += 1
+            else:
+                self.misses += 1
+
+        if snapshot is None:
+            return self._load_and_store(key, path, stat_key, load_kwargs)
+        return self._restore(snapshot, load_kwargs)
+
+    def _restore(self, snapshot, load_kwargs):
+        if snapshot.pickled:
+            return pickle.loads(snapshot.data)
+        return openpyxl.load_workbook(io.BytesIO(snapshot.data), **load_kwargs)
+
+    def _load_and_store(self, key, path, stat_key, load_kwargs):
+        with open(path, "rb") as f:
+            raw = f.read()
+        sha256 = hashlib.sha256(raw).hexdigest()
+        wb = openpyxl.load_workbook(io.BytesIO(raw), **load_kwargs)
+        try:
+            snapshot = _Snapshot(stat_key, sha256, True, pickle.dumps(wb, protocol=pickle.HIGHEST_PROTOCOL))
+        except (TypeError, AttributeError, pickle.PicklingError) as e:
+            logger.debug(f"Template {os.path.basename(path)} is not picklable ({e}), caching raw bytes")
+            snapshot = _Snapshot(stat_key, sha256, False, raw)
+
+        with self._lock:
+            if len(snapshot.data) <= self.max_bytes:
+                self._snapshots[key] = snapshot
+                self._snapshots.move_to_end(key)
+                self._evict()
+        # The workbook parsed here is handed out as is; later callers get copies from the snapshot
+        return wb
+
+    def _evict(self):
+        total = self.size_bytes
+        while total > self.max_bytes and self._snapshots:
+            evicted_key, evicted = self._snapshots.popitem(last=False)
+            total -= len(evicted.data)
+            logger.debug(f"Evicted template {os.path.basename(evicted_key[0])} from cache")
+
+    def invalidate(self, path=None):
+        """Drop the snapshots of one template (all load options), or of every template when `path` is None."""
+        with self._lock:
+            if path is None:
+                self._snapshots.clear()
+                return
+            path = os.path.abspath(path)
+            for key in [key for key in self._snapshots if key[0] == path]:
+                del self._snapshots[key]
+
+
+template_cache = TemplateCache(int(CENSUS_TEMPLATE_CACHE_MB * 1024 * 1024))
+
+
+def load_template(path, **load_kwargs):
+    """Fresh copy of a template workbook from the process-wide cache (openpyxl.load_workbook when disabled)."""
+    if template_cache.max_bytes <= 0:
+        return openpyxl.load_workbook(path, **load_kwargs)
+    return template_cache.load_workbook(path, **load_kwargs)
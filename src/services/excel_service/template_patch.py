@@ -0,0 +1,596 @@
+import html
+import io
+import os
+import posixpath
+import re
+import threading
+import zipfile
+from dataclasses import dataclass, field
+from datetime import date, datetime, time, timedelta
+from functools import lru_cache
+from xml.sax.saxutils import escape
+
+from openpyxl.cell.cell import get_time_format
+from openpyxl.formula.translate import Translator
+from openpyxl.styles.numbers import BUILTIN_FORMATS, BUILTIN_FORMATS_REVERSE, is_date_format
+from openpyxl.utils.cell import column_index_from_string, coordinate_from_string, range_boundaries
+
+from src.services.excel_service.formula_eval import ExcelError, FormulaError, evaluate_formulas
+from src.services.excel_service.template_cache import load_template
+from src.services.excel_service.template_writer import _needs_format, cell_xml, column_letter, write_rows
+from src.utils.census_metrics import stage
+from src.utils.generated_census import generated_census
+from src.utils.load_yaml import CENSUS_TEMPLATE_ENGINE
+from src.utils.logger import logger
+
+_ATTR_RE = re.compile(r'([\w:]+)="([^"]*)"')
+_SHEET_DATA_RE = re.compile(r'<sheetData\s*/>|<sheetData>(.*?)</sheetData>', re.S)
+_ROW_RE = re.compile(r'<row\b[^>]*?(?:/>|>.*?</row>)', re.S)
+_CELL_RE = re.compile(r'<c\b[^>]*?(?:/>|>.*?</c>)', re.S)
+_FORMULA_RE = re.compile(r'<f\b([^>]*?)(?:/>|>(.*?)</f>)', re.S)
+_XF_RE = re.compile(r'<xf\b[^>]*?(?:/>|>.*?</xf>)', re.S)
+_TEXT_RE = re.compile(r'<t\b[^>]*>(.*?)</t>', re.S)
+_VALUE_RE = re.compile(r'<v>(.*?)</v>', re.S)
+_DIMENSION_RE = re.compile(r'<dimension ref="([^"]*)"\s*/>')
+_CALC_PR_RE = re.compile(r'<calcPr\b[^>]*?/>')
+# Children of <workbook> that follow <calcPr>; a new calcPr goes in front of the first one present
+_AFTER_CALC_PR_RE = re.compile(r'<(?:oleSize|customWorkbookViews|pivotCaches|smartTagPr|smartTagTypes|webPublishing|'
+                               r'fileRecoveryPr|webPublishObjects|extLst)\b|</workbook>')
+
+_OFFICE_DOCUMENT = "/officeDocument"
+_CALC_CHAIN = "/calcChain"
+_FIRST_CUSTOM_FORMAT_ID = 164
+
+
+class TemplatePatchError(Exception):
+    """The template uses something the zip-level engine cannot patch safely; callers fall back to openpyxl."""
+
+
+@dataclass(frozen=True)
+class Block:
+    """A rectangular area of the target sheet filled with one row of values per member."""
+    start_row: int
+    columns: str                                         # Column letters, e.g. "B:I" (or "Z" for one column)
+    number_formats: dict = field(default_factory=dict)   # {column letter: number format} for non-text values
+
+    @property
+    def column_range(self):
+        first, _, last = self.columns.partition(":")
+        return _column_index(first), _column_index(last or first)
+
+    def column_formats(self):
+        """number_formats keyed by 1-based column index, as template_writer expects them."""
+        return {_column_index(letter): fmt for letter, fmt in self.number_formats.items()}
+
+
+@dataclass(frozen=True)
+class TemplateSpec:
+    """Where a mapper's values go in its template: the target sheet and its named blocks."""
+    template_path: str
+    sheet_name: str
+    blocks: dict                # {block name: Block}
+    recalculate: bool = False   # Store formula results in the output, as re-saving it in Excel would
+
+    def cells(self, blocks):
+        """{row: {column: (value, number format)}} for {block name: rows of values}."""
+        cells = {}
+        for name, rows in blocks.items():
+            block = self.blocks[name]
+            first, last = block.column_range
+            formats = block.column_formats()
+            for row_num, values in enumerate(rows, start=block.start_row):
+                if len(values) > last - first + 1:
+                    raise ValueError(f"Block '{name}' row {row_num} has {len(values)} values for columns {block.columns}")
+                row = cells.setdefault(row_num, {})
+                for column, value in enumerate(values, start=first):
+                    row[column] = (value, formats.get(column))
+        return cells
+
+
+@lru_cache(maxsize=None)
+def _column_index(letter):
+    return column_index_from_string(letter)
+
+
+def _attrs(tag_xml):
+    return {name: html.unescape(value) for name, value in _ATTR_RE.findall(tag_xml)}
+
+
+def _open_tag(element_xml):
+    return element_xml[:element_xml.index(">") + 1]
+
+
+def _elements(xml, tag):
+    """Attribute dicts of every <tag ...> element in `xml`."""
+    return [_attrs(match) for match in re.findall(rf'<{tag}\b([^>]*)>', xml)]
+
+
+def _split_ref(ref):
+    letter, row = coordinate_from_string(ref)
+    return row, _column_index(letter)
+
+
+def _shared_strings(xml):
+    """Text of each <si> in sharedStrings.xml, rich-text runs joined and phonetic hints dropped."""
+    items = re.findall(r'<si>(.*?)</si>', re.sub(r'<rPh\b.*?</rPh>', "", xml, flags=re.S), re.S)
+    return [html.unescape("".join(_TEXT_RE.findall(item))) for item in items]
+
+
+def _cached_value(value):
+    """(cell type, <v> text) for a formula result."""
+    if isinstance(value, bool):
+        return "b", str(int(value))
+    if isinstance(value, ExcelError):
+        return "e", value.code
+    if isinstance(value, str):
+        return "str", value
+    return None, "%.16g" % value
+
+
+class _Styles:
+    """cellXfs and number formats of a template's styles.xml."""
+
+    def __init__(self, xml):
+        cell_xfs = re.search(r'<cellXfs\b[^>]*>(.*?)</cellXfs>', xml, re.S)
+        if cell_xfs is None:
+            raise TemplatePatchError("styles.xml has no cellXfs")
+        self.xml = xml
+        self.xfs = _XF_RE.findall(cell_xfs.group(1))
+        self.custom_formats = {int(attrs["numFmtId"]): attrs["formatCode"] for attrs in _elements(xml, "numFmt")}
+
+    def number_format(self, style_id):
+        format_id = int(_attrs(_open_tag(self.xfs[style_id])).get("numFmtId", 0)) if style_id < len(self.xfs) else 0
+        return self.custom_formats.get(format_id) or BUILTIN_FORMATS.get(format_id, "General")
+
+
+class _StyleBuilder:
+    """Per-render view of the template styles that adds an xf for each (base style, number format) pair used."""
+
+    def __init__(self, styles):
+        self.styles = styles
+        self.new_xfs = []
+        self.new_formats = {}
+        self._derived = {}
+
+    def style_for(self, base_style, value, number_format):
+        # openpyxl semantics: dates get a date format unless the cell already has one, explicit formats
+        # apply to non-text values only
+        if isinstance(value, (datetime, date, time, timedelta)):
+            target = number_format
+            if target is None and not is_date_format(self.styles.number_format(base_style)):
+                target = get_time_format(type(value))
+        else:
+            target = number_format if number_format and _needs_format(value) else None
+        if target is None or target == self.styles.number_format(base_style):
+            return base_style
+
+        key = (base_style, target)
+        if key not in self._derived:
+            base_xf = self.styles.xfs[base_style] if base_style < len(self.styles.xfs) else '<xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>'
+            self.new_xfs.append(self._with_format(base_xf, self._format_id(target)))
+            self._derived[key] = len(self.styles.xfs) + len(self.new_xfs) - 1
+        return self._derived[key]
+
+    def _format_id(self, code):
+        if code in BUILTIN_FORMATS_REVERSE:
+            return BUILTIN_FORMATS_REVERSE[code]
+        for format_id, existing in list(self.styles.custom_formats.items()) + list(self.new_formats.items()):
+            if existing == code:
+                return format_id
+        format_id = max([_FIRST_CUSTOM_FORMAT_ID - 1, *self.styles.custom_formats, *self.new_formats]) + 1
+        self.new_formats[format_id] = code
+        return format_id
+
+    @staticmethod
+    def _with_format(xf, format_id):
+        tag = _open_tag(xf)
+        new_tag = re.sub(r'\s(?:numFmtId|applyNumberFormat)="[^"]*"', "", tag)
+        new_tag = new_tag.replace("<xf", f'<xf numFmtId="{format_id}" applyNumberFormat="1"', 1)
+        return new_tag + xf[len(tag):]
+
+    @property
+    def changed(self):
+        return bool(self.new_xfs)
+
+    def xml(self):
+        xml = self.styles.xml
+        cell_xfs = re.search(r'<cellXfs\b[^>]*>(.*?)</cellXfs>', xml, re.S)
+        xfs = self.styles.xfs + self.new_xfs
+        xml = f'{xml[:cell_xfs.start()]}<cellXfs count="{len(xfs)}">{"".join(xfs)}</cellXfs>{xml[cell_xfs.end():]}'
+        if self.new_formats:
+            formats = {**self.styles.custom_formats, **self.new_formats}
+            num_fmts = "".join(f'<numFmt numFmtId="{format_id}" formatCode="{escape(code, {chr(34): "&quot;"})}"/>'
+                               for format_id, code in formats.items())
+            num_fmts = f'<numFmts count="{len(formats)}">{num_fmts}</numFmts>'
+            existing = re.search(r'<numFmts\b[^>]*?(?:/>|>.*?</numFmts>)', xml, re.S)
+            if existing:
+                xml = xml[:existing.start()] + num_fmts + xml[existing.end():]
+            else:  # numFmts is the first child of styleSheet
+                root = re.search(r'<styleSheet\b[^>]*>', xml)
+                xml = xml[:root.end()] + num_fmts + xml[root.end():]
+        return xml
+
+
+class CompiledTemplate:
+    """
+    A template package split up once so it can be filled without openpyxl.
+
+    The target sheet's XML is kept as a head, one string per <row> and a tail;
+    rendering rewrites only the rows that receive values and streams everything
+    else through unchanged. Every other part of the package (shared strings,
+    other sheets, drawings, the VBA project) is copied byte-for-byte.
+    """
+
+    def __init__(self, path, sheet_name):
+        self.path = path
+        self.sheet_name = sheet_name
+        with open(path, "rb") as f:
+            self.raw = f.read()
+
+        with zipfile.ZipFile(io.BytesIO(self.raw)) as package:
+            workbook_part = self._office_document(package)
+            self.workbook_part = workbook_part
+            self.workbook_rels_part, workbook_rels = self._relationships(package, workbook_part)
+            self.workbook_xml = package.read(workbook_part).decode("utf-8")
+
+            sheet_rid = None
+            for attrs in _elements(self.workbook_xml, "sheet"):
+                if attrs.get("name") == sheet_name:
+                    sheet_rid = attrs.get("r:id")
+            if sheet_rid is None:
+                raise KeyError(f"Worksheet {sheet_name} does not exist.")
+            self.sheet_part = workbook_rels[sheet_rid][1]
+
+            self.styles_part = next((target for kind, target in workbook_rels.values() if kind.endswith("/styles")), None)
+            if self.styles_part is None:
+                raise TemplatePatchError("workbook has no styles part")
+            self.styles = _Styles(package.read(self.styles_part).decode("utf-8"))
+            self.calc_chain_part = next((target for kind, target in workbook_rels.values()
+                                         if kind.endswith(_CALC_CHAIN)), None)
+            shared_strings_part = next((target for kind, target in workbook_rels.values()
+                                        if kind.endswith("/sharedStrings")), None)
+            self.shared_strings = _shared_strings(package.read(shared_strings_part).decode("utf-8")) \
+                if shared_strings_part else []
+            self._split_sheet(package.read(self.sheet_part).decode("utf-8"))
+
+    @staticmethod
+    def _office_document(package):
+        _, targets = CompiledTemplate._relationships(package, "")
+        for kind, target in targets.values():
+            if kind.endswith(_OFFICE_DOCUMENT):
+                return target
+        raise TemplatePatchError("package has no workbook part")
+
+    @staticmethod
+    def _relationships(package, part):
+        folder, name = posixpath.split(part)
+        rels_part = posixpath.join(folder, "_rels", f"{name}.rels")
+        targets = {}
+        for attrs in _elements(package.read(rels_part).decode("utf-8"), "Relationship"):
+            target = attrs["Target"]
+            if attrs.get("TargetMode") == "External":
+                continue
+            target = target.lstrip("/") if target.startswith("/") else posixpath.normpath(posixpath.join(folder, target))
+            targets[attrs["Id"]] = (attrs.get("Type", ""), target)
+        return rels_part, targets
+
+    def _split_sheet(self, xml):
+        declaration = re.match(r'<\?xml[^>]*encoding="([^"]*)"', xml)
+        if declaration and declaration.group(1).lower() not in ("utf-8", "utf8"):
+            raise TemplatePatchError(f"sheet is encoded as {declaration.group(1)}")
+        sheet_data = _SHEET_DATA_RE.search(xml)
+        if sheet_data is None:
+            raise TemplatePatchError("sheet has no sheetData")
+        self.head = xml[:sheet_data.start()]
+        self.tail = xml[sheet_data.end():]
+        self.has_formulas = "<f" in (sheet_data.group(1) or "")
+        self.rows = {}
+        for match in _ROW_RE.finditer(sheet_data.group(1) or ""):
+            row_num = _attrs(_open_tag(match.group(0))).get("r")
+            if row_num is None:
+                raise TemplatePatchError("sheet rows have no row numbers")
+            self.rows[int(row_num)] = match.group(0)
+
+    @staticmethod
+    def _row_cells(row_xml):
+        """{column: (cell xml, cell attrs)} of a template row."""
+        cells = {}
+        for match in _CELL_RE.finditer(row_xml):
+            attrs = _attrs(_open_tag(match.group(0)))
+            if "r" not in attrs:
+                raise TemplatePatchError("sheet cells have no references")
+            cells[_split_ref(attrs["r"])[1]] = (match.group(0), attrs)
+        return cells
+
+    def _merge_row(self, row_num, values, styles, shared_masters):
+        """New XML for one row: template cells overlaid with `values` ({column: (value, format)})."""
+        template_row = self.rows.get(row_num)
+        if template_row is not None:
+            row_attrs = re.sub(r'\sspans="[^"]*"', "", _open_tag(template_row)).rstrip("/>").rstrip()[4:]
+            cells = self._row_cells(template_row)
+        else:
+            row_attrs = f' r="{row_num}"'
+            cells = {}
+
+        formulas_replaced = False
+        for column, (value, number_format) in values.items():
+            ref = f"{column_letter(column)}{row_num}"
+            existing = cells.get(column)
+            base_style = int(existing[1].get("s", 0)) if existing else 0
+            if existing and "<f" in existing[0]:
+                formulas_replaced = True
+                formula = _FORMULA_RE.search(existing[0])
+                formula_attrs = _attrs(formula.group(1))
+                if formula_attrs.get("t") == "shared" and "ref" in formula_attrs:
+                    shared_masters[formula_attrs["si"]] = (ref, html.unescape(formula.group(2) or ""), formula_attrs["ref"])
+            xml = cell_xml(ref, value, styles.style_for(base_style, value, number_format))
+            if not xml and base_style:
+                xml = f'<c r="{ref}" s="{base_style}"/>'  # Cleared cells keep the template's style
+            cells[column] = (xml, None)
+
+        merged = "".join(xml for _, (xml, _) in sorted(cells.items()))
+        return f'<row{row_attrs}>{merged}</row>', formulas_replaced
+
+    @staticmethod
+    def _expand_shared(row_xml, si, master_ref, formula):
+        """Turn the dependents of a shared formula whose master cell was overwritten into plain formulas."""
+        def expand(match):
+            cell = match.group(0)
+            found = _FORMULA_RE.search(cell)
+            if found is None:
+                return cell
+            attrs = _attrs(found.group(1))
+            if attrs.get("t") != "shared" or attrs.get("si") != si or "ref" in attrs:
+                return cell
+            ref = _attrs(_open_tag(cell))["r"]
+            translated = Translator(f"={formula}", origin=master_ref).translate_formula(ref)[1:]
+            return f"{cell[:found.start()]}<f>{escape(translated)}</f>{cell[found.end():]}"
+        return _CELL_RE.sub(expand, row_xml)
+
+    def _cell_value(self, cell, attrs):
+        """Value of a non-formula cell as the formula evaluator sees it (None for empty cells)."""
+        kind = attrs.get("t", "n")
+        if kind == "inlineStr":
+            texts = _TEXT_RE.findall(cell)
+            return html.unescape("".join(texts)) if texts else None
+        value = _VALUE_RE.search(cell)
+        if value is None:
+            return None
+        text = html.unescape(value.group(1))
+        if kind == "s":
+            return self.shared_strings[int(text)]
+        if kind == "b":
+            return text == "1"
+        if kind == "e":
+            return ExcelError(text)
+        if kind in ("str", "d"):
+            return text
+        return float(text) if text else None
+
+    def _with_formula_results(self, patched):
+        """Rows of the sheet with each formula's result stored as its cached value, for every row that changes."""
+        rows = {row_num: patched.get(row_num) or self.rows[row_num] for row_num in self.rows.keys() | patched.keys()}
+        values, formulas, masters, dependents = {}, {}, {}, []
+        for row_xml in rows.values():
+            for match in _CELL_RE.finditer(row_xml):
+                cell = match.group(0)
+                attrs = _attrs(_open_tag(cell))
+                key = _split_ref(attrs["r"])
+                formula = _FORMULA_RE.search(cell)
+                if formula is None:
+                    value = self._cell_value(cell, attrs)
+                    if value is not None:
+                        values[key] = value
+                    continue
+                formula_attrs = _attrs(formula.group(1))
+                text = html.unescape(formula.group(2) or "")
+                if formula_attrs.get("t") == "shared":
+                    if "ref" not in formula_attrs:
+                        dependents.append((key, attrs["r"], formula_attrs["si"]))
+                        continue
+                    masters[formula_attrs["si"]] = (attrs["r"], text)
+                formulas[key] = text
+        for key, ref, si in dependents:
+            master_ref, text = masters[si]
+            formulas[key] = Translator(f"={text}", origin=master_ref).translate_formula(ref)[1:]
+
+        results = evaluate_formulas(values, formulas)
+
+        def cached(match):
+            cell = match.group(0)
+            formula = _FORMULA_RE.search(cell)
+            if formula is None:
+                return cell
+            tag = _open_tag(cell)
+            kind, text = _cached_value(results[_split_ref(_attrs(tag)["r"])])
+            tag = re.sub(r'\st="[^"]*"', "", tag.rstrip("/>").rstrip())
+            type_attr = f' t="{kind}"' if kind else ""
+            return f'{tag}{type_attr}>{formula.group(0)}<v>{escape(text)}</v></c>'
+
+        return {row_num: _CELL_RE.sub(cached, row_xml) if "<f" in row_xml else row_xml
+                for row_num, row_xml in rows.items() if row_num in patched or "<f" in row_xml}
+
+    def _dimension(self, cells):
+        current = _DIMENSION_RE.search(self.head)
+        if current is None or not cells:
+            return self.head
+        min_col, min_row, max_col, max_row = range_boundaries(current.group(1))
+        columns = [column for row in cells.values() for column in row]
+        min_row, max_row = min(min_row or 1, min(cells)), max(max_row or 1, max(cells))
+        min_col, max_col = min(min_col or 1, min(columns)), max(max_col or 1, max(columns))
+        ref = f"{column_letter(min_col)}{min_row}:{column_letter(max_col)}{max_row}"
+        return f'{self.head[:current.start()]}<dimension ref="{ref}"/>{self.head[current.end():]}'
+
+    def _workbook_xml(self):
+        """workbook.xml with fullCalcOnLoad set, so formulas over the new values recalculate when opened."""
+        calc_pr = _CALC_PR_RE.search(self.workbook_xml)
+        if calc_pr is None:
+            position = _AFTER_CALC_PR_RE.search(self.workbook_xml).start()
+            return f'{self.workbook_xml[:position]}<calcPr calcId="124519" fullCalcOnLoad="1"/>{self.workbook_xml[position:]}'
+        tag = calc_pr.group(0)
+        new_tag = re.sub(r'\sfullCalcOnLoad="[^"]*"', "", tag).replace("<calcPr", '<calcPr fullCalcOnLoad="1"', 1)
+        return self.workbook_xml[:calc_pr.start()] + new_tag + self.workbook_xml[calc_pr.end():]
+
+    def _without_calc_chain(self, name, data):
+        if name == self.workbook_rels_part:
+            return re.sub(r'<Relationship\b[^>]*Type="[^"]*/calcChain"[^>]*/>', "", data.decode("utf-8")).encode("utf-8")
+        if name == "[Content_Types].xml":
+            return re.sub(r'<Override\b[^>]*PartName="/' + re.escape(self.calc_chain_part) + r'"[^>]*/>', "",
+                          data.decode("utf-8")).encode("utf-8")
+        return data
+
+    def render(self, output, cells, recalculate=False):
+        """
+        Write a copy of the template with `cells` ({row: {column: (value, number format)}}) filled in.
+
+        With `recalculate`, every formula on the sheet is evaluated and its result
+        stored as the cached value, so readers that do not calculate (portals,
+        pandas) see current results without the file going through Excel.
+
+        Raises:
+            TemplatePatchError: Before anything is written, if the values cannot be spliced in safely
+        """
+        styles = _StyleBuilder(self.styles)
+        shared_masters = {}
+        patched = {}
+        formulas_replaced = False
+        for row_num in sorted(cells):
+            patched[row_num], replaced = self._merge_row(row_num, cells[row_num], styles, shared_masters)
+            formulas_replaced |= replaced
+
+        for si, (master_ref, formula, ref) in shared_masters.items():
+            _, min_row, _, max_row = range_boundaries(ref)
+            for row_num in range(min_row, max_row + 1):
+                row_xml = patched.get(row_num, self.rows.get(row_num))
+                if row_xml is not None:
+                    patched[row_num] = self._expand_shared(row_xml, si, master_ref, formula)
+
+        if recalculate:
+            try:
+                patched = self._with_formula_results(patched)
+                formulas_replaced = True  # Cached values changed; Excel rebuilds the calc chain
+            except FormulaError as e:
+                logger.warning(f"Formula results not stored for {os.path.basename(self.path)}: {e}")
+
+        drop_calc_chain = formulas_replaced and self.calc_chain_part is not None
+        calculate_on_load = self.has_formulas or self.calc_chain_part is not None
+        replaced_parts = {self.workbook_part: self._workbook_xml().encode("utf-8")} if calculate_on_load else {}
+        if styles.changed:
+            replaced_parts[self.styles_part] = styles.xml().encode("utf-8")
+
+        with zipfile.ZipFile(io.BytesIO(self.raw)) as template, zipfile.ZipFile(output, "w", zipfile.ZIP_DEFLATED) as package:
+            for info in template.infolist():
+                if drop_calc_chain and info.filename == self.calc_chain_part:
+                    continue
+                copy = zipfile.ZipInfo(info.filename, info.date_time)
+                copy.compress_type = info.compress_type
+                copy.external_attr = info.external_attr
+                if info.filename == self.sheet_part:
+                    with package.open(copy, "w") as sheet:
+                        self._write_sheet(sheet, patched, cells)
+                    continue
+                data = replaced_parts.get(info.filename)
+                if data is None:
+                    data = template.read(info)
+                    if drop_calc_chain:
+                        data = self._without_calc_chain(info.filename, data)
+                package.writestr(copy, data)
+
+    def _write_sheet(self, sheet, patched, cells):
+        sheet.write(self._dimension(cells).encode("utf-8"))
+        sheet.write(b"<sheetData>")
+        batch = []
+        for row_num in sorted(self.rows.keys() | patched.keys()):
+            batch.append(patched.get(row_num) or self.rows[row_num])
+            if len(batch) >= 1000:
+                sheet.write("".join(batch).encode("utf-8"))
+                batch = []
+        sheet.write("".join(batch).encode("utf-8"))
+        sheet.write(b"</sheetData>")
+        sheet.write(self.tail.encode("utf-8"))
+
+
+_compiled = {}
+_compiled_lock = threading.Lock()
+
+
+def compile_template(template_path, sheet_name):
+    """
+    CompiledTemplate for one sheet of a template, reused until the file changes on disk.
+
+    Raises:
+        FileNotFoundError: If the template does not exist
+        KeyError: If the workbook has no sheet called `sheet_name`
+        TemplatePatchError: If the package cannot be patched at zip level
+    """
+    path = os.path.abspath(template_path)
+    stat = os.stat(path)
+    stat_key = (stat.st_mtime_ns, stat.st_size)
+    with _compiled_lock:
+        entry = _compiled.get((path, sheet_name))
+    if entry is not None and entry[0] == stat_key:
+        return entry[1]
+    compiled = CompiledTemplate(path, sheet_name)
+    with _compiled_lock:
+        _compiled[(path, sheet_name)] = (stat_key, compiled)
+    return compiled
+
+
+class _TemplateWriter:
+
+    def census(self, filename, blocks, output_dir=None):
+        """Render in memory and return a GeneratedCensus (also saved in output_dir when set, for debugging)."""
+        return generated_census(filename, lambda output: self.render(output, blocks), output_dir)
+
+
+class _OpenpyxlTemplate(_TemplateWriter):
+    """Fallback writer: the template is loaded through openpyxl (from the template cache) and saved whole."""
+
+    def __init__(self, spec):
+        self.spec = spec
+        load_kwargs = {"keep_vba": True} if spec.template_path.lower().endswith(".xlsm") else {}
+        self.workbook = load_template(spec.template_path, **load_kwargs)
+        self.sheet = self.workbook[spec.sheet_name]
+
+    def render(self, output, blocks):
+        for name, rows in blocks.items():
+            block = self.spec.blocks[name]
+            write_rows(self.sheet, rows, block.start_row, block.column_range[0], block.column_formats())
+        self.workbook.save(output)
+
+
+class _PatchedTemplate(_TemplateWriter):
+    """Writer backed by the zip-level engine."""
+
+    def __init__(self, spec, compiled):
+        self.spec = spec
+        self.compiled = compiled
+
+    def render(self, output, blocks):
+        blocks = {name: [list(row) for row in rows] for name, rows in blocks.items()}
+        try:
+            self.compiled.render(output, self.spec.cells(blocks), self.spec.recalculate)
+        except TemplatePatchError as e:
+            logger.warning(f"Cannot patch {os.path.basename(self.spec.template_path)} in place ({e}), using openpyxl")
+            _OpenpyxlTemplate(self.spec).render(output, blocks)
+
+
+def open_template(spec):
+    """
+    Writer for a mapper's template; call .render(output, {block name: rows}) on it to save a filled
+    copy, or .census(filename, {block name: rows}) to get it in memory as a GeneratedCensus.
+
+    Uses the zip-level patch engine unless `census.template_engine` is 'openpyxl';
+    templates the engine cannot patch safely go through openpyxl instead.
+
+    Raises:
+        FileNotFoundError: If the template does not exist
+        KeyError: If the template has no sheet called spec.sheet_name
+    """
+    with stage("template_load"):
+        if CENSUS_TEMPLATE_ENGINE == "patch":
+            try:
+                return _PatchedTemplate(spec, compile_template(spec.template_path, spec.sheet_name))
+            except TemplatePatchError as e:
+                logger.warning(f"Cannot patch {os.path.basename(spec.template_path)} in place ({e}), using openpyxl")
+        return _OpenpyxlTemplate(spec)
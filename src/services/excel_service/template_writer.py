@@ -0,0 +1,246 @@
+import math
+import numbers
+import zipfile
+from datetime import date, datetime, time, timedelta
+from functools import lru_cache
+from xml.sax.saxutils import escape
+
+from openpyxl.cell.cell import Cell, ERROR_CODES, ILLEGAL_CHARACTERS_RE
+from openpyxl.styles.numbers import BUILTIN_FORMATS_REVERSE
+from openpyxl.utils import get_column_letter
+from openpyxl.utils.datetime import to_excel
+
+# Default date formats of DataFrame.to_excel, used when a date column has no explicit format
+DATE_FORMAT = "YYYY-MM-DD"
+DATETIME_FORMAT = "YYYY-MM-DD HH:MM:SS"
+
+HEADER_STYLE_ID = 1   # Bold, thin border, centred: the DataFrame.to_excel header look
+_FIRST_CUSTOM_FORMAT_ID = 164
+
+
+def _needs_format(value):
+    # Number formats only change how numbers and dates display; text cells keep the template's format
+    return value is not None and not isinstance(value, str)
+
+
+def write_rows(ws, rows, start_row, start_column=1, number_formats=None):
+    """
+    Write a 2-D block of values into a template worksheet in one pass.
+
+    Cells already present in the template keep their styles; missing ones are
+    created directly instead of going through ws.cell() per value.
+
+    Args:
+        ws: openpyxl worksheet to fill
+        rows: Iterable of row sequences, written left to right from start_column
+        start_row: 1-based row of the first block row
+        start_column: 1-based column of the first value in each row
+        number_formats: Optional {sheet column: number format} applied to the non-text values of that column
+
+    Returns:
+        int: Number of rows written
+    """
+    cells = ws._cells
+    formats = number_formats or {}
+    written = 0
+    for row_num, values in enumerate(rows, start=start_row):
+        for column, value in enumerate(values, start=start_column):
+            cell = cells.get((row_num, column))
+            if cell is None:
+                cell = cells[(row_num, column)] = Cell(ws, row=row_num, column=column)
+            cell.value = value
+            if column in formats and _needs_format(value):
+                cell.number_format = formats[column]
+        written += 1
+    return written
+
+
+def write_columns(ws, columns, start_row, start_column=1, number_formats=None):
+    """write_rows() for a block given as equal-length columns (lists or Series) instead of rows."""
+    return write_rows(ws, zip(*(list(column) for column in columns)), start_row, start_column, number_formats)
+
+
+# --- Fast path: sheet XML emitted directly -------------------------------------------------
+
+@lru_cache(maxsize=None)
+def column_letter(column):
+    return get_column_letter(column)
+
+
+def cell_xml(ref, value, style_id=None):
+    """
+    SpreadsheetML for one cell, typed the way openpyxl types cell values.
+
+    Returns an empty string for values that produce no cell (None, NaN/NaT, infinities).
+    """
+    style = f' s="{style_id}"' if style_id else ""
+    if value is None:
+        return ""
+    if isinstance(value, bool):
+        return f'<c r="{ref}"{style} t="b"><v>{int(value)}</v></c>'
+    if isinstance(value, numbers.Real):
+        if math.isnan(value) or math.isinf(value):
+            return ""
+        return f'<c r="{ref}"{style} t="n"><v>{"%.16g" % value}</v></c>'
+    if isinstance(value, (datetime, date, time, timedelta)):
+        serial = to_excel(value)
+        if serial is None or (isinstance(serial, float) and math.isnan(serial)):  # NaT
+            return ""
+        return f'<c r="{ref}"{style} t="n"><v>{"%.16g" % serial}</v></c>'
+
+    text = ILLEGAL_CHARACTERS_RE.sub("", value if isinstance(value, str) else str(value))
+    if len(text) > 1 and text.startswith("="):
+        return f'<c r="{ref}"{style}><f>{escape(text[1:])}</f><v></v></c>'
+    if not text:
+        return f'<c r="{ref}"{style} t="inlineStr"/>'
+    if text in ERROR_CODES:
+        return f'<c r="{ref}"{style} t="e"><v>{escape(text)}</v></c>'
+    space = ' xml:space="preserve"' if text != text.strip() else ""
+    return f'<c r="{ref}"{style} t="inlineStr"><is><t{space}>{escape(text)}</t></is></c>'
+
+
+def rows_xml(rows, start_row, start_column=1, style_for=None):
+    """
+    Yield one <row> element per row of values.
+
+    Args:
+        rows: Iterable of row sequences
+        start_row / start_column: 1-based position of the first value
+        style_for: Optional callable(column, value) returning the cellXfs index for that cell (or None)
+    """
+    for row_num, values in enumerate(rows, start=start_row):
+        cells = []
+        for column, value in enumerate(values, start=start_column):
+            cells.append(cell_xml(f"{column_letter(column)}{row_num}", value,
+                                  style_for(column, value) if style_for else None))
+        yield f'<row r="{row_num}">{"".join(cells)}</row>'
+
+
+class _NewSheetStyles:
+    """cellXfs of a generated workbook: 0 default, 1 header, then one per number format used."""
+
+    def __init__(self):
+        self._style_ids = {}
+        self._custom_formats = {}
+
+    def for_format(self, number_format):
+        style_id = self._style_ids.get(number_format)
+        if style_id is None:
+            style_id = self._style_ids[number_format] = HEADER_STYLE_ID + 1 + len(self._style_ids)
+            if number_format not in BUILTIN_FORMATS_REVERSE:
+                self._custom_formats[number_format] = _FIRST_CUSTOM_FORMAT_ID + len(self._custom_formats)
+        return style_id
+
+    def _format_id(self, number_format):
+        return BUILTIN_FORMATS_REVERSE.get(number_format, self._custom_formats.get(number_format))
+
+    def xml(self):
+        num_fmts = "".join(f'<numFmt numFmtId="{format_id}" formatCode="{escape(code, {chr(34): "&quot;"})}"/>'
+                           for code, format_id in self._custom_formats.items())
+        thin = '<color auto="1"/>'
+        xfs = ['<xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>',
+               '<xf numFmtId="0" fontId="1" fillId="0" borderId="1" xfId="0" applyFont="1" applyBorder="1" '
+               'applyAlignment="1"><alignment horizontal="center" vertical="top"/></xf>']
+        xfs += [f'<xf numFmtId="{self._format_id(code)}" fontId="0" fillId="0" borderId="0" xfId="0" '
+                f'applyNumberFormat="1"/>' for code in self._style_ids]
+        return (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+            + (f'<numFmts count="{len(self._custom_formats)}">{num_fmts}</numFmts>' if num_fmts else "")
+            + '<fonts count="2"><font><sz val="11"/><name val="Calibri"/><family val="2"/></font>'
+            '<font><b/><sz val="11"/><name val="Calibri"/><family val="2"/></font></fonts>'
+            '<fills count="2"><fill><patternFill patternType="none"/></fill>'
+            '<fill><patternFill patternType="gray125"/></fill></fills>'
+            '<borders count="2"><border><left/><right/><top/><bottom/><diagonal/></border>'
+            f'<border><left style="thin">{thin}</left><right style="thin">{thin}</right>'
+            f'<top style="thin">{thin}</top><bottom style="thin">{thin}</bottom><diagonal/></border></borders>'
+            '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+            f'<cellXfs count="{len(xfs)}">{"".join(xfs)}</cellXfs>'
+            '<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>'
+            '</styleSheet>'
+        )
+
+
+_CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '<Override PartName="/xl/worksheets/sheet1.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+    '<Override PartName="/xl/styles.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+    '</Types>'
+)
+_ROOT_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+    'Target="xl/workbook.xml"/></Relationships>'
+)
+_WORKBOOK_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+    'Target="worksheets/sheet1.xml"/>'
+    '<Relationship Id="rId2" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" '
+    'Target="styles.xml"/></Relationships>'
+)
+
+
+def write_new_sheet(output, rows, header=None, sheet_title="Sheet1", number_formats=None):
+    """
+    Fast path for sheets built from scratch: stream the rows straight into the sheet XML.
+
+    No cell objects are created; each row is turned into SpreadsheetML and written
+    to the package as it is produced, so memory stays flat in the number of rows.
+    The header (when given) and date cells are styled the way DataFrame.to_excel
+    styles them.
+
+    Args:
+        output: Path or binary file object for the .xlsx
+        rows: Iterable of row sequences
+        header: Optional list of column titles for row 1
+        sheet_title: Title of the single worksheet
+        number_formats: Optional {column (1-based): number format} for the non-text values of that column
+
+    Returns:
+        int: Number of data rows written
+    """
+    formats = number_formats or {}
+    styles = _NewSheetStyles()
+
+    def style_for(column, value):
+        fmt = formats.get(column)
+        if fmt is None and isinstance(value, (date, time)):
+            fmt = DATETIME_FORMAT if isinstance(value, datetime) else DATE_FORMAT if isinstance(value, date) else None
+        return styles.for_format(fmt) if fmt and _needs_format(value) else None
+
+    written = 0
+    with zipfile.ZipFile(output, "w", zipfile.ZIP_DEFLATED) as package:
+        with package.open("xl/worksheets/sheet1.xml", "w") as sheet:
+            sheet.write(b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                        b'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>')
+            start_row = 1
+            if header is not None:
+                sheet.write(next(rows_xml([header], 1, style_for=lambda column, value: HEADER_STYLE_ID)).encode("utf-8"))
+                start_row = 2
+            for row in rows_xml(rows, start_row, style_for=style_for):
+                sheet.write(row.encode("utf-8"))
+                written += 1
+            sheet.write(b'</sheetData></worksheet>')
+
+        package.writestr("[Content_Types].xml", _CONTENT_TYPES)
+        package.writestr("_rels/.rels", _ROOT_RELS)
+        package.writestr("xl/workbook.xml", (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+            'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+            f'<sheets><sheet name="{escape(sheet_title, {chr(34): "&quot;"})}" sheetId="1" r:id="rId1"/></sheets>'
+            '</workbook>'
+        ))
+        package.writestr("xl/_rels/workbook.xml.rels", _WORKBOOK_RELS)
+        package.writestr("xl/styles.xml", styles.xml())
+    return written
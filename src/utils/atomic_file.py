@@ -0,0 +1,28 @@
+import os
+import tempfile
+from contextlib import contextmanager
+
+
+@contextmanager
+def atomic_write(path, mode="wb"):
+    """
+    Write a file under a temporary name and rename it into place when the block completes.
+
+    The rename is the completion signal: readers find either no file or the whole
+    file, never a partial one, so nothing has to poll for locks or wait for the
+    writer to settle. On error the temporary file is removed and `path` is untouched.
+
+    Usage:
+        with atomic_write(output_path) as f:
+            f.write(content)
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=f".{os.path.basename(path)}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, mode) as f:
+            yield f
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
@@ -0,0 +1,115 @@
+import base64
+import binascii
+import io
+import re
+
+from src.utils.atomic_file import atomic_write
+
+# 3 raw bytes <-> 4 base64 characters; chunk sizes below are multiples of both
+DEFAULT_CHUNK_CHARS = 1024 * 1024
+_RAW_BLOCK = 3 * 64 * 1024
+_NON_BASE64 = re.compile(r"[^A-Za-z0-9+/=]")
+
+
+def base64_encoded_length(size):
+    """Length of the base64 text for `size` raw bytes."""
+    return 4 * ((size + 2) // 3)
+
+
+class Base64StreamDecoder:
+    """
+    Incremental base64 decoder writing raw bytes to a binary file object.
+
+    Characters outside the base64 alphabet (newlines, spaces) are discarded the
+    same way base64.b64decode does by default, and partial 4-character groups
+    are carried over to the next chunk.
+    """
+
+    def __init__(self, out_file):
+        self.out_file = out_file
+        self.bytes_written = 0
+        self._carry = ""
+
+    def feed(self, chunk):
+        if isinstance(chunk, (bytes, bytearray)):
+            chunk = chunk.decode("ascii", errors="ignore")
+        text = self._carry + _NON_BASE64.sub("", chunk)
+        usable = len(text) - len(text) % 4
+        self._carry = text[usable:]
+        if usable:
+            self._write(text[:usable])
+
+    def close(self):
+        """Flush the remaining characters; raises binascii.Error on truncated input."""
+        if self._carry:
+            self._write(self._carry)
+            self._carry = ""
+
+    def _write(self, text):
+        data = binascii.a2b_base64(text)
+        self.out_file.write(data)
+        self.bytes_written += len(data)
+
+
+def decode_base64_to_file(base64_str, output_path, chunk_chars=DEFAULT_CHUNK_CHARS):
+    """
+    Decode a base64 string to a file without materialising the decoded bytes in memory.
+
+    The file appears at output_path only once it is complete.
+
+    Returns:
+        int: Number of bytes written
+    """
+    with atomic_write(output_path) as f:
+        decoder = Base64StreamDecoder(f)
+        for start in range(0, len(base64_str), chunk_chars):
+            decoder.feed(base64_str[start:start + chunk_chars])
+        decoder.close()
+    return decoder.bytes_written
+
+
+class Base64EncodingReader(io.IOBase):
+    """
+    Read-only file-like object producing the base64 encoding of another binary file.
+
+    Lets the encoded text be streamed to the database driver (which calls read()
+    repeatedly) instead of building the whole base64 string first. It derives from
+    io.IOBase because mysql-connector only sends IOBase parameters as long data.
+    """
+
+    def __init__(self, raw_file, block_size=_RAW_BLOCK):
+        self.raw_file = raw_file
+        self.block_size = block_size - block_size % 3
+        self._buffer = b""
+        self._offset = 0
+        self._raw_carry = b""
+        self._eof = False
+
+    def readable(self):
+        return True
+
+    def _fill(self):
+        """Encode the next raw block, keeping whole 3-byte groups until EOF so no padding appears mid-stream."""
+        block = self._raw_carry + (self.raw_file.read(self.block_size) or b"")
+        if len(block) == len(self._raw_carry):
+            self._eof = True
+            usable = len(block)
+        else:
+            usable = len(block) - len(block) % 3
+        self._raw_carry = block[usable:]
+        self._buffer = self._buffer[self._offset:] + base64.b64encode(block[:usable])
+        self._offset = 0
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            while not self._eof:
+                self._fill()
+            data = self._buffer[self._offset:]
+            self._buffer, self._offset = b"", 0
+            return data
+
+        while not self._eof and len(self._buffer) - self._offset < size:
+            self._fill()
+        data = self._buffer[self._offset:self._offset + size]
+        self._offset += len(data)
+        return data
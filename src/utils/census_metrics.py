@@ -0,0 +1,176 @@
+import json
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+
+from src.utils.logger import logger
+
+# Upper bounds (seconds) of the Prometheus histogram buckets
+STAGE_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+# Per-request timing records kept for /metrics.json
+RECENT_REQUESTS = 20
+
+_current = threading.local()
+
+
+class StageTimer:
+    """
+    Seconds spent per named stage, accumulated over repeated calls.
+
+    While activated, stage() blocks on the same thread are added to this timer,
+    so code deep inside a mapper can be timed without passing the timer around.
+    """
+
+    def __init__(self):
+        self.stages = {}
+
+    def add(self, name, seconds):
+        self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    @contextmanager
+    def time(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start)
+
+    @contextmanager
+    def activate(self):
+        previous = getattr(_current, "timer", None)
+        _current.timer = self
+        try:
+            yield self
+        finally:
+            _current.timer = previous
+
+
+@contextmanager
+def stage(name):
+    """Time a block into the StageTimer active on this thread; does nothing when none is."""
+    timer = getattr(_current, "timer", None)
+    if timer is None:
+        yield
+        return
+    with timer.time(name):
+        yield
+
+
+class RequestTimings:
+    """
+    Stage timings of one census request: request-wide stages plus one StageTimer per portal.
+
+    record() turns them into the compact per-request record that is logged and
+    fed to the worker's StageMetrics.
+    """
+
+    def __init__(self, upload_id):
+        self.upload_id = upload_id
+        self.request = StageTimer()
+        self.portals = {}
+        self._start = time.perf_counter()
+
+    def time(self, name):
+        return self.request.time(name)
+
+    def queue_wait(self, created_at):
+        """Record the time between the upload being created and this worker claiming it."""
+        if isinstance(created_at, datetime):
+            self.request.add("queue_wait", max(0.0, (datetime.now() - created_at).total_seconds()))
+
+    def portal(self, portal):
+        if portal not in self.portals:
+            self.portals[portal] = StageTimer()
+        return self.portals[portal]
+
+    def add_portal_stages(self, portal, stages):
+        timer = self.portal(portal)
+        for name, seconds in (stages or {}).items():
+            timer.add(name, seconds)
+
+    def record(self, status):
+        return {
+            "upload_id": self.upload_id,
+            "status": status,
+            "total": round(time.perf_counter() - self._start, 4),
+            "stages": {name: round(seconds, 4) for name, seconds in self.request.stages.items()},
+            "portals": {portal: {name: round(seconds, 4) for name, seconds in timer.stages.items()}
+                        for portal, timer in self.portals.items()},
+        }
+
+
+class StageMetrics:
+    """Process-wide histograms of stage timings, exported as Prometheus text or JSON."""
+
+    def __init__(self, buckets=STAGE_BUCKETS):
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._histograms = {}  # (stage, portal) -> [bucket counts..., count, sum, max]
+        self._requests = {}
+        self._recent = deque(maxlen=RECENT_REQUESTS)
+
+    def observe(self, stage_name, seconds, portal=""):
+        with self._lock:
+            histogram = self._histograms.setdefault((stage_name, portal), [0] * len(self.buckets) + [0, 0.0, 0.0])
+            for i, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    histogram[i] += 1
+            histogram[-3] += 1
+            histogram[-2] += seconds
+            histogram[-1] = max(histogram[-1], seconds)
+
+    def observe_request(self, record):
+        """Add a RequestTimings record: every stage, the total and the request count by status."""
+        for name, seconds in record["stages"].items():
+            self.observe(name, seconds)
+        for portal, stages in record["portals"].items():
+            for name, seconds in stages.items():
+                self.observe(name, seconds, portal)
+        self.observe("total", record["total"])
+        with self._lock:
+            self._requests[record["status"]] = self._requests.get(record["status"], 0) + 1
+            self._recent.append(record)
+
+    def snapshot(self):
+        """JSON-ready totals per stage and per portal stage, request counts and the latest request records."""
+        with self._lock:
+            stages, portals = {}, {}
+            for (name, portal), histogram in sorted(self._histograms.items()):
+                summary = {"count": histogram[-3], "sum": round(histogram[-2], 4), "max": round(histogram[-1], 4)}
+                if portal:
+                    portals.setdefault(portal, {})[name] = summary
+                else:
+                    stages[name] = summary
+            return {"requests": dict(self._requests), "stages": stages, "portals": portals,
+                    "recent": list(self._recent)}
+
+    def prometheus(self):
+        """Prometheus text exposition of the stage histograms and request counter."""
+        lines = ["# HELP census_stage_seconds Time spent per census pipeline stage.",
+                 "# TYPE census_stage_seconds histogram"]
+        with self._lock:
+            for (name, portal), histogram in sorted(self._histograms.items()):
+                labels = f'stage="{name}",portal="{portal}"'
+                for bound, count in zip(self.buckets, histogram):
+                    lines.append(f'census_stage_seconds_bucket{{{labels},le="{bound}"}} {count}')
+                lines.append(f'census_stage_seconds_bucket{{{labels},le="+Inf"}} {histogram[-3]}')
+                lines.append(f"census_stage_seconds_sum{{{labels}}} {histogram[-2]:.6f}")
+                lines.append(f"census_stage_seconds_count{{{labels}}} {histogram[-3]}")
+            lines += ["# HELP census_requests_total Census requests finished, by final status.",
+                      "# TYPE census_requests_total counter"]
+            for status, count in sorted(self._requests.items()):
+                lines.append(f'census_requests_total{{status="{status}"}} {count}')
+        return "\n".join(lines) + "\n"
+
+
+CENSUS_METRICS = StageMetrics()
+
+
+def record_request_timings(timings, status, metrics=None):
+    """Log the compact timing record of a finished request and add it to the worker's metrics."""
+    record = timings.record(status)
+    logger.info(f"Census timings: {json.dumps(record, separators=(',', ':'))}")
+    (metrics or CENSUS_METRICS).observe_request(record)
+    return record
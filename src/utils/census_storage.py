@@ -0,0 +1,175 @@
+import hashlib
+import io
+import os
+import shutil
+import tempfile
+import zlib
+
+# Values of Census_Portal_Excels.storage_format
+FORMAT_BASE64 = "base64"          # Legacy: base64 text in `census`
+FORMAT_BLOB = "blob"              # Raw bytes in `census_blob`
+FORMAT_BLOB_GZIP = "blob+gzip"    # Gzip-compressed bytes in `census_blob`
+FORMAT_FILE = "file"              # Raw bytes in the content-addressed store, keyed by content_sha256
+FORMAT_FILE_GZIP = "file+gzip"    # Gzip-compressed bytes in the content-addressed store
+
+STORAGE_MODES = ("base64", "blob", "file")
+COMPRESSION_GZIP = "gzip"
+_GZIP_WBITS = 16 + zlib.MAX_WBITS
+_BLOCK = 256 * 1024
+
+
+def storage_format(mode, compression=None):
+    """Return the storage_format recorded for a storage mode and optional compression."""
+    if mode not in STORAGE_MODES:
+        raise ValueError(f"Unknown census storage mode '{mode}', expected one of {STORAGE_MODES}")
+    if mode == "base64":
+        return FORMAT_BASE64
+    return f"{mode}+gzip" if compression == COMPRESSION_GZIP else mode
+
+
+def is_gzip_format(fmt):
+    return bool(fmt) and fmt.endswith("+gzip")
+
+
+class PassThroughReader(io.IOBase):
+    """
+    Expose an open binary file to the DB driver as long data.
+
+    mysql-connector streams io.IOBase parameters in chunks; wrapping the file
+    (which has no `mode`) makes the driver type it as BLOB rather than text.
+    """
+
+    def __init__(self, raw_file):
+        self.raw_file = raw_file
+
+    def readable(self):
+        return True
+
+    def read(self, size=-1):
+        return self.raw_file.read(size)
+
+
+class GzipCompressingReader(io.IOBase):
+    """Read-only file-like object producing the gzip compression of another binary file, block by block."""
+
+    def __init__(self, raw_file, level=6):
+        self.raw_file = raw_file
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, _GZIP_WBITS)
+        self._buffer = b""
+        self._offset = 0
+        self._eof = False
+
+    def readable(self):
+        return True
+
+    def _fill(self):
+        block = self.raw_file.read(_BLOCK)
+        if block:
+            compressed = self._compressor.compress(block)
+        else:
+            compressed = self._compressor.flush()
+            self._eof = True
+        self._buffer = self._buffer[self._offset:] + compressed
+        self._offset = 0
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            while not self._eof:
+                self._fill()
+            data = self._buffer[self._offset:]
+            self._buffer, self._offset = b"", 0
+            return data
+
+        while not self._eof and len(self._buffer) - self._offset < size:
+            self._fill()
+        data = self._buffer[self._offset:self._offset + size]
+        self._offset += len(data)
+        return data
+
+
+class DecompressingWriter:
+    """Binary file wrapper that gunzips what is written to it (pass-through when not compressed)."""
+
+    def __init__(self, out_file, compressed):
+        self.out_file = out_file
+        self._decompressor = zlib.decompressobj(_GZIP_WBITS) if compressed else None
+        self.bytes_written = 0
+
+    def write(self, data):
+        if self._decompressor is not None:
+            data = self._decompressor.decompress(data)
+        self.out_file.write(data)
+        self.bytes_written += len(data)
+
+    def close(self):
+        if self._decompressor is not None:
+            tail = self._decompressor.flush()
+            self.out_file.write(tail)
+            self.bytes_written += len(tail)
+            if not self._decompressor.eof:
+                raise ValueError("Compressed census data is truncated")
+
+
+class ContentAddressedStore:
+    """
+    Directory of generated census files keyed by the SHA-256 of their content.
+
+    Files live at <root>/<sha[:2]>/<sha>[.gz]; identical outputs are stored once,
+    and writes land under a temporary name first so readers never see partial files.
+    """
+
+    def __init__(self, root):
+        self.root = root
+
+    def path_for(self, sha256, compressed=False):
+        return os.path.join(self.root, sha256[:2], sha256 + (".gz" if compressed else ""))
+
+    def put_file(self, file_path, compressed=False):
+        """
+        Copy a file into the store.
+
+        Returns:
+            str: The SHA-256 hex digest of the (uncompressed) file content
+        """
+        with open(file_path, "rb") as src:
+            return self.put(src, compressed)
+
+    def put(self, src, compressed=False):
+        """
+        Copy an open binary file (or buffer) into the store.
+
+        Returns:
+            str: The SHA-256 hex digest of the (uncompressed) content
+        """
+        os.makedirs(self.root, exist_ok=True)
+        digest = hashlib.sha256()
+        fd, tmp_path = tempfile.mkstemp(dir=self.root, prefix=".incoming-")
+        try:
+            with os.fdopen(fd, "wb") as dst:
+                compressor = zlib.compressobj(6, zlib.DEFLATED, _GZIP_WBITS) if compressed else None
+                for block in iter(lambda: src.read(_BLOCK), b""):
+                    digest.update(block)
+                    dst.write(compressor.compress(block) if compressor else block)
+                if compressor:
+                    dst.write(compressor.flush())
+
+            sha256 = digest.hexdigest()
+            final_path = self.path_for(sha256, compressed)
+            if os.path.exists(final_path):
+                os.remove(tmp_path)  # Same content already stored
+            else:
+                os.makedirs(os.path.dirname(final_path), exist_ok=True)
+                os.replace(tmp_path, final_path)
+            return sha256
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def copy_to(self, sha256, output_file, compressed=False):
+        """Write the stored content (decompressed) into an open binary file."""
+        writer = DecompressingWriter(output_file, compressed)
+        with open(self.path_for(sha256, compressed), "rb") as src:
+            shutil.copyfileobj(src, writer, _BLOCK)
+        writer.close()
+        return writer.bytes_written
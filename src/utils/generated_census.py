@@ -0,0 +1,55 @@
+import io
+import os
+from dataclasses import dataclass
+
+from src.utils.atomic_file import atomic_write
+from src.utils.census_metrics import stage
+
+
+@dataclass(frozen=True, eq=False)
+class GeneratedCensus:
+    """
+    A generated census workbook held in memory.
+
+    Mappers return one of these and the orchestrator stores `content` directly,
+    so the workbook is never written to disk, looked up again and read back.
+    """
+    filename: str
+    content: bytes
+
+    def __len__(self):
+        return len(self.content)
+
+    def open(self):
+        """Return a fresh binary reader over the content."""
+        return io.BytesIO(self.content)
+
+    def save(self, output_dir):
+        """Write the workbook into output_dir (debugging copies) and return its path."""
+        os.makedirs(output_dir, exist_ok=True)
+        path = os.path.join(output_dir, self.filename)
+        with atomic_write(path) as f:
+            f.write(self.content)
+        return path
+
+
+def generated_census(filename, write, output_dir=None):
+    """
+    Build a GeneratedCensus from a function that writes the workbook to a binary file.
+
+    Args:
+        filename: Name the census is stored under
+        write: Called with an in-memory buffer, e.g. `lambda out: template.render(out, blocks)` or `wb.save`
+        output_dir: Also write the file here; only set when debugging
+
+    Returns:
+        GeneratedCensus
+    """
+    buffer = io.BytesIO()
+    with stage("write"):
+        write(buffer)
+    with stage("save"):
+        census = GeneratedCensus(filename, buffer.getvalue())
+        if output_dir:
+            census.save(output_dir)
+    return census
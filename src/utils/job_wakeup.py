@@ -0,0 +1,130 @@
+import asyncio
+import json
+import socket
+
+from src.utils.logger import logger
+
+
+class AdaptiveBackoff:
+    """
+    Exponential idle backoff for the queue poller.
+
+    Each empty poll doubles the wait (min_delay, 2*min_delay, ... up to max_delay);
+    reset() goes back to min_delay as soon as a job is found.
+    """
+
+    def __init__(self, min_delay, max_delay, factor=2.0):
+        self.min_delay = min_delay
+        self.max_delay = max(min_delay, max_delay)
+        self.factor = factor
+        self._next = min_delay
+
+    def reset(self):
+        self._next = self.min_delay
+
+    def next_delay(self):
+        delay = self._next
+        self._next = min(self.max_delay, self._next * self.factor)
+        return delay
+
+
+class JobWakeup:
+    """
+    Push wakeup for the census poller.
+
+    When started with a port, a local TCP listener accepts any connection as a
+    "new upload" signal, so the uploader can nudge idle workers instead of waiting
+    for the next poll. Plain connections and HTTP requests are both accepted, e.g.
+    `curl -X POST http://127.0.0.1:<port>/wake` or notify_census_worker().
+
+    GETs of a path in `routes` (e.g. /health, /metrics) are answered with what its
+    callable returns, JSON for a dict and plain text (Prometheus format) for a string,
+    and do not wake the poller. They are served by the event loop itself, so a reply
+    also shows the loop is not blocked.
+    """
+
+    def __init__(self, routes=None):
+        self._event = asyncio.Event()
+        self._server = None
+        self._routes = routes or {}
+
+    async def start(self, host, port):
+        """Start listening for wakeups; a port of None leaves push wakeups disabled."""
+        if not port:
+            return
+        try:
+            self._server = await asyncio.start_server(self._handle_client, host, port)
+            logger.info(f"Census wakeup listener on {host}:{port}")
+        except OSError as e:
+            logger.error(f"Could not start census wakeup listener on {host}:{port}, falling back to polling: {e}")
+
+    async def _handle_client(self, reader, writer):
+        try:
+            request_line = await asyncio.wait_for(reader.readline(), timeout=2)
+            method, _, path = request_line.decode("latin-1").partition(" ")
+            route = self._routes.get(path.split(" ", 1)[0]) if method == "GET" else None
+            if route is not None:
+                writer.write(self._route_response(route()))
+                await writer.drain()
+                return
+            if request_line.split(b" ", 1)[0] in (b"GET", b"POST", b"PUT"):
+                writer.write(b"HTTP/1.1 204 No Content\r\nConnection: close\r\n\r\n")
+            else:
+                writer.write(b"ok\n")
+            await writer.drain()
+        except (asyncio.TimeoutError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+        self.notify()
+
+    @staticmethod
+    def _route_response(content):
+        if isinstance(content, str):
+            content_type, body = "text/plain; version=0.0.4", content.encode()
+        else:
+            content_type, body = "application/json", json.dumps(content, default=str).encode()
+        return (f"HTTP/1.1 200 OK\r\nContent-Type: {content_type}\r\nConnection: close\r\n"
+                f"Content-Length: {len(body)}\r\n\r\n").encode() + body
+
+    def notify(self):
+        """Wake the poller (from the event loop thread)."""
+        self._event.set()
+
+    async def wait(self, timeout):
+        """
+        Sleep up to `timeout` seconds, returning early when a wakeup arrives.
+
+        Returns:
+            bool: True if woken by a notification, False if the timeout elapsed
+        """
+        try:
+            await asyncio.wait_for(self._event.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            self._event.clear()
+
+    async def close(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+
+def notify_census_worker(port, host="127.0.0.1", timeout=1.0):
+    """
+    Tell a census worker listening on host:port that a new upload is waiting.
+
+    Returns:
+        bool: True if the worker was reached, False otherwise (it will still pick the job up on its next poll)
+    """
+    try:
+        with socket.create_connection((host, port), timeout=timeout) as sock:
+            sock.sendall(b"wake\n")
+            sock.recv(16)
+        return True
+    except OSError as e:
+        logger.warning(f"Could not notify census worker at {host}:{port}: {e}")
+        return False
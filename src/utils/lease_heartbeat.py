@@ -0,0 +1,44 @@
+import threading
+
+from src.utils.logger import logger
+
+
+class LeaseHeartbeat:
+    """
+    Background thread that keeps renewing a job lease while the job is processed.
+
+    `beat` is called every `interval` seconds and returns False once the lease is
+    lost; the heartbeat then stops and `lost` is set so the caller can tell.
+    """
+
+    def __init__(self, beat, interval, name="lease-heartbeat"):
+        self.beat = beat
+        self.interval = interval
+        self.lost = False
+        self._stop_event = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+
+    def _run(self):
+        while not self._stop_event.wait(self.interval):
+            try:
+                if not self.beat():
+                    self.lost = True
+                    return
+            except Exception as e:
+                logger.error(f"Heartbeat failed: {e}")
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop_event.set()
+        if self._thread.is_alive():
+            self._thread.join(timeout=self.interval)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, tb):
+        self.stop()
+        return False
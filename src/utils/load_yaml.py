@@ -1,5 +1,7 @@
 import yaml
 import os
+import socket
+import tempfile
 
 # Define the path to the configuration yaml file
 CONFIG_PATH = os.path.join(os.path.dirname(__file__), '../../config.yaml')
@@ -45,3 +47,36 @@ DAMAN_TEMPLATES_DIR = config['daman']['templates_dir']
 
 EMAIL_GENERATED_CENSUS_DIR = config['email_portals']['generated_census_dir']
 EMAIL_CENCUS_TEMPLATE_DIR = config['email_portals']['templates_dir']
+
+# *** Census processing ***
+CENSUS_CONFIG = config.get('census', {}) or {}
+CENSUS_PARALLEL_PORTALS = CENSUS_CONFIG.get('parallel_portals', False)
+CENSUS_MAX_PORTAL_WORKERS = CENSUS_CONFIG.get('max_portal_workers') or os.cpu_count() or 1
+CENSUS_MAX_CONCURRENT_REQUESTS = max(1, int(CENSUS_CONFIG.get('max_concurrent_requests', 1)))
+CENSUS_WORKSPACE_TMPFS = CENSUS_CONFIG.get('workspace_tmpfs', False)  # Default workspaces to RAM-backed /dev/shm when present
+CENSUS_WORKSPACE_DIR = CENSUS_CONFIG.get('workspace_dir') or os.path.join(
+    '/dev/shm' if CENSUS_WORKSPACE_TMPFS and os.path.isdir('/dev/shm') else tempfile.gettempdir(), 'census_workspaces')
+CENSUS_KEEP_WORKSPACES = CENSUS_CONFIG.get('keep_workspaces', False)  # Keep request folders for debugging
+CENSUS_WORKER_ID = CENSUS_CONFIG.get('worker_id') or f"{socket.gethostname()}-{os.getpid()}"
+CENSUS_LEASE_SECONDS = int(CENSUS_CONFIG.get('lease_seconds', 900))  # Claim expires if no heartbeat arrives in time
+CENSUS_HEARTBEAT_SECONDS = int(CENSUS_CONFIG.get('heartbeat_seconds', 60))
+CENSUS_POLL_MIN_SECONDS = float(CENSUS_CONFIG.get('poll_min_seconds', 1))  # First idle wait, doubled per empty poll
+CENSUS_POLL_MAX_SECONDS = float(CENSUS_CONFIG.get('poll_max_seconds', 10))
+CENSUS_WAKEUP_HOST = CENSUS_CONFIG.get('wakeup_host', '127.0.0.1')
+CENSUS_WAKEUP_PORT = CENSUS_CONFIG.get('wakeup_port')  # Local push wakeup listener, disabled when unset
+CENSUS_TEMPLATE_CACHE_MB = float(CENSUS_CONFIG.get('template_cache_mb', 64))  # Parsed templates kept per worker, 0 disables
+CENSUS_TEMPLATE_ENGINE = CENSUS_CONFIG.get('template_engine', 'patch')  # 'patch' (zip-level) or 'openpyxl'
+CENSUS_MAPPER_TIMEOUT_SECONDS = float(CENSUS_CONFIG.get('mapper_timeout_seconds', 600))  # Per mapper; pooled ones from submission
+
+# Shared MySQL connection pool: one connection per request thread and its heartbeat, plus the poller
+DB_POOL_CONFIG = config.get('db_pool', {}) or {}
+DB_POOL_SIZE = min(32, int(DB_POOL_CONFIG.get('size') or 2 * CENSUS_MAX_CONCURRENT_REQUESTS + 1))
+DB_POOL_ACQUIRE_TIMEOUT = DB_POOL_CONFIG.get('acquire_timeout', 30)
+
+# Generated census storage: base64 (legacy TEXT), blob (LONGBLOB) or file (content-addressed store)
+CENSUS_STORAGE_CONFIG = config.get('census_storage', {}) or {}
+CENSUS_STORAGE_MODE = CENSUS_STORAGE_CONFIG.get('mode', 'base64')
+CENSUS_STORAGE_COMPRESSION = CENSUS_STORAGE_CONFIG.get('compression')  # 'gzip' or unset
+CENSUS_FILE_STORE_DIR = CENSUS_STORAGE_CONFIG.get('file_store_dir') or os.path.join(os.path.dirname(__file__), '../../census_store')
+# Generated files above this size are committed as soon as they are ready instead of with the request batch (0 = never)
+CENSUS_RESULT_STREAM_BYTES = int(float(CENSUS_STORAGE_CONFIG.get('stream_result_mb', 0)) * 1024 * 1024)
@@ -0,0 +1,170 @@
+import threading
+from collections import Counter, OrderedDict, deque
+from typing import NamedTuple, Optional
+
+EXACT = "exact"
+CASE_INSENSITIVE = "case_insensitive"
+FUZZY = "fuzzy"
+UNMATCHED = "unmatched"
+
+# Words dropped before fuzzy matching, in this order ("CO" goes before "COMPANY", as it always has)
+FUZZY_NOISE_WORDS = ("INSURANCE", "CO", "COMPANY", "PJSC", ".")
+
+
+class PortalMatch(NamedTuple):
+    portal: Optional[str]
+    match_type: str
+    pattern: Optional[str] = None  # Fuzzy pattern that matched
+
+
+class PatternMatcher:
+    """
+    Aho-Corasick automaton over a fixed list of patterns.
+
+    find() scans the text once and returns the earliest-listed pattern that
+    occurs anywhere in it - the answer a loop of `pattern in text` checks gives,
+    without rescanning the text once per pattern.
+    """
+
+    def __init__(self, patterns):
+        self.patterns = list(patterns)
+        self._goto = [{}]
+        self._fail = [0]
+        self._best = [None]  # Lowest pattern position ending at each state (fail chain included)
+
+        for position, pattern in enumerate(self.patterns):
+            state = 0
+            for char in pattern:
+                if char not in self._goto[state]:
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._best.append(None)
+                    self._goto[state][char] = len(self._goto) - 1
+                state = self._goto[state][char]
+            if self._best[state] is None or position < self._best[state]:
+                self._best[state] = position
+
+        queue = deque(self._goto[0].values())  # Depth-1 states fail back to the root
+        while queue:
+            state = queue.popleft()
+            for char, child in self._goto[state].items():
+                queue.append(child)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[child] = self._goto[fallback].get(char, 0)
+                inherited = self._best[self._fail[child]]
+                if inherited is not None and (self._best[child] is None or inherited < self._best[child]):
+                    self._best[child] = inherited
+
+    def find(self, text):
+        """Return the earliest-listed pattern occurring in text, or None."""
+        state, best = 0, None
+        for char in text:
+            while state and char not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(char, 0)
+            position = self._best[state]
+            if position is not None and (best is None or position < best):
+                best = position
+                if best == 0:
+                    break
+        return None if best is None else self.patterns[best]
+
+
+class PortalResolver:
+    """
+    Resolves company names from upload requests to internal portal identifiers.
+
+    Built once at startup from the exact-name table and the fuzzy pattern table.
+    A name is tried against the exact names, then the uppercased names, then the
+    fuzzy patterns (first listed pattern found in the cleaned name wins); results
+    are kept in an LRU. Match-type counts show which fuzzy hits are common enough
+    to promote to exact entries.
+    """
+
+    def __init__(self, names, fuzzy_patterns, cache_size=1024):
+        """
+        Args:
+            names (dict): Company name -> portal, matched as written and case-insensitively
+            fuzzy_patterns (dict): Uppercase substring -> portal, in priority order
+            cache_size (int): Resolved names kept in the LRU
+        """
+        self._names = dict(names)
+        self._upper_names = {}
+        for name, portal in self._names.items():
+            self._upper_names.setdefault(name.upper(), portal)  # First listed spelling wins
+        self._fuzzy_portals = dict(fuzzy_patterns)
+        self._matcher = PatternMatcher(self._fuzzy_portals)
+
+        self._cache = OrderedDict()
+        self._cache_size = cache_size
+        self._lock = threading.Lock()
+        self._match_counts = Counter()
+        self._fuzzy_hits = Counter()
+        self._cache_hits = 0
+
+    def __len__(self):
+        return len(self._names)
+
+    def resolve(self, company_name):
+        """
+        Resolve a company name.
+
+        Returns:
+            PortalMatch: portal (None if unmatched), match type and the fuzzy pattern used
+        """
+        with self._lock:
+            match = self._cache.get(company_name)
+            if match is not None:
+                self._cache.move_to_end(company_name)
+                self._cache_hits += 1
+        if match is None:
+            match = self._match(company_name)
+            with self._lock:
+                self._cache[company_name] = match
+                if len(self._cache) > self._cache_size:
+                    self._cache.popitem(last=False)
+        with self._lock:
+            self._match_counts[match.match_type] += 1
+            if match.match_type == FUZZY:
+                self._fuzzy_hits[(company_name, match.portal)] += 1
+        return match
+
+    def _match(self, company_name):
+        if not company_name:
+            return PortalMatch(None, UNMATCHED)
+        if company_name in self._names:
+            return PortalMatch(self._names[company_name], EXACT)
+
+        company_upper = company_name.upper().strip()
+        if company_upper in self._upper_names:
+            return PortalMatch(self._upper_names[company_upper], CASE_INSENSITIVE)
+
+        pattern = self._matcher.find(clean_company_name(company_upper))
+        if pattern is not None:
+            return PortalMatch(self._fuzzy_portals[pattern], FUZZY, pattern)
+        return PortalMatch(None, UNMATCHED)
+
+    def stats(self, top=10):
+        """
+        Resolution counts since startup.
+
+        Returns:
+            dict: Calls per match type, LRU hits and the most frequent fuzzy hits as
+                  (company name, portal, count) - candidates for exact entries
+        """
+        with self._lock:
+            return {
+                "matches": dict(self._match_counts),
+                "cache_hits": self._cache_hits,
+                "cached_names": len(self._cache),
+                "top_fuzzy_hits": [(name, portal, count) for (name, portal), count in self._fuzzy_hits.most_common(top)],
+            }
+
+
+def clean_company_name(company_upper):
+    """Strip the words fuzzy matching ignores from an uppercased company name."""
+    for word in FUZZY_NOISE_WORDS:
+        company_upper = company_upper.replace(word, "")
+    return company_upper.strip()
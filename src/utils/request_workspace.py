@@ -0,0 +1,185 @@
+import ctypes
+import os
+import queue
+import re
+import shutil
+import threading
+import time
+import uuid
+
+from src.utils.load_yaml import CENSUS_WORKSPACE_DIR, CENSUS_KEEP_WORKSPACES, CENSUS_LEASE_SECONDS
+from src.utils.logger import logger
+
+# Finished workspaces are renamed into <root>/.trash and deleted from there by the reaper
+TRASH_DIR_NAME = ".trash"
+
+# request_<upload_id>_<owner pid>_<token>; workspaces from before the PID was recorded have no owner
+_WORKSPACE_NAME = re.compile(r"request_.+?(?:_(\d+))?_[0-9a-f]{8}")
+
+# Windows API constants for _process_running
+_SYNCHRONIZE = 0x00100000
+_WAIT_TIMEOUT = 0x102
+_ERROR_ACCESS_DENIED = 5
+
+
+def _process_running(pid):
+    """Whether a process with this PID is running on this host."""
+    if os.name == "nt":
+        # os.kill(pid, 0) would terminate the process on Windows
+        kernel32 = ctypes.WinDLL("kernel32", use_last_error=True)
+        handle = kernel32.OpenProcess(_SYNCHRONIZE, False, pid)
+        if not handle:
+            return ctypes.get_last_error() == _ERROR_ACCESS_DENIED
+        try:
+            return kernel32.WaitForSingleObject(handle, 0) == _WAIT_TIMEOUT
+        finally:
+            kernel32.CloseHandle(handle)
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _stale_workspaces(root, max_age):
+    """Names of the request workspaces in `root` that no running request can own."""
+    try:
+        entries = list(os.scandir(root))
+    except FileNotFoundError:
+        return []
+    stale = []
+    for entry in entries:
+        match = _WORKSPACE_NAME.fullmatch(entry.name)
+        if not match or not entry.is_dir(follow_symlinks=False):
+            continue
+        owner = match.group(1)
+        if owner is not None:
+            if not _process_running(int(owner)):
+                stale.append(entry.name)
+        elif time.time() - entry.stat(follow_symlinks=False).st_mtime > max_age:
+            stale.append(entry.name)
+    return stale
+
+
+class WorkspaceReaper:
+    """
+    Background thread deleting detached workspaces.
+
+    Requests only rename their workspace out of the way; the directory walk and the
+    per-file deletes happen here, off the request and event loop threads.
+    """
+
+    def __init__(self):
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def submit(self, path):
+        """Queue a detached directory for deletion."""
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="workspace-reaper", daemon=True)
+                self._thread.start()
+        self._queue.put(path)
+
+    def sweep(self, root=None, max_age=None):
+        """
+        Queue whatever an earlier run left in `root`, e.g. after a crash: the trash, and
+        request workspaces whose owner process is gone (those without a recorded owner
+        once they are older than max_age, the lease by default). Kept when workspaces
+        are being kept for debugging.
+        """
+        root = root or CENSUS_WORKSPACE_DIR
+        trash = os.path.join(root, TRASH_DIR_NAME)
+        if not CENSUS_KEEP_WORKSPACES:
+            for name in _stale_workspaces(root, CENSUS_LEASE_SECONDS if max_age is None else max_age):
+                try:
+                    os.makedirs(trash, exist_ok=True)
+                    os.rename(os.path.join(root, name), os.path.join(trash, name))
+                except OSError as e:
+                    logger.warning(f"Could not detach stale workspace {name}: {e}")
+        try:
+            leftovers = os.listdir(trash)
+        except FileNotFoundError:
+            return 0
+        for name in leftovers:
+            self.submit(os.path.join(trash, name))
+        return len(leftovers)
+
+    def drain(self):
+        """Block until every queued directory has been deleted."""
+        self._queue.join()
+
+    def _run(self):
+        while True:
+            path = self._queue.get()
+            try:
+                shutil.rmtree(path, ignore_errors=True)
+            except Exception as e:
+                logger.error(f"Could not remove workspace {path}: {e}")
+            finally:
+                self._queue.task_done()
+
+
+WORKSPACE_REAPER = WorkspaceReaper()
+
+
+class RequestWorkspace:
+    """
+    Private scratch directory for one census request.
+
+    Layout:
+        <root>/request_<upload_id>_<pid>_<token>/input           - decoded upload and its copies
+        <root>/request_<upload_id>_<pid>_<token>/output/<portal> - generated census per portal
+
+    The random token keeps directories unique even when the same upload is retried
+    by another worker, so nothing is shared between concurrent requests. The PID of
+    the owning process lets WorkspaceReaper.sweep tell leftovers of a killed worker
+    from live workspaces.
+    """
+
+    def __init__(self, upload_id, root=None, reaper=None):
+        self.upload_id = upload_id
+        self.root = root or CENSUS_WORKSPACE_DIR
+        self.reaper = reaper or WORKSPACE_REAPER
+        self.path = os.path.join(self.root, f"request_{upload_id}_{os.getpid()}_{uuid.uuid4().hex[:8]}")
+        self.input_dir = os.path.join(self.path, "input")
+        self.output_root = os.path.join(self.path, "output")
+        self._detached = False
+        os.makedirs(self.input_dir, exist_ok=True)
+        os.makedirs(self.output_root, exist_ok=True)
+
+    def output_dir(self, portal):
+        """Return (and create) the output directory for a portal."""
+        portal_dir = os.path.join(self.output_root, portal.lower())
+        os.makedirs(portal_dir, exist_ok=True)
+        return portal_dir
+
+    def cleanup(self):
+        """
+        Detach the workspace with a single rename and leave the delete to the reaper,
+        unless workspaces are being kept for debugging.
+        """
+        if self._detached:
+            return
+        self._detached = True
+        if CENSUS_KEEP_WORKSPACES:
+            logger.info(f"Keeping workspace for request {self.upload_id}: {self.path}")
+            return
+        detached = os.path.join(self.root, TRASH_DIR_NAME, os.path.basename(self.path))
+        try:
+            os.makedirs(os.path.dirname(detached), exist_ok=True)
+            os.rename(self.path, detached)
+        except OSError as e:
+            logger.warning(f"Could not detach workspace {self.path}, removing it in place: {e}")
+            detached = self.path
+        self.reaper.submit(detached)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        self.cleanup()
+        return False
@@ -0,0 +1,122 @@
+"""
+Peak memory of moving one census file through base64, before and after streaming.
+
+Each variant runs in its own subprocess so ru_maxrss reflects only that variant:
+
+    legacy    - whole base64 string in memory (SELECT *), b64decode to disk, then
+                read the generated file whole and b64encode it for the INSERT
+    streaming - base64 read in SUBSTRING-sized chunks and decoded as it arrives,
+                generated file encoded through Base64EncodingReader in driver-sized reads
+
+Usage:
+    python tests/benchmarks/benchmark_base64_memory.py [size_mb ...]
+"""
+import base64
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
+
+from src.utils.base64_stream import DEFAULT_CHUNK_CHARS, Base64EncodingReader, Base64StreamDecoder
+
+DRIVER_READ_SIZE = 8192  # mysql-connector send_long_data chunk
+
+
+def _peak_rss_mb():
+    # VmHWM starts fresh at exec; ru_maxrss can carry the parent's peak over on Linux
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def run_legacy(b64_path, raw_path, out_path):
+    with open(b64_path) as f:
+        base64_str = f.read()
+    with open(out_path, "wb") as f:
+        f.write(base64.b64decode(base64_str))
+    del base64_str
+    with open(raw_path, "rb") as f:
+        encoded_string = base64.b64encode(f.read()).decode("utf-8")
+    return len(encoded_string)
+
+
+def run_streaming(b64_path, raw_path, out_path):
+    with open(b64_path) as src, open(out_path, "wb") as f:
+        decoder = Base64StreamDecoder(f)
+        while True:
+            chunk = src.read(DEFAULT_CHUNK_CHARS)
+            if not chunk:
+                break
+            decoder.feed(chunk)
+        decoder.close()
+    sent = 0
+    with open(raw_path, "rb") as f:
+        reader = Base64EncodingReader(f)
+        while True:
+            data = reader.read(DRIVER_READ_SIZE)
+            if not data:
+                break
+            sent += len(data)
+    return sent
+
+
+def _child(variant, b64_path, raw_path, out_path):
+    start = _peak_rss_mb()
+    encoded = {"legacy": run_legacy, "streaming": run_streaming}[variant](b64_path, raw_path, out_path)
+    print(f"{start:.1f} {_peak_rss_mb():.1f} {encoded}")
+
+
+def _same_file(path_a, path_b, block=1024 * 1024):
+    with open(path_a, "rb") as a, open(path_b, "rb") as b:
+        while True:
+            chunk_a, chunk_b = a.read(block), b.read(block)
+            if chunk_a != chunk_b:
+                return False
+            if not chunk_a:
+                return True
+
+
+def benchmark(size_mb):
+    with tempfile.TemporaryDirectory() as tmp:
+        raw_path = os.path.join(tmp, "census.xlsx")
+        b64_path = os.path.join(tmp, "census.b64")
+        remaining = int(size_mb * 1024 * 1024)
+        with open(raw_path, "wb") as raw, open(b64_path, "wb") as b64:
+            while remaining > 0:
+                block = os.urandom(min(remaining, 3 * 1024 * 1024))
+                raw.write(block)
+                b64.write(base64.b64encode(block))
+                remaining -= len(block)
+
+        results = {}
+        for variant in ("legacy", "streaming"):
+            out_path = os.path.join(tmp, f"{variant}.xlsx")
+            output = subprocess.run(
+                [sys.executable, __file__, "--child", variant, b64_path, raw_path, out_path],
+                check=True, capture_output=True, text=True
+            ).stdout.split()
+            start, peak, encoded = float(output[0]), float(output[1]), int(output[2])
+            assert _same_file(out_path, raw_path), f"{variant} decoded file differs"
+            results[variant] = (peak - start, encoded)
+
+        assert results["legacy"][1] == results["streaming"][1]
+        print(f"{size_mb:>8.1f} MB | legacy +{results['legacy'][0]:7.1f} MB | streaming +{results['streaming'][0]:7.1f} MB")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "--child":
+        _child(*sys.argv[2:6])
+    else:
+        sizes = [float(arg) for arg in sys.argv[1:]] or [1.6, 16, 64]
+        print("    file   | peak RSS growth per request")
+        for size in sizes:
+            benchmark(size)
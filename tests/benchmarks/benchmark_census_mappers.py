@@ -0,0 +1,202 @@
+"""
+Every census mapper on synthetic uploads of growing size: wall time, rows/s, peak RSS and output size.
+
+For each size a synthetic census (see synthetic_census.py) is written as a real
+workbook and parsed once - the PARSE row. Every mapper in CENSUS_MAPPING, plus
+the email mapper, then runs on the parsed census in its own subprocess, so the
+peak RSS (VmHWM) is that mapper's alone; baseline_rss_mb is the process before
+the mapper started. Mappers that cannot run here (Windows-only COM/Excel
+libraries missing) are reported as skipped rather than failing the run.
+DOBs come in mixed formats; --iso-dates writes them all as yyyy-mm-dd, to
+time the mappers without the cost of mixed-format date parsing.
+
+Results are saved as JSON; pass an earlier file to --compare to see the change
+in wall time per mapper and size.
+
+Usage:
+    python tests/benchmarks/benchmark_census_mappers.py [--sizes 10 100 1000 10000 50000]
+        [--portals NLG GIG ...] [--iso-dates] [--output results.json] [--compare previous.json] [--timeout 900]
+"""
+import argparse
+import json
+import logging
+import os
+import pickle
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+sys.path.append(REPO_ROOT)
+
+from synthetic_census import write_census_workbook
+
+SIZES = [10, 100, 1_000, 10_000, 50_000]
+PARSE = "PARSE"
+# Errors meaning the mapper needs libraries this platform does not have
+SKIP_ERRORS = ("ModuleNotFoundError", "ImportError", "pywintypes", "win32com", "xlwings")
+
+
+def benchmark_portals():
+    """Portal -> mapper for every mapper in CENSUS_MAPPING and the email mapper."""
+    from main import CENSUS_MAPPING, email_map_census_data
+    portals = {portal: func for portal, (func, _) in CENSUS_MAPPING.items()}
+    portals["EMAIL"] = email_map_census_data
+    return portals
+
+
+def _rss_mb(field):
+    """VmRSS (current) or VmHWM (peak) of this process in MB."""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith(f"{field}:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def run_child(portal, workbook, frame_path, rows):
+    """Run one mapper (or the PARSE step) in this process and return its measurements."""
+    from src.services.excel_service.census_frame import load_census_frame
+    from src.services.excel_service.portal_executor import run_mapper
+
+    result = {"portal": portal, "rows": rows, "status": "ok", "error": None, "stages": None}
+    if portal == PARSE:
+        baseline = _rss_mb("VmRSS")
+        start = time.perf_counter()
+        census = load_census_frame(workbook)
+        seconds = time.perf_counter() - start
+        with open(frame_path, "wb") as f:
+            pickle.dump(census, f)
+        output_bytes = os.path.getsize(workbook)
+    else:
+        with open(frame_path, "rb") as f:
+            census = pickle.load(f)
+        try:
+            func = benchmark_portals()[portal]
+        except ImportError as e:
+            return dict(result, status="skipped", error=str(e))
+        baseline = _rss_mb("VmRSS")
+        mapper_result = run_mapper(portal, portal, func, census_frame=census)
+        seconds = mapper_result.duration
+        output_bytes = len(mapper_result.census) if mapper_result.census is not None else 0
+        result["stages"] = {name: round(value, 4) for name, value in (mapper_result.stages or {}).items()}
+        if not mapper_result.success:
+            skipped = any(marker in (mapper_result.traceback or "") for marker in SKIP_ERRORS)
+            result.update(status="skipped" if skipped else "failed", error=mapper_result.error)
+        elif mapper_result.census is None:
+            result.update(status="failed", error="mapper returned no census")
+
+    return dict(result, seconds=round(seconds, 4), rows_per_second=round(rows / seconds, 1) if seconds else None,
+                baseline_rss_mb=round(baseline, 1), peak_rss_mb=round(_rss_mb("VmHWM"), 1), output_bytes=output_bytes)
+
+
+def _run_in_subprocess(portal, workbook, frame_path, rows, timeout):
+    result_path = f"{frame_path}.{portal}.json"
+    command = [sys.executable, os.path.abspath(__file__), "--child", portal, workbook, frame_path, str(rows), result_path]
+    try:
+        # Template paths in config.yaml are relative to the repository root
+        completed = subprocess.run(command, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True,
+                                   timeout=timeout, cwd=REPO_ROOT)
+    except subprocess.TimeoutExpired:
+        return {"portal": portal, "rows": rows, "status": "timeout", "error": f"no result after {timeout}s",
+                "seconds": None, "rows_per_second": None, "peak_rss_mb": None, "output_bytes": None}
+    if not os.path.exists(result_path):
+        return {"portal": portal, "rows": rows, "status": "error", "error": completed.stderr.strip()[-2000:],
+                "seconds": None, "rows_per_second": None, "peak_rss_mb": None, "output_bytes": None}
+    with open(result_path) as f:
+        return json.load(f)
+
+
+def _change(result, previous):
+    before = previous.get((result["portal"], result["rows"]))
+    if not before or not result.get("seconds"):
+        return ""
+    return f" ({(result['seconds'] - before) / before:+.0%} vs {before:.2f}s)"
+
+
+def _print_result(result, previous):
+    if result["status"] != "ok":
+        error = (result['error'] or '').strip().splitlines()
+        print(f"{result['rows']:>7} {result['portal']:<15} {result['status']:<8} {error[0][:100] if error else ''}")
+        return
+    print(f"{result['rows']:>7} {result['portal']:<15} {result['seconds']:>9.3f}s {result['rows_per_second']:>11,.0f} rows/s "
+          f"peak {result['peak_rss_mb']:>7.1f} MB  output {result['output_bytes']:>11,} B{_change(result, previous)}")
+
+
+def run_benchmark(sizes, portals, timeout, previous, mixed_dates=True):
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for rows in sizes:
+            workbook = write_census_workbook(rows, os.path.join(tmp, f"census_{rows}.xlsx"), seed=rows,
+                                             mixed_dates=mixed_dates)
+            frame_path = os.path.join(tmp, f"census_{rows}.pickle")
+            for portal in [PARSE] + portals:
+                result = _run_in_subprocess(portal, workbook, frame_path, rows, timeout)
+                results.append(result)
+                _print_result(result, previous)
+                if portal == PARSE and result["status"] != "ok":
+                    break
+    return results
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=REPO_ROOT).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=SIZES)
+    parser.add_argument("--portals", nargs="+", help="Mappers to run (default: all)")
+    parser.add_argument("--iso-dates", action="store_true", help="Write every DOB as yyyy-mm-dd")
+    parser.add_argument("--output", help="Where to save the JSON results")
+    parser.add_argument("--compare", help="Earlier JSON results to compare wall times against")
+    parser.add_argument("--timeout", type=float, default=900, help="Seconds allowed per mapper run")
+    args = parser.parse_args()
+
+    from src.utils.load_yaml import CENSUS_TEMPLATE_ENGINE
+    portals = args.portals or list(benchmark_portals())
+    previous = {}
+    if args.compare:
+        with open(args.compare) as f:
+            previous = {(r["portal"], r["rows"]): r["seconds"] for r in json.load(f)["results"] if r.get("seconds")}
+
+    started = datetime.now()
+    results = run_benchmark(args.sizes, portals, args.timeout, previous, mixed_dates=not args.iso_dates)
+    report = {
+        "created": started.isoformat(timespec="seconds"),
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "template_engine": CENSUS_TEMPLATE_ENGINE,
+        "mixed_dates": not args.iso_dates,
+        "sizes": args.sizes,
+        "results": results,
+    }
+    output = args.output or f"census_mapper_benchmark_{started:%Y%m%d-%H%M%S}.json"
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results saved to {output}")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 7 and sys.argv[1] == "--child":
+        logging.disable(logging.CRITICAL)  # Mapper logs would swamp the timings
+        _, _, child_portal, child_workbook, child_frame, child_rows, child_result = sys.argv
+        measured = run_child(child_portal, child_workbook, child_frame, int(child_rows))
+        with open(child_result, "w") as result_file:
+            json.dump(measured, result_file)
+    else:
+        main()
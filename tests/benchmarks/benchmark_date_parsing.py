@@ -0,0 +1,87 @@
+"""
+Time to parse a DOB column the way the mappers do, in rows per second.
+
+    per_row - pd.to_datetime on each value (what SUKOON, MAXHEALTH, ADNIC, ISON and DUBAI used to do)
+    column  - one whole-column to_datetime(format='mixed')
+    engine  - DateEngine, fresh for the column
+    shared  - DateEngine shared by 8 mappers of one upload: the column is parsed once, then served from the memo
+
+Usage:
+    python tests/benchmarks/benchmark_date_parsing.py [rows ...]
+"""
+import os
+import random
+import sys
+import time
+import warnings
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
+
+from src.services.excel_service.date_engine import DateEngine
+
+MAPPERS_PER_UPLOAD = 8
+
+
+def make_dobs(count):
+    """Mostly dd/mm/yyyy strings, some ISO strings and datetimes, a few blanks and typos."""
+    rng = random.Random(count)
+    base = datetime(1950, 1, 1)
+    values = []
+    for _ in range(count):
+        dob = base + timedelta(days=rng.randint(0, 25_000))
+        roll = rng.random()
+        if roll < 0.75:
+            values.append(dob.strftime("%d/%m/%Y"))
+        elif roll < 0.85:
+            values.append(dob.strftime("%Y-%m-%d"))
+        elif roll < 0.97:
+            values.append(dob)
+        else:
+            values.append(rng.choice([None, "", "31/02/1990", "n/a"]))
+    return pd.Series(values, dtype=object)
+
+
+def run_per_row(dobs):
+    start = time.perf_counter()
+    [pd.to_datetime(value, dayfirst=True, errors='coerce') if pd.notnull(value) else None for value in dobs]
+    return time.perf_counter() - start
+
+
+def run_column(dobs):
+    start = time.perf_counter()
+    pd.to_datetime(dobs, errors='coerce', dayfirst=True, format='mixed')
+    return time.perf_counter() - start
+
+
+def run_engine(dobs):
+    start = time.perf_counter()
+    DateEngine().parse(dobs, dayfirst=True)
+    return time.perf_counter() - start
+
+
+def run_shared(dobs):
+    engine = DateEngine()
+    start = time.perf_counter()
+    for _ in range(MAPPERS_PER_UPLOAD):
+        engine.parse(dobs, dayfirst=True)
+    return (time.perf_counter() - start) / MAPPERS_PER_UPLOAD
+
+
+def benchmark(count):
+    dobs = make_dobs(count)
+    runs = [run_column, run_engine, run_shared] if count > 20_000 else [run_per_row, run_column, run_engine, run_shared]
+    results = {run.__name__[4:]: min(run(dobs) for _ in range(3)) for run in runs}
+    print(f"DOB {count:>7} rows | " + " | ".join(
+        f"{name} {seconds * 1000:>7,.0f} ms ({count / seconds:>10,.0f} rows/s)" for name, seconds in results.items()))
+
+
+if __name__ == "__main__":
+    warnings.simplefilter("ignore")
+    import logging
+    logging.disable(logging.WARNING)  # The engine logs each column's unparseable count
+    counts = [int(arg) for arg in sys.argv[1:]] or [1_000, 10_000, 100_000]
+    for count in counts:
+        benchmark(count)
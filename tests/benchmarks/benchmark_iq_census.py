@@ -0,0 +1,80 @@
+"""
+Time to fill the IQ macro template (Census_Template_AE.xlsm), in member rows per second.
+
+    xlwings - the previous path: Excel started through xlwings, one range write, wb.save
+              (Windows with Excel only; skipped elsewhere)
+    patch   - iq_census_map's path: the INPUT - Census sheet is written into the .xlsm
+              package, vbaProject.bin and every other part copied as they are
+
+Usage:
+    python tests/benchmarks/benchmark_iq_census.py [rows ...]
+"""
+import os
+import sys
+import tempfile
+import time
+import zipfile
+from datetime import datetime, timedelta
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
+
+from src.services.excel_service.iq_census_map import IQ_TEMPLATE
+from src.services.excel_service.template_patch import compile_template
+
+
+def make_rows(count):
+    base = datetime(1960, 1, 1)
+    return [[base + timedelta(days=i * 7), "Spouse" if i % 3 else "Principal", f"Category {'ABC'[i % 3]}",
+             "Male" if i % 2 else "Female", "Married", "India", "Dubai", "LSB"] for i in range(count)]
+
+
+def run_xlwings(rows, output_path):
+    import xlwings as xw  # Only importable where Excel is installed
+
+    start = time.perf_counter()
+    with xw.App(visible=False) as app:
+        wb = app.books.open(os.path.abspath(IQ_TEMPLATE.template_path))
+        wb.sheets[IQ_TEMPLATE.sheet_name].range("B2").value = rows
+        wb.save(output_path)
+    return time.perf_counter() - start
+
+
+def run_patch(rows, output_path):
+    start = time.perf_counter()
+    compile_template(IQ_TEMPLATE.template_path, IQ_TEMPLATE.sheet_name).render(
+        output_path, IQ_TEMPLATE.cells({"members": rows}))
+    return time.perf_counter() - start
+
+
+def xlwings_available():
+    try:
+        import xlwings  # noqa: F401
+        return True
+    except Exception:  # ImportError, or no Excel on this platform
+        return False
+
+
+def benchmark(count, runs, tmp):
+    rows = make_rows(count)
+    results = {}
+    for run in runs:
+        output_path = os.path.join(tmp, f"{run.__name__}.xlsm")
+        results[run.__name__[4:]] = min(run(rows, output_path) for _ in range(3))
+    with zipfile.ZipFile(os.path.join(tmp, "run_patch.xlsm")) as package:
+        assert "xl/vbaProject.bin" in package.namelist()
+    print(f"IQ {count:>6} rows | " + " | ".join(
+        f"{engine} {seconds * 1000:>8,.0f} ms ({count / seconds:>9,.0f} rows/s)" for engine, seconds in results.items()))
+
+
+if __name__ == "__main__":
+    counts = [int(arg) for arg in sys.argv[1:]] or [100, 1_000, 5_000]
+    if not os.path.exists(IQ_TEMPLATE.template_path):
+        print("IQ template not found, skipped")
+        sys.exit(0)
+    runs = [run_xlwings, run_patch] if xlwings_available() else [run_patch]
+    if len(runs) == 1:
+        print("xlwings/Excel not available: timing the patch path only")
+    compile_template(IQ_TEMPLATE.template_path, IQ_TEMPLATE.sheet_name)  # Compiled once per worker, like the template cache
+    with tempfile.TemporaryDirectory() as tmp:
+        for count in counts:
+            benchmark(count, runs, tmp)
@@ -0,0 +1,71 @@
+"""
+Time to produce a filled copy of a real mapper template, in member rows per second.
+
+    openpyxl - load_workbook + template_writer.write_rows + save (the whole package round-trips through openpyxl)
+    patch    - template_patch engine: member rows spliced into the sheet XML, other parts copied as they are
+
+The GIG template is small; the IQ template is a macro workbook with a large
+prefilled census sheet, where the openpyxl round trip dominates.
+
+Usage:
+    python tests/benchmarks/benchmark_template_patch.py [rows ...]
+"""
+import io
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+import openpyxl
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
+
+from src.services.excel_service.template_patch import Block, TemplateSpec, compile_template
+from src.services.excel_service.template_writer import write_rows
+
+COMPANY_DATA = os.path.join(os.path.dirname(__file__), '..', '..', 'company_data')
+TEMPLATES = {
+    "GIG": TemplateSpec(os.path.join(COMPANY_DATA, "gig", "templates", "MemberUpload.xlsx"), "Census",
+                        {"members": Block(2, "B:I", {"G": "DD-MM-YY"})}),
+    "IQ": TemplateSpec(os.path.join(COMPANY_DATA, "iq", "templates", "Census_Template_AE.xlsm"), "INPUT - Census",
+                       {"members": Block(2, "B:I")}),
+}
+
+
+def make_rows(count):
+    base = datetime(1960, 1, 1)
+    return [[f"Member {i}", "E" if i % 3 == 0 else "S", "M" if i % 2 else "F", "M", "Employee Male – Married",
+             base + timedelta(days=i * 7), "India", "CAT 1"] for i in range(count)]
+
+
+def run_openpyxl(spec, rows):
+    start = time.perf_counter()
+    wb = openpyxl.load_workbook(spec.template_path, keep_vba=spec.template_path.endswith(".xlsm"))
+    block = spec.blocks["members"]
+    write_rows(wb[spec.sheet_name], rows, block.start_row, block.column_range[0], block.column_formats())
+    wb.save(io.BytesIO())
+    return time.perf_counter() - start
+
+
+def run_patch(spec, rows):
+    start = time.perf_counter()
+    compile_template(spec.template_path, spec.sheet_name).render(io.BytesIO(), spec.cells({"members": rows}))
+    return time.perf_counter() - start
+
+
+def benchmark(name, spec, count):
+    rows = make_rows(count)
+    compile_template(spec.template_path, spec.sheet_name)  # Compiled once per worker, like the template cache
+    results = {run.__name__[4:]: min(run(spec, rows) for _ in range(3)) for run in (run_openpyxl, run_patch)}
+    print(f"{name:<4} {count:>6} rows | " + " | ".join(
+        f"{engine} {seconds * 1000:>8,.0f} ms ({count / seconds:>9,.0f} rows/s)" for engine, seconds in results.items()))
+
+
+if __name__ == "__main__":
+    counts = [int(arg) for arg in sys.argv[1:]] or [100, 1_000, 5_000]
+    for name, spec in TEMPLATES.items():
+        if not os.path.exists(spec.template_path):
+            print(f"{name}: template not found, skipped")
+            continue
+        for count in counts:
+            benchmark(name, spec, count)
@@ -0,0 +1,75 @@
+"""
+Write throughput of the census mappers' output step, in member rows per second.
+
+    per-cell   - ws.cell(row=..., column=...).value = ... for every value (the old mapper loop)
+    write_rows - template_writer.write_rows, one pass over the block
+    streamed   - template_writer.write_new_sheet, rows streamed into the sheet XML
+
+"fill" is the time to put the values into the workbook, "fill+save" includes
+serialising the .xlsx. Rows have 10 columns shaped like a census row.
+
+Usage:
+    python tests/benchmarks/benchmark_template_writer.py [rows ...]
+"""
+import io
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+import openpyxl
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
+
+from src.services.excel_service.template_writer import write_new_sheet, write_rows
+
+
+def make_rows(count):
+    base = datetime(1960, 1, 1)
+    return [[i + 1, f"Member {i}", "Employee" if i % 3 == 0 else "Child", "M" if i % 2 else "F",
+             base + timedelta(days=i * 7), "Married", "India", "DXB", "Category A", 4000 + i]
+            for i in range(count)]
+
+
+def run_per_cell(rows):
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    start = time.perf_counter()
+    for index, values in enumerate(rows):
+        for column, value in enumerate(values, start=1):
+            ws.cell(row=index + 2, column=column).value = value
+        ws.cell(row=index + 2, column=5).number_format = "DD-MM-YY"
+    filled = time.perf_counter()
+    wb.save(io.BytesIO())
+    return filled - start, time.perf_counter() - start
+
+
+def run_write_rows(rows):
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    start = time.perf_counter()
+    write_rows(ws, rows, start_row=2, number_formats={5: "DD-MM-YY"})
+    filled = time.perf_counter()
+    wb.save(io.BytesIO())
+    return filled - start, time.perf_counter() - start
+
+
+def run_streamed(rows):
+    start = time.perf_counter()
+    write_new_sheet(io.BytesIO(), rows, number_formats={5: "DD-MM-YY"})
+    total = time.perf_counter() - start
+    return total, total
+
+
+def benchmark(count):
+    rows = make_rows(count)
+    print(f"{count:>7} rows")
+    for name, run in (("per-cell", run_per_cell), ("write_rows", run_write_rows), ("streamed", run_streamed)):
+        fill, total = min((run(rows) for _ in range(3)), key=lambda result: result[1])
+        print(f"    {name:<10} fill {count / fill:>10,.0f} rows/s | fill+save {count / total:>9,.0f} rows/s")
+
+
+if __name__ == "__main__":
+    counts = [int(arg) for arg in sys.argv[1:]] or [1_000, 5_000, 20_000]
+    for count in counts:
+        benchmark(count)
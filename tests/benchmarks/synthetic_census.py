@@ -0,0 +1,127 @@
+"""
+Synthetic census uploads for benchmarks: a Sheet1 member list and its Nationality_Updated sheet.
+
+Members come in families (a principal followed by spouse and children) with the
+values the real uploads carry: categories A-F, HSB/LSB salary types, salaries
+partly written with thousands separators, and DOBs in mixed formats -
+dd/mm/yyyy and ISO strings, Excel dates, and a few blanks and typos.
+A share of the nationalities is missing from the nationality sheet.
+With mixed_dates=False every DOB is an ISO string instead, for mappers that
+only accept one format.
+
+Usage:
+    python tests/benchmarks/synthetic_census.py <members> <output.xlsx> [seed]
+"""
+import os
+import random
+import sys
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
+
+from src.services.excel_service.census_frame import CENSUS_SHEET_NAME, CensusFrame
+
+CATEGORIES = ["A", "B", "C", "D", "E", "F"]
+EMIRATES = ["Dubai", "Abu Dhabi", "Sharjah", "Ajman", "Ras Al Khaimah", "Fujairah", "Umm Al Quwain"]
+NATIONALITIES = [
+    "India", "Pakistan", "Philippines", "Egypt", "United Kingdom", "Bangladesh", "Sri Lanka", "Nepal",
+    "Jordan", "Lebanon", "Syria", "Sudan", "Kenya", "Nigeria", "South Africa", "United States",
+    "Canada", "France", "Germany", "Italy", "Spain", "Russia", "China", "Indonesia", "Iran",
+    "United Arab Emirates", "Saudi Arabia", "Oman", "Morocco", "Tunisia",
+]
+# Written in the census but absent from the nationality sheet
+UNLISTED_NATIONALITIES = ["Atlantis", "Unknownland"]
+FIRST_NAMES = ["Ahmed", "Fatima", "John", "Maria", "Ravi", "Aisha", "Omar", "Sara", "Li", "Anna", "Jose", "Priya"]
+LAST_NAMES = ["Khan", "Smith", "Nair", "Haddad", "Santos", "Chen", "Ali", "Fernandes", "Ibrahim", "Brown"]
+NATIONALITY_SHEET_NAME = "Nationality_Updated"
+# Insurer code columns the mappers look up, besides the AL SAGR key column
+INSURER_COLUMNS = {
+    "GIG INSURANCE": str.upper,
+    "SUKOON INSURANCE": lambda name: f"S_{name}",
+    "TAKAFUL EMARAT": lambda name: f"T_{name}",
+    "IQ Portal": lambda name: f"IQ_{name}",
+    "DAMAN": lambda name: f"D_{name}",
+}
+
+
+def _dob(rng, relation, mixed_dates):
+    """A DOB fitting the relation, in one of the formats uploads arrive with."""
+    years = rng.randint(25, 64) if relation != "Child" else rng.randint(0, 22)
+    dob = datetime(2024, 1, 1) - timedelta(days=years * 365 + rng.randint(0, 364))
+    if not mixed_dates:
+        return dob.strftime("%Y-%m-%d")
+    roll = rng.random()
+    if roll < 0.55:
+        return dob.strftime("%d/%m/%Y")
+    if roll < 0.75:
+        return dob.strftime("%Y-%m-%d")
+    if roll < 0.97:
+        return dob
+    return rng.choice([None, "", "31/02/1990", "n/a"])
+
+
+def make_members(count, seed=0, mixed_dates=True):
+    """Sheet1 of a census upload with `count` members."""
+    rng = random.Random(seed)
+    rows = []
+    while len(rows) < count:
+        last_name = rng.choice(LAST_NAMES)
+        nationality = rng.choice(UNLISTED_NATIONALITIES) if rng.random() < 0.02 else rng.choice(NATIONALITIES)
+        category = rng.choice(CATEGORIES)
+        emirate = rng.choice(EMIRATES)
+        salary_type = "HSB" if rng.random() < 0.4 else "LSB"
+        married = rng.random() < 0.6
+        family = ["Principal"] + (["Spouse"] if married else []) + ["Child"] * (rng.randint(0, 3) if married else 0)
+        principal_gender = rng.choice(["Male", "Female"])
+        for relation in family[:count - len(rows)]:
+            if relation == "Principal":
+                gender = principal_gender
+            elif relation == "Spouse":
+                gender = "Female" if principal_gender == "Male" else "Male"
+            else:
+                gender = rng.choice(["Male", "Female"])
+            salary = rng.randrange(2_000, 40_000, 250) if relation == "Principal" else 0
+            rows.append({
+                "Beneficiary First Name": f"{rng.choice(FIRST_NAMES)} {last_name}",
+                "Relation": relation,
+                "Gender": gender,
+                "DOB": _dob(rng, relation, mixed_dates),
+                "Category": category,
+                "Marital status": "Married" if relation != "Child" and married else "Single",
+                "Nationality": nationality,
+                "Visa Issued Emirates": emirate,
+                "Salary Type": salary_type,
+                "Monthly salary": f"{salary:,}" if rng.random() < 0.2 else salary,
+                "NLGIC Code": NATIONALITIES.index(nationality) + 100 if nationality in NATIONALITIES else None,
+            })
+    return pd.DataFrame(rows)
+
+
+def make_nationality_sheet():
+    """Nationality_Updated: the AL SAGR name column, each insurer's code column and NLGIC codes."""
+    sheet = pd.DataFrame({"AL SAGR": NATIONALITIES})
+    for column, code in INSURER_COLUMNS.items():
+        sheet[column] = [code(name) for name in NATIONALITIES]
+    sheet["NLGIC Code"] = range(100, 100 + len(NATIONALITIES))
+    return sheet
+
+
+def make_census_frame(count, seed=0, mixed_dates=True, source_path="synthetic_census.xlsx"):
+    """The synthetic upload as the CensusFrame mappers receive, without going through a workbook."""
+    return CensusFrame(source_path, make_members(count, seed, mixed_dates), make_nationality_sheet())
+
+
+def write_census_workbook(count, path, seed=0, mixed_dates=True):
+    """Write the synthetic upload as a census workbook (Sheet1 and Nationality_Updated)."""
+    with pd.ExcelWriter(path) as writer:
+        make_members(count, seed, mixed_dates).to_excel(writer, sheet_name=CENSUS_SHEET_NAME, index=False)
+        make_nationality_sheet().to_excel(writer, sheet_name=NATIONALITY_SHEET_NAME, index=False)
+    return path
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3:
+        sys.exit(__doc__)
+    write_census_workbook(int(sys.argv[1]), sys.argv[2], int(sys.argv[3]) if len(sys.argv) > 3 else 0)
@@ -0,0 +1,172 @@
+import os
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+# Ensure src can be imported
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from src.services.db_config.db_connect import SQLiteDatabase
+from src.services.db_service.census_db_service import (
+    claim_next_census_upload,
+    heartbeat_census_upload,
+    update_upload_status
+)
+
+SCHEMA = """
+CREATE TABLE Census_Excel_Uploads (
+    id INTEGER PRIMARY KEY,
+    census_file TEXT,
+    portals TEXT,
+    other_data TEXT,
+    status TEXT,
+    created_at TEXT,
+    worker_id TEXT,
+    lease_expires_at TEXT,
+    heartbeat_at TEXT
+)
+"""
+
+
+def create_queue(path, count):
+    """Create a SQLite stand-in for Census_Excel_Uploads with `count` pending rows."""
+    db = SQLiteDatabase(path)
+    db.connect()
+    db.execute_query(SCHEMA)
+    base = datetime(2025, 1, 1)
+    for i in range(count):
+        db.insert_record("Census_Excel_Uploads", {
+            "census_file": "",
+            "portals": "[]",
+            "status": "Pending",
+            "created_at": (base + timedelta(seconds=i)).strftime("%Y-%m-%d %H:%M:%S")
+        })
+    return db
+
+
+def verify_concurrent_claims(path, jobs=40, workers=6):
+    """Every pending row must be claimed by exactly one worker."""
+    print("Testing concurrent claims...")
+    create_queue(path, jobs).disconnect()
+    claimed = []
+    lock = threading.Lock()
+
+    def worker(worker_id):
+        db = SQLiteDatabase(path)
+        db.connect()
+        while True:
+            req = claim_next_census_upload(worker_id, 600, db=db)
+            if not req:
+                break
+            with lock:
+                claimed.append((req['id'], worker_id))
+        db.disconnect()
+
+    threads = [threading.Thread(target=worker, args=(f"worker-{i}",)) for i in range(workers)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    ids = [job_id for job_id, _ in claimed]
+    assert len(ids) == jobs, f"expected {jobs} claims, got {len(ids)}"
+    assert len(set(ids)) == jobs, "a request was claimed twice"
+
+    db = SQLiteDatabase(path)
+    db.connect()
+    rows = db.fetch_all("SELECT id, status, worker_id FROM Census_Excel_Uploads")
+    owners = dict(claimed)
+    assert all(row['status'] == 'Processing' and row['worker_id'] == owners[row['id']] for row in rows)
+    db.disconnect()
+    print(f"✅ {jobs} requests claimed once each by {len(set(owners.values()))} workers.")
+
+
+def verify_lease_expiry(path):
+    """An expired lease is re-claimable, heartbeats and status updates from the old owner are refused."""
+    print("Testing lease expiry and heartbeat...")
+    db = create_queue(path, 1)
+
+    req = claim_next_census_upload("worker-a", 600, db=db)
+    assert req and req['worker_id'] == "worker-a"
+    # The lease is set by the database clock, not the worker's
+    lease = db.fetch_one(f"SELECT {db.now_plus_seconds_sql} AS expected", (600,))['expected']
+    assert abs(datetime.strptime(req['lease_expires_at'], "%Y-%m-%d %H:%M:%S")
+               - datetime.strptime(lease, "%Y-%m-%d %H:%M:%S")) <= timedelta(seconds=2), req['lease_expires_at']
+    assert claim_next_census_upload("worker-b", 600, db=db) is None, "live lease was stolen"
+    assert heartbeat_census_upload(req['id'], "worker-a", 600, db=db)
+    assert not heartbeat_census_upload(req['id'], "worker-b", 600, db=db)
+
+    # Simulate worker-a dying: its lease runs out
+    expired = (datetime.now() - timedelta(seconds=1)).strftime("%Y-%m-%d %H:%M:%S")
+    db.execute_query("UPDATE Census_Excel_Uploads SET lease_expires_at = %s WHERE id = %s", (expired, req['id']))
+
+    reclaimed = claim_next_census_upload("worker-b", 600, db=db)
+    assert reclaimed and reclaimed['id'] == req['id'] and reclaimed['worker_id'] == "worker-b"
+    assert not heartbeat_census_upload(req['id'], "worker-a", 600, db=db)
+    assert not update_upload_status(req['id'], "Completed", worker_id="worker-a", db=db)
+    assert update_upload_status(req['id'], "Completed", worker_id="worker-b", db=db)
+
+    row = db.fetch_one("SELECT status, lease_expires_at FROM Census_Excel_Uploads WHERE id = %s", (req['id'],))
+    assert row['status'] == "Completed" and row['lease_expires_at'] is None
+    assert claim_next_census_upload("worker-c", 600, db=db) is None
+    db.disconnect()
+    print("✅ Expired lease re-queued and stale worker fenced off.")
+
+
+def verify_lost_lease_abandons_request(tmp):
+    """A request whose lease is lost stops before the next stage and writes nothing."""
+    import main
+    from src.utils.request_workspace import RequestWorkspace
+
+    class NoReaper:
+        def submit(self, path):
+            pass
+
+    flushed = []
+    mapper_runs = []
+    lease = {"held": False}
+
+    class RecordingBatch:
+        def __init__(self, *args, **kwargs):
+            pass
+
+        def flush(self, final_status):
+            flushed.append(final_status)
+            return True
+
+    def slow_parse(path):
+        time.sleep(0.3)
+        return object()
+
+    def mappers(jobs, *args, **kwargs):
+        mapper_runs.append(jobs)
+        lease["held"] = False
+        time.sleep(0.3)
+        return {}
+
+    main.RequestWorkspace = lambda upload_id: RequestWorkspace(upload_id, root=tmp, reaper=NoReaper())
+    main.CensusResultBatch = RecordingBatch
+    main.CENSUS_HEARTBEAT_SECONDS = 0.05
+    main.heartbeat_census_upload = lambda *args: lease["held"]
+    main.save_base64_to_file = lambda census_file, path: True
+    main.load_census_frame = slow_parse
+    main.run_mapper_jobs = mappers
+
+    # Lost while the input was being parsed: the mappers never run
+    assert main.process_census_request({"id": 21, "census_file": "", "portals": "[]"}) == "Abandoned"
+    assert mapper_runs == [] and flushed == []
+
+    # Lost while the mappers ran: their results are not written
+    lease["held"] = True
+    assert main.process_census_request({"id": 22, "census_file": "", "portals": "[]"}) == "Abandoned"
+    assert mapper_runs == [[]] and flushed == []
+    print("✅ Requests with a lost lease are abandoned without writing.")
+
+
+if __name__ == "__main__":
+    with tempfile.TemporaryDirectory() as tmp:
+        verify_concurrent_claims(os.path.join(tmp, "claims.db"))
+        verify_lease_expiry(os.path.join(tmp, "lease.db"))
+        verify_lost_lease_abandons_request(tmp)
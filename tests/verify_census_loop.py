@@ -0,0 +1,140 @@
+import asyncio
+import json
+import os
+import signal
+import socket
+import sys
+import tempfile
+import threading
+import time
+
+# Ensure src can be imported
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+import main
+from src.utils.clear_folder import remove_files_from_subfolders
+from src.utils.job_wakeup import JobWakeup
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def probe(port, request):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(request)
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    return response
+
+
+def verify_health_probe():
+    """Health probes get JSON and leave the poller asleep; any other connection wakes it."""
+    async def run():
+        port = free_port()
+        wakeup = JobWakeup({"/health": lambda: {"status": "ok"}, "/metrics": lambda: "census_up 1\n"})
+        await wakeup.start("127.0.0.1", port)
+        try:
+            response = await probe(port, b"GET /health HTTP/1.1\r\n\r\n")
+            assert response.startswith(b"HTTP/1.1 200 OK")
+            assert json.loads(response.split(b"\r\n\r\n", 1)[1]) == {"status": "ok"}
+            response = await probe(port, b"GET /metrics HTTP/1.1\r\n\r\n")
+            assert b"text/plain" in response and response.endswith(b"\r\n\r\ncensus_up 1\n")
+            assert not await wakeup.wait(0.2), "health probe woke the poller"
+
+            assert (await probe(port, b"wake\n")) == b"ok\n"
+            assert await wakeup.wait(1)
+        finally:
+            await wakeup.close()
+
+    asyncio.run(run())
+    print("✅ Health probes answered without waking the poller.")
+
+
+def verify_loop_stays_responsive():
+    """A slow claim runs on the DB thread: the loop keeps answering probes and stops cleanly on SIGTERM."""
+    port = free_port()
+    claims = []
+    processed = []
+    errors = []
+    claim_started = threading.Event()
+
+    def slow_claim(worker_id, lease_seconds):
+        claims.append(threading.current_thread().name)
+        if len(claims) == 1:
+            return {"id": 1}
+        claim_started.set()
+        time.sleep(1.5)  # The DB is slow; the claim still hands this worker a row
+        return {"id": 2}
+
+    def process(req):
+        time.sleep(0.3)
+        processed.append(req["id"])
+        if req["id"] == 1:
+            raise RuntimeError("status update failed")
+        return "Completed"
+
+    async def no_files():
+        pass
+
+    main.claim_next_census_upload = slow_claim
+    main.process_census_request = process
+    main.clear_files = no_files
+    main.CENSUS_WAKEUP_PORT = port
+    main.CENSUS_MAX_CONCURRENT_REQUESTS = 2
+    log_error = main.logger.error
+    main.logger.error = lambda msg, *args, **kwargs: (errors.append(msg), log_error(msg, *args, **kwargs))
+
+    async def run():
+        loop_task = asyncio.create_task(main.run_census_loop())
+        await asyncio.get_running_loop().run_in_executor(None, claim_started.wait, 5)
+        await asyncio.sleep(0.2)
+
+        start = time.monotonic()
+        response = await probe(port, b"GET /health HTTP/1.1\r\n\r\n")
+        assert time.monotonic() - start < 0.5, "loop blocked by the DB call"
+        health = json.loads(response.split(b"\r\n\r\n", 1)[1])
+        assert health["status"] == "ok" and health["db_call_seconds"] >= 0.1
+
+        # Finished requests leave the active set without waiting for the slots to fill up
+        await asyncio.sleep(0.4)
+        health = json.loads((await probe(port, b"GET /health HTTP/1.1\r\n\r\n")).split(b"\r\n\r\n", 1)[1])
+        assert health["active_requests"] == 0, health
+        assert any("status update failed" in msg for msg in errors), "request exception was not logged"
+
+        os.kill(os.getpid(), signal.SIGTERM)
+        try:
+            await loop_task
+            raise AssertionError("loop did not stop")
+        except asyncio.CancelledError:
+            pass
+
+    try:
+        asyncio.run(run())
+    finally:
+        main.logger.error = log_error
+    assert all(name.startswith("census-db") for name in claims)
+    assert sorted(processed) == [1, 2], "claimed requests were not finished before stopping"
+    print("✅ Loop answers probes during a slow claim and drains on SIGTERM.")
+
+
+def verify_clear_files():
+    """Legacy output folders are emptied from a worker thread, keeping the folders themselves."""
+    with tempfile.TemporaryDirectory() as tmp:
+        for folder in ("a", os.path.join("a", "b")):
+            os.makedirs(os.path.join(tmp, folder), exist_ok=True)
+            for i in range(3):
+                open(os.path.join(tmp, folder, f"{i}.xlsx"), "w").close()
+        asyncio.run(remove_files_from_subfolders(tmp))
+        asyncio.run(remove_files_from_subfolders(os.path.join(tmp, "missing")))
+        assert [files for _, _, files in os.walk(tmp)] == [[], [], []]
+    print("✅ Output folders cleared off the event loop.")
+
+
+if __name__ == "__main__":
+    verify_health_probe()
+    verify_loop_stays_responsive()
+    verify_clear_files()
@@ -2,13 +2,20 @@ import os
 import shutil
 import pandas as pd
 import sys
+import tempfile
+import time
+import zipfile
 
 # Ensure src can be imported
 sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
 
 from src.utils.load_yaml import ATTACHMENTS_SAVE_DIR
 from src.services.excel_service.adnic_census_map import adnic_map_census_data
+from src.services.excel_service.aura_census_map import aura_map_census_data
 from src.services.excel_service.daman_census_map import daman_map_census_data
+from src.services.excel_service.emails_cencus_map import email_map_census_data
+from src.services.excel_service.census_frame import CensusFrame, find_census_file, resolve_census_frame
+from src.services.excel_service import census_frame as census_frame_module
 # Import other mappers as needed...
 
 def create_dummy_files():
@@ -55,10 +62,79 @@ def verify_mapper(name, func):
     except Exception as e:
         print(f"❌ {name} failed: {e}")
 
+def verify_census_input():
+    """Mappers take the census path or frame explicitly; the id lookup is deterministic."""
+    source = os.path.join(ATTACHMENTS_SAVE_DIR, "Census_Input.xlsx")
+    census = resolve_census_frame('ignored', source)
+    assert isinstance(census, CensusFrame) and census.source_path == source
+    assert resolve_census_frame('ignored', census) is census
+    adnic_map_census_data('ignored', census_frame=source)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        names = ["b_census.xlsx", "a_census.xlsx", "Medical__Census.xlsx", "notes.txt"]
+        for age, name in enumerate(names):
+            shutil.copy(source, os.path.join(tmp, name))
+            os.utime(os.path.join(tmp, name), (time.time() - 100 + age, time.time() - 100 + age))
+        original = census_frame_module.census_input_dir
+        census_frame_module.census_input_dir = lambda id: tmp
+        try:
+            # Medical__ and non-workbooks are skipped; the newest remaining workbook wins
+            assert os.path.basename(find_census_file('default')) == "a_census.xlsx"
+            os.utime(os.path.join(tmp, "b_census.xlsx"), None)
+            assert os.path.basename(find_census_file('default')) == "b_census.xlsx"
+        finally:
+            census_frame_module.census_input_dir = original
+    print("✅ Census input passed explicitly and looked up deterministically.")
+
+def verify_aura_missing_values():
+    """Missing member values leave AURA cells absent rather than written as empty strings."""
+    members = pd.DataFrame({
+        'Beneficiary First Name': ['John Doe', 'Jane Doe'], 'Relation': ['Principal', 'Spouse'],
+        'Gender': ['Male', None], 'DOB': ['1990-01-01', '1992-05-20'], 'Category': ['A', 'B'],
+        'Marital status': ['Married', None], 'Nationality': ['United Kingdom', 'India'],
+        'Visa Issued Emirates': ['Dubai', 'Abu Dhabi'], 'Salary Type': ['HSB', 'LSB'],
+    })
+    nationality = pd.DataFrame({'AL SAGR': ['United Kingdom', 'India'], 'TAKAFUL EMARAT': ['UK', 'IND']})
+    generated = aura_map_census_data('ignored', census_frame=CensusFrame("census.xlsx", members, nationality))
+    with zipfile.ZipFile(generated.open()) as archive:
+        sheet = archive.read("xl/worksheets/sheet1.xml").decode()
+    assert 't="inlineStr"/>' not in sheet, "empty cells written for missing values"
+    written = pd.read_excel(generated.open())
+    assert written['Gender'].isna().tolist() == [False, True]
+    assert written['Marital Status'].isna().tolist() == [False, True]
+    print("✅ AURA leaves missing values as absent cells.")
+
+def verify_mixed_dobs():
+    """AURA and EMAIL read DOBs through the shared date engine: mixed values parse, bad ones stay blank."""
+    members = pd.DataFrame({
+        'Beneficiary First Name': ['John Doe', 'Jane Doe', 'Baby Doe'], 'Relation': ['Principal', 'Spouse', 'Child'],
+        'Gender': ['Male', 'Female', 'Male'], 'DOB': [pd.Timestamp('1990-01-01'), '1992-05-20', 'notadate'],
+        'Category': ['A', 'B', 'B'], 'Marital status': ['Married', 'Married', 'Single'],
+        'Nationality': ['United Kingdom', 'India', 'India'], 'Visa Issued Emirates': ['Dubai', 'Abu Dhabi', 'Dubai'],
+        'Salary Type': ['HSB', 'LSB', 'LSB'], 'Monthly salary': ['5,000', '3,000', '0'],
+    })
+    nationality = pd.DataFrame({'AL SAGR': ['United Kingdom', 'India'], 'TAKAFUL EMARAT': ['UK', 'IND']})
+    census = CensusFrame("census.xlsx", members, nationality)
+    expected = [pd.Timestamp('1990-01-01'), pd.Timestamp('1992-05-20')]
+
+    written = pd.read_excel(aura_map_census_data('ignored', census_frame=census).open())
+    dobs = written['Date of Birth (DD/MM/YY)']
+    assert dobs[:2].tolist() == expected and pd.isna(dobs[2]), dobs.tolist()
+
+    generated = email_map_census_data('ignored', census_frame=census)
+    assert generated, "EMAIL failed on an unparseable DOB"
+    written = pd.read_excel(generated.open(), header=None, skiprows=3)
+    dobs = written[3]
+    assert dobs[:2].tolist() == expected and pd.isna(dobs[2]), dobs.tolist()
+    print("✅ AURA and EMAIL parse mixed DOBs and leave unparseable ones blank.")
+
 if __name__ == "__main__":
     create_dummy_files()
     
     # Test a few key mappers
     verify_mapper("ADNIC", adnic_map_census_data)
     verify_mapper("DAMAN", daman_map_census_data)
+    verify_census_input()
+    verify_aura_missing_values()
+    verify_mixed_dobs()
     print("Verification Setup Complete. Ready to run specific tests.")
@@ -0,0 +1,87 @@
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+# Ensure src can be imported
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from src.services.excel_service.census_frame import CensusFrame
+from src.services.excel_service.nlg_census_map import nlg_map_census_data
+from src.services.excel_service.portal_executor import run_mapper
+from src.utils.census_metrics import RequestTimings, StageMetrics, StageTimer, record_request_timings, stage
+
+
+def verify_stage_timer():
+    """stage() blocks add to the timer active on their thread and cost nothing without one."""
+    with stage("ignored"):
+        pass
+    outer, inner = StageTimer(), StageTimer()
+    with outer.activate():
+        with stage("parse"):
+            time.sleep(0.02)
+        with inner.activate():
+            with stage("write"):
+                pass
+        with stage("parse"):
+            pass
+    assert set(outer.stages) == {"parse"} and outer.stages["parse"] >= 0.02
+    assert set(inner.stages) == {"write"}
+    print("✅ Stages timed into the active timer.")
+
+
+def verify_mapper_stages():
+    """A real mapper run reports template, write and save stages, with the rest as transform."""
+    members = pd.DataFrame({
+        'Relation': ['Principal', 'Spouse'], 'Gender': ['M', 'F'], 'DOB': ['1990-01-01', '1992-05-20'],
+        'Salary Type': ['HSB', 'LSB'], 'Visa Issued Emirates': ['Dubai', 'Abu Dhabi'], 'Category': ['A', 'B'],
+        'Marital status': ['Married', 'Married'], 'Nationality': ['India', 'Egypt'], 'NLGIC Code': [356, 818],
+    })
+    nationality = pd.DataFrame({'AL SAGR': ['India', 'Egypt'], 'NLGIC Code': [356, 818]})
+    result = run_mapper("NLG", "NLG", nlg_map_census_data, census_frame=CensusFrame("census.xlsx", members, nationality))
+    assert result.success, result.traceback
+    assert {"template_load", "write", "save", "transform"} <= set(result.stages), result.stages
+    assert abs(sum(result.stages.values()) - result.duration) < 0.01
+
+    failed = run_mapper("NLG", "NLG", nlg_map_census_data, census_frame=CensusFrame("census.xlsx", members.iloc[:, :2]))
+    assert not failed.success and "transform" in failed.stages
+    print("✅ Mapper runs report their stages.")
+
+
+def verify_export():
+    """Request records feed Prometheus histograms and the JSON snapshot."""
+    metrics = StageMetrics()
+    timings = RequestTimings(42)
+    timings.queue_wait(datetime.now() - timedelta(seconds=3))
+    with timings.time("decode"):
+        pass
+    timings.add_portal_stages("NLG", {"transform": 0.2, "write": 0.03})
+    timings.add_portal_stages("GIG", None)
+    timings.portal("NLG").add("encode", 0.001)
+    record = record_request_timings(timings, "Completed", metrics)
+
+    assert record["upload_id"] == 42 and record["status"] == "Completed"
+    assert 3 <= record["stages"]["queue_wait"] < 4
+    assert record["portals"]["NLG"] == {"transform": 0.2, "write": 0.03, "encode": 0.001}
+    assert record["portals"]["GIG"] == {}
+
+    text = metrics.prometheus()
+    assert 'census_stage_seconds_bucket{stage="transform",portal="NLG",le="0.25"} 1' in text
+    assert 'census_stage_seconds_bucket{stage="transform",portal="NLG",le="0.1"} 0' in text
+    assert 'census_stage_seconds_count{stage="queue_wait",portal=""} 1' in text
+    assert 'census_requests_total{status="Completed"} 1' in text
+
+    snapshot = metrics.snapshot()
+    assert snapshot["requests"] == {"Completed": 1}
+    assert snapshot["portals"]["NLG"]["write"] == {"count": 1, "sum": 0.03, "max": 0.03}
+    assert {"queue_wait", "decode", "total"} <= set(snapshot["stages"])
+    assert snapshot["recent"] == [record]
+    print("✅ Timings exported as Prometheus text and JSON.")
+
+
+if __name__ == "__main__":
+    verify_stage_timer()
+    verify_mapper_stages()
+    verify_export()
@@ -0,0 +1,127 @@
+import os
+import sys
+import tempfile
+
+# Ensure src can be imported
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from src.services.db_config.db_connect import SQLiteDatabase
+from src.services.db_service import census_db_service
+from src.services.db_service.census_db_service import CensusResultBatch, save_generated_census_to_file
+from src.utils.census_storage import ContentAddressedStore
+from src.utils.generated_census import GeneratedCensus
+
+SCHEMA = [
+    """
+    CREATE TABLE Census_Excel_Uploads (
+        id INTEGER PRIMARY KEY,
+        status TEXT,
+        worker_id TEXT,
+        lease_expires_at TEXT
+    )
+    """,
+    """
+    CREATE TABLE Census_Portal_Excels (
+        id INTEGER PRIMARY KEY,
+        upload_id INTEGER,
+        portal TEXT,
+        census TEXT,
+        status TEXT,
+        log TEXT,
+        storage_format TEXT NOT NULL DEFAULT 'base64',
+        census_blob BLOB,
+        content_sha256 TEXT,
+        content_length INTEGER
+    )
+    """
+]
+
+
+def create_db(path):
+    """A SQLite stand-in with one request claimed by worker-a."""
+    db = SQLiteDatabase(path)
+    db.connect()
+    for statement in SCHEMA:
+        db.execute_query(statement)
+    db.insert_record("Census_Excel_Uploads", {
+        "status": "Processing", "worker_id": "worker-a", "lease_expires_at": "2099-01-01 00:00:00"
+    })
+    return db
+
+
+def portal_rows(db):
+    return db.fetch_all("SELECT id, portal, status, storage_format, log FROM Census_Portal_Excels ORDER BY id")
+
+
+def verify_batched_flush(tmp):
+    """Results are only visible once flushed, and then together with the final status, in every storage format."""
+    db = create_db(os.path.join(tmp, "batch.db"))
+    census_db_service._census_file_store = ContentAddressedStore(os.path.join(tmp, "store"))
+    content = os.urandom(50_000) + b"census" * 10_000
+
+    for fmt in ("base64", "blob", "blob+gzip", "file", "file+gzip"):
+        db.execute_query("DELETE FROM Census_Portal_Excels")
+        results = CensusResultBatch(1, "worker-a", storage_format=fmt, stream_bytes=0)
+        gig = GeneratedCensus("gig.xlsx", content)
+        assert results.add_generated("GIG", gig)
+        assert results.add_generated("ADNIC", GeneratedCensus("adnic.xlsx", content))
+        assert not results.add_generated("NLG", GeneratedCensus("nlg.xlsx", b""))
+        results.add_failed("NLG", "Census file not generated")
+        assert len(results) == 3 and portal_rows(db) == []
+        # The batch keeps the mapper's file, not an encoded copy; encoding happens during flush
+        assert results._rows[0][1] is gig
+
+        assert results.flush("Partial", db=db)
+        rows = portal_rows(db)
+        assert [(r['portal'], r['status']) for r in rows] == [
+            ("GIG", "Completed"), ("ADNIC", "Completed"), ("NLG", "Failed")]
+        assert rows[2]['log'] == "FAILED: Census file not generated"
+        for row in rows[:2]:
+            output_path = os.path.join(tmp, f"out_{row['id']}.xlsx")
+            assert save_generated_census_to_file(row['id'], output_path, db=db)
+            with open(output_path, "rb") as f:
+                assert f.read() == content, f"{row['portal']} ({fmt}) did not round-trip"
+        status = db.fetch_one("SELECT status, lease_expires_at FROM Census_Excel_Uploads WHERE id = 1")
+        assert status['status'] == "Partial" and status['lease_expires_at'] is None
+        print(f"✅ {fmt}: results and status written in one flush.")
+    db.disconnect()
+
+
+def verify_lost_claim(tmp):
+    """A worker that lost its claim writes nothing: the rows are rolled back with the status update."""
+    db = create_db(os.path.join(tmp, "fenced.db"))
+    results = CensusResultBatch(1, "worker-b")
+    results.add_failed("GIG", "Mapper execution failed")
+    results.add_generated("ADNIC", GeneratedCensus("adnic.xlsx", b"census"))
+
+    assert not results.flush("Completed", db=db)
+    assert portal_rows(db) == []
+    assert db.fetch_one("SELECT status FROM Census_Excel_Uploads WHERE id = 1")['status'] == "Processing"
+    db.disconnect()
+    print("✅ Stale worker's results rolled back with its status update.")
+
+
+def verify_streamed_results(tmp):
+    """Files above stream_bytes are committed straight away; the rest wait for the flush."""
+    db = create_db(os.path.join(tmp, "stream.db"))
+    results = CensusResultBatch(1, "worker-a", storage_format="blob", stream_bytes=1_000)
+    assert results.add_generated("DAMAN", GeneratedCensus("daman.xlsx", os.urandom(5_000)), db=db)
+    assert results.add_generated("GIG", GeneratedCensus("gig.xlsx", b"small"), db=db)
+
+    # A second connection sees the large file before the request finishes
+    reader = SQLiteDatabase(os.path.join(tmp, "stream.db"))
+    reader.connect()
+    assert [r['portal'] for r in portal_rows(reader)] == ["DAMAN"]
+
+    assert results.flush("Completed", db=db)
+    assert [r['portal'] for r in portal_rows(reader)] == ["DAMAN", "GIG"]
+    reader.disconnect()
+    db.disconnect()
+    print("✅ Large results visible early, the rest committed with the status.")
+
+
+if __name__ == "__main__":
+    with tempfile.TemporaryDirectory() as tmp:
+        verify_batched_flush(tmp)
+        verify_lost_claim(tmp)
+        verify_streamed_results(tmp)
@@ -0,0 +1,143 @@
+import os
+import pickle
+import sys
+from datetime import datetime
+
+import pandas as pd
+
+# Ensure src can be imported
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from src.services.excel_service.census_transforms import (
+    INVALID_DOB, choose, column_or, format_dates, gender_codes, map_values, parse_dates, relation_labels
+)
+from src.services.excel_service.census_frame import CensusFrame
+from src.services.excel_service import date_engine
+from src.services.excel_service.date_engine import DateEngine
+from src.services.excel_service.gig_census_map import GIG_DOB_FORMATS
+
+
+def verify_value_maps():
+    """Whole-column maps match the per-row lookups they replace, including values that are not mapped."""
+    relations = pd.Series(['Principal', 'Spouse', 'Child', None, float('nan'), 'Principal'], dtype=object)
+    assert relation_labels(relations).tolist()[:3] == ['Employee', 'Spouse', 'Child']
+    assert relation_labels(relations).tolist()[-1] == 'Employee'
+    assert pd.isna(relation_labels(relations)[4])
+
+    genders = pd.Series(['Male', 'Female', 'M', 'Other'])
+    assert gender_codes(genders).tolist() == ['M', 'F', 'M', 'Other']
+
+    categories = pd.Series(['A', 'B', 'D', None])
+    assert map_values(categories, {'A': 1, 'B': 2, 'C': 3}, "Unknown").tolist() == [1, 2, "Unknown", "Unknown"]
+    assert choose(pd.Series(['HSB', 'LSB', None]) == 'HSB', 'Enhanced', 'LSB').tolist() == ['Enhanced', 'LSB', 'LSB']
+
+    df = pd.DataFrame({'Region': ['Dubai']})
+    assert column_or(df, 'Region').tolist() == ['Dubai']
+    assert column_or(df, 'LSB').tolist() == [""]
+    print("✅ Value maps match the per-row lookups.")
+
+
+def verify_dates():
+    """Bulk date conversion matches the per-value parsing it replaces."""
+    values = ['05/01/2020', '5/1/20', '26-12-1975', datetime(1996, 2, 9), pd.Timestamp('2001-03-06'),
+              'notadate', '', None, float('nan')]
+    series = pd.Series(values, dtype=object)
+
+    for dayfirst in (True, False):
+        expected = []
+        for value in values:
+            converted = pd.to_datetime(value, dayfirst=dayfirst, errors='coerce') if pd.notnull(value) else None
+            expected.append(converted.strftime("%d-%b-%y") if pd.notnull(converted) else INVALID_DOB)
+        assert format_dates(series, "%d-%b-%y", dayfirst=dayfirst).tolist() == expected, dayfirst
+
+    # Format lists behave like a strptime loop: strings stripped, first matching format wins
+    parsed = parse_dates(pd.Series([' 05/01/2020 ', '01/13/2020', '13-01-2020', 'x', 20200105, datetime(2000, 1, 1)],
+                                   dtype=object), formats=GIG_DOB_FORMATS)
+    assert parsed.tolist()[:3] == [pd.Timestamp(2020, 1, 5), pd.Timestamp(2020, 1, 13), pd.Timestamp(2020, 1, 13)]
+    assert parsed[3:5].isna().all()
+    assert parsed[5] == pd.Timestamp(2000, 1, 1)
+    print("✅ Bulk date conversion matches per-value parsing.")
+
+
+def verify_date_engine():
+    """A shared engine parses each distinct string once and matches whole-column mixed parsing."""
+    # The ISO first string sets the guessed format; the rest fall through to mixed parsing by dayfirst
+    values = ['1974-07-10', '08/04/1979', '27/09/1984', '08/04/1979', '13-01-1990', datetime(1998, 8, 4),
+              'notadate', None, '27/09/1984', ' 05/01/2020 ']
+    series = pd.Series(values * 50, dtype=object)
+    engine = DateEngine()
+    for dayfirst in (True, False):
+        expected = pd.to_datetime(series, errors='coerce', dayfirst=dayfirst, format='mixed')
+        pd.testing.assert_series_equal(parse_dates(series, dayfirst=dayfirst, engine=engine), expected)
+
+    parsed_strings = engine.stats()["parsed_strings"]
+    parse_dates(series, dayfirst=True, engine=engine)
+    stats = engine.stats()
+    assert stats["parsed_strings"] == parsed_strings, "memoized strings were parsed again"
+    assert stats["values"] == 3 * len(series) and stats["unparseable"] == 3 * 100
+
+    # Mapper processes receive the engine with the census frame
+    copy = pickle.loads(pickle.dumps(engine))
+    assert copy.stats() == stats
+    pd.testing.assert_series_equal(copy.parse(series, formats=GIG_DOB_FORMATS),
+                                   parse_dates(series, formats=GIG_DOB_FORMATS))
+
+    # A memo past its limit keeps the latest column only; values memoized earlier still parse to their own dates
+    limit = date_engine.MEMO_LIMIT
+    date_engine.MEMO_LIMIT = 3
+    try:
+        engine = DateEngine()
+        engine.parse(pd.Series(['01/02/2020', '03/04/2021']), dayfirst=True)
+        column = pd.Series(['01/02/2020', '05/06/2022', '07/08/2023', '01/02/2020'])
+        expected = pd.to_datetime(column, dayfirst=True, format='mixed')
+        pd.testing.assert_series_equal(engine.parse(column, dayfirst=True), expected)
+        pd.testing.assert_series_equal(engine.parse(column, dayfirst=True), expected)
+    finally:
+        date_engine.MEMO_LIMIT = limit
+    print("✅ Shared date engine memoizes values and matches mixed parsing.")
+
+
+def verify_nationality_index():
+    """Index lookups match the merges and dicts they replace, without adding rows or columns."""
+    table = pd.DataFrame({
+        'AL SAGR': ['India', 'United Kingdom', 'Egypt', 'India'],
+        'GIG INSURANCE': ['IND', 'GBR', None, 'INDIA'],
+        'NLGIC Code': [356, 826, 818, 357],
+    })
+    census = CensusFrame("census.xlsx", pd.DataFrame({'Nationality': ['India', 'Mars', 'Egypt', None]}), table)
+    index = census.nationality_index()
+    assert index is census.nationality_index() and len(index) == 3
+    assert 'GIG INSURANCE' in index and 'AL SAGR' in index and 'DAMAN' not in index
+
+    names = census.members()['Nationality']
+    # A repeated name uses its last row, like dict(zip(...))
+    mapping = dict(zip(table['AL SAGR'], table['GIG INSURANCE']))
+    looked_up = index.lookup(names, 'GIG INSURANCE')
+    assert looked_up[0] == names.map(mapping)[0] == 'INDIA' and looked_up[1:].isna().all()
+    gig = index.lookup(names, 'GIG INSURANCE', default=names)
+    assert gig[0] == 'INDIA' and gig[1] == 'Mars' and pd.isna(gig[2]) and pd.isna(gig[3])
+    assert index.lookup(names, 'AL SAGR', "Unknown").tolist() == ['India', 'Unknown', 'Egypt', 'Unknown']
+
+    # Numeric codes keep the dtype a left merge gave them
+    merged = pd.merge(names.to_frame(), table.drop_duplicates('AL SAGR', keep='last'),
+                      left_on='Nationality', right_on='AL SAGR', how='left')
+    pd.testing.assert_series_equal(index.lookup(names, 'NLGIC Code'), merged['NLGIC Code'], check_names=False)
+
+    try:
+        index.lookup(names, 'DAMAN')
+        raise AssertionError("missing insurer column was looked up")
+    except KeyError:
+        pass
+    try:
+        CensusFrame("census.xlsx", names.to_frame()).nationality_index()
+        raise AssertionError("index built without a nationality sheet")
+    except ValueError:
+        pass
+    print("✅ Nationality index matches the merges it replaces.")
+
+
+if __name__ == "__main__":
+    verify_value_maps()
+    verify_dates()
+    verify_date_engine()
+    verify_nationality_index()
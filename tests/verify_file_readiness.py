@@ -0,0 +1,125 @@
+import os
+import sys
+import tempfile
+import threading
+import time
+
+# Ensure src can be imported
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from src.services.excel_service.portal_executor import MapperJob, run_mapper_jobs, shutdown_portal_pool
+from src.utils.atomic_file import atomic_write
+
+
+def quick_mapper(id, census_frame=None, output_dir=None):
+    return "done"
+
+
+def hung_mapper(id, census_frame=None, output_dir=None):
+    time.sleep(60)
+
+
+def slow_mapper(id, census_frame=None, output_dir=None):
+    time.sleep(3)
+    return "slow"
+
+
+def verify_atomic_write(tmp):
+    """The file only appears once complete; a failed write leaves the previous file and no temp files."""
+    path = os.path.join(tmp, "census.xlsx")
+    with atomic_write(path) as f:
+        f.write(b"first")
+        assert not os.path.exists(path)
+    try:
+        with atomic_write(path) as f:
+            f.write(b"partial")
+            raise RuntimeError("writer failed")
+    except RuntimeError:
+        pass
+    with open(path, "rb") as f:
+        assert f.read() == b"first"
+    assert os.listdir(tmp) == ["census.xlsx"]
+    print("✅ Files are renamed into place only when complete.")
+
+
+def verify_mapper_timeout():
+    """Finished mappers are collected at once; a hung one fails at the deadline instead of blocking."""
+    jobs = [MapperJob("QUICK", "QUICK", quick_mapper, None, "quick.xlsx")]
+    start = time.monotonic()
+    results = run_mapper_jobs(jobs, None, parallel=True, max_workers=2, timeout=30)
+    assert results["QUICK"].success and results["QUICK"].census == "done"
+    assert time.monotonic() - start < 10
+
+    jobs.append(MapperJob("HUNG", "HUNG", hung_mapper, None, "hung.xlsx"))
+    start = time.monotonic()
+    results = run_mapper_jobs(jobs, None, parallel=True, max_workers=2, timeout=2)
+    assert time.monotonic() - start < 10
+    assert results["QUICK"].success
+    assert not results["HUNG"].success and "did not finish" in results["HUNG"].error
+
+    # The pool was restarted, so the next request still runs
+    results = run_mapper_jobs(jobs[:1], None, parallel=True, max_workers=2, timeout=30)
+    assert results["QUICK"].success
+    shutdown_portal_pool()
+    print("✅ Mapper waits end on completion or at the timeout.")
+
+
+def verify_local_timeout():
+    """Without the process pool a hung mapper still fails at the timeout instead of blocking the request."""
+    jobs = [MapperJob("HUNG", "HUNG", hung_mapper, None, "hung.xlsx"), MapperJob("QUICK", "QUICK", quick_mapper, None, "quick.xlsx")]
+    start = time.monotonic()
+    results = run_mapper_jobs(jobs, None, parallel=False, timeout=1)
+    assert time.monotonic() - start < 5
+    assert not results["HUNG"].success and "did not finish" in results["HUNG"].error
+    assert results["QUICK"].success and results["QUICK"].census == "done"
+    print("✅ Local mappers fail at the timeout too.")
+
+
+def verify_timeout_isolation():
+    """A timeout retires only its own pool: another request's running mapper still finishes."""
+    import src.services.excel_service.portal_executor as portal_executor
+
+    slow = {}
+    slow_request = threading.Thread(target=lambda: slow.update(run_mapper_jobs(
+        [MapperJob("SLOW", "SLOW", slow_mapper, None, "slow.xlsx")], None, parallel=True, max_workers=2, timeout=30)))
+    slow_request.start()
+    time.sleep(0.5)
+    shared_pool = portal_executor._portal_pool
+    results = run_mapper_jobs([MapperJob("HUNG", "HUNG", hung_mapper, None, "hung.xlsx")], None,
+                              parallel=True, max_workers=2, timeout=2)
+    assert not results["HUNG"].success
+    assert portal_executor._portal_pool is None
+    workers = shared_pool.worker_processes()
+    assert len(workers) == 2, workers
+
+    results = run_mapper_jobs([MapperJob("QUICK", "QUICK", quick_mapper, None, "quick.xlsx")], None,
+                              parallel=True, max_workers=2, timeout=30)
+    assert results["QUICK"].success
+    fresh_pool = portal_executor._portal_pool
+    assert fresh_pool is not None and fresh_pool is not shared_pool
+
+    slow_request.join(10)
+    assert slow["SLOW"].success and slow["SLOW"].census == "slow", slow["SLOW"].error
+
+    # The retired pool's hung worker is terminated once the other requests had their time
+    deadline = time.monotonic() + 10
+    while any(worker.is_alive() for worker in workers) and time.monotonic() < deadline:
+        time.sleep(0.2)
+    assert not any(worker.is_alive() for worker in workers), "hung worker left running"
+
+    # A late report about the retired pool leaves the fresh one running
+    portal_executor._retire_portal_pool(shared_pool)
+    assert portal_executor._portal_pool is fresh_pool
+    shutdown_portal_pool()
+    print("✅ A timed-out request leaves other requests' mappers and pools alone.")
+
+
+if __name__ == "__main__":
+    import src.services.excel_service.portal_executor as portal_executor
+
+    portal_executor.PROCESS_POOL_PORTALS = {"QUICK", "HUNG", "SLOW"}
+    with tempfile.TemporaryDirectory() as tmp:
+        verify_atomic_write(tmp)
+    verify_mapper_timeout()
+    verify_timeout_isolation()
+    verify_local_timeout()
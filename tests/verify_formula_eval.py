@@ -0,0 +1,113 @@
+import io
+import os
+import sys
+import zipfile
+from datetime import date, datetime
+
+import openpyxl
+import pandas as pd
+from openpyxl.utils.datetime import to_excel
+
+# Ensure src can be imported
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from src.services.excel_service.census_transforms import parse_dates
+from src.services.excel_service.formula_eval import (
+    DIV0, NA, VALUE, EXCEL_TEXT_DATES_DAYFIRST, FormulaError, evaluate_formulas
+)
+from src.services.excel_service.template_patch import Block, TemplateSpec, open_template
+
+
+def evaluate(formula, values=None, today=None):
+    """Result of one formula placed in A1 over {(row, column): value} cells."""
+    return evaluate_formulas(values or {}, {(1, 1): formula}, today)[(1, 1)]
+
+
+def verify_functions():
+    """The functions the DAMAN template uses give the values Excel caches."""
+    table = {(2, 1): "CAT A", (2, 2): "Dubai", (3, 1): "CAT B", (3, 2): "Abu Dhabi", (4, 1): "Error"}
+    assert evaluate('IF(B2="Dubai","DXB","Other")', table) == "DXB"
+    assert evaluate('VLOOKUP("cat b",A2:B3,2,FALSE)', table) == "Abu Dhabi"
+    assert evaluate('VLOOKUP("CAT C",A2:B3,2,FALSE)', table) == NA
+    assert evaluate('IFERROR(VLOOKUP("CAT C",A2:B3,2,FALSE),"")', table) == ""
+    assert evaluate('COUNTIF(A2:A10,"Error")', table) == 1.0
+    assert evaluate('COUNTIF(A2:A10,"CAT*")', table) == 2.0
+    assert evaluate('COUNTA(A2:B10)', table) == 5.0
+    assert evaluate('FIND("Dh",B3)', table) == 5.0
+    assert evaluate('FIND("x",B3)', table) == VALUE
+    assert evaluate('LEFT(A2,3)&"-"&RIGHT(A3)', table) == "CAT-B"
+    assert evaluate('MATCH("CAT B",A2:A4,0)', table) == 2.0
+    assert evaluate('INDEX(B2:B3,2)', table) == "Abu Dhabi"
+    assert evaluate('AND(B2="Dubai",OR(1>2,-2^2=4))', table) is True
+    assert evaluate('SUM(1,2,"3")+50%') == 6.5
+    print("✅ Lookup, text, counting and logical functions match Excel.")
+
+
+def verify_dates():
+    """Dates are Excel serials; date text is coerced like Excel does in an en-US locale."""
+    today = date(2026, 3, 1)
+    assert evaluate("TODAY()", today=today) == 46082.0
+    assert evaluate("DATE(2026,3,1)-TODAY()", today=today) == 0.0
+    assert evaluate('"03/01/2026"+0') == 46082.0
+    assert evaluate('(TODAY()-B1)/365>18', {(1, 2): 0.0}, today=today) is True
+    assert evaluate('"not a date"+0') == VALUE
+
+    # Mappers that stand in for Excel (IQ's DOBs) read ambiguous text the same way as the evaluator
+    mapped = parse_dates(pd.Series(["03/04/1990"]), dayfirst=EXCEL_TEXT_DATES_DAYFIRST)[0]
+    assert evaluate('"03/04/1990"+0') == float(to_excel(mapped.to_pydatetime())) == float(to_excel(datetime(1990, 3, 4)))
+    print("✅ TODAY, DATE and text dates evaluate to Excel serials.")
+
+
+def verify_errors():
+    """Error values propagate; unsupported formulas raise FormulaError so the caller can fall back."""
+    assert evaluate("1/0") == DIV0
+    assert evaluate('IF(1/0>1,"a","b")') == DIV0
+    assert evaluate('IFERROR(1/0,"ok")') == "ok"
+    for formula in ("OFFSET(A1,1,1)", "inception_date+1", "Sheet2!A1"):
+        try:
+            evaluate(formula)
+            raise AssertionError(f"{formula} accepted")
+        except FormulaError:
+            pass
+    try:
+        evaluate_formulas({}, {(1, 1): "B1", (1, 2): "A1"})
+        raise AssertionError("circular reference accepted")
+    except FormulaError:
+        pass
+    print("✅ Error values propagate and unsupported formulas raise FormulaError.")
+
+
+def verify_recalculated_template(tmp):
+    """A recalculated template stores formula results, so readers see values without opening Excel."""
+    path = os.path.join(tmp, "template.xlsx")
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws.title = "Members"
+    ws["A1"], ws["B1"], ws["C1"] = "Name", "DOB", "Check"
+    for row in range(2, 5):
+        ws[f"C{row}"] = f'=IF(A{row}="","",IF(B{row}="","DOB missing","OK"))'
+    ws["E1"] = '=COUNTIF(C2:C4,"OK")'
+    wb.save(path)
+
+    spec = TemplateSpec(path, "Members", {"members": Block(2, "A:B")}, recalculate=True)
+    output = io.BytesIO()
+    open_template(spec).render(output, {"members": [["Ali", datetime(1990, 5, 1)], ["Sara", None]]})
+
+    ws = openpyxl.load_workbook(io.BytesIO(output.getvalue()), data_only=True)["Members"]
+    assert [ws["C2"].value, ws["C3"].value, ws["E1"].value] == ["OK", "DOB missing", 1]
+    assert ws["C4"].value is None  # Empty text result; openpyxl reads it back as None
+    ws = openpyxl.load_workbook(io.BytesIO(output.getvalue()))["Members"]
+    assert ws["C2"].value == '=IF(A2="","",IF(B2="","DOB missing","OK"))'
+    with zipfile.ZipFile(output) as package:
+        assert "xl/calcChain.xml" not in package.namelist()
+    print("✅ Recalculated templates carry cached formula results.")
+
+
+if __name__ == "__main__":
+    import tempfile
+
+    verify_functions()
+    verify_dates()
+    verify_errors()
+    with tempfile.TemporaryDirectory() as tmp:
+        verify_recalculated_template(tmp)
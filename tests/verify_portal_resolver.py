@@ -0,0 +1,86 @@
+import os
+import random
+import sys
+import threading
+
+# Ensure src can be imported
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from main import COMPANY_NAME_MAPPING, FUZZY_PORTAL_PATTERNS
+from src.utils.portal_resolver import CASE_INSENSITIVE, EXACT, FUZZY, UNMATCHED, PatternMatcher, PortalResolver
+
+
+def linear_resolve(company_name):
+    """The lookup normalize_portal_name used to do: dict hit, case-insensitive scan, substring scan."""
+    if company_name in COMPANY_NAME_MAPPING:
+        return COMPANY_NAME_MAPPING[company_name]
+    company_upper = company_name.upper().strip()
+    for key, value in COMPANY_NAME_MAPPING.items():
+        if key.upper() == company_upper:
+            return value
+    company_clean = company_upper.replace("INSURANCE", "").replace("CO", "").replace("COMPANY", "").replace("PJSC", "").replace(".", "").strip()
+    for pattern, portal in FUZZY_PORTAL_PATTERNS.items():
+        if pattern in company_clean:
+            return portal
+    return None
+
+
+def verify_matches_linear_scan():
+    """Every known spelling and a spread of messy variants resolve exactly as the linear scans did."""
+    resolver = PortalResolver(COMPANY_NAME_MAPPING, FUZZY_PORTAL_PATTERNS, cache_size=64)
+    names = list(COMPANY_NAME_MAPPING)
+    names += [name.lower() for name in names] + [f"  {name.title()} " for name in names]
+    names += [f"{pattern.title()} Insurance Co. PJSC" for pattern in FUZZY_PORTAL_PATTERNS]
+    names += ["Orient Insurance", "NLGIC Dubai", "Sagebrush Holdings", "Max Health Plus", "Unknown Insurer", "Co"]
+    rng = random.Random(7)
+    words = [name.upper() for name in names] + ["GROUP", "HEALTH", "UAE", "CO", "NATIONAL"]
+    names += [" ".join(rng.choice(words) for _ in range(rng.randint(1, 4))) for _ in range(2_000)]
+
+    for name in names + names:  # Second pass is served from the LRU
+        assert resolver.resolve(name).portal == linear_resolve(name), name
+
+    stats = resolver.stats()
+    assert stats["cache_hits"] > 0 and stats["cached_names"] == 64
+    assert sum(stats["matches"].values()) == 2 * len(names)
+    assert {EXACT, CASE_INSENSITIVE, FUZZY, UNMATCHED} <= set(stats["matches"])
+    print(f"✅ {len(names)} names resolve as the linear scans did.")
+
+
+def verify_pattern_priority():
+    """The earliest-listed pattern wins wherever it occurs, including overlapping and nested patterns."""
+    matcher = PatternMatcher(["NLGIC", "NLG", "SAGE", "AGE", "HANSE", "MERKUR"])
+    assert matcher.find("XNLGICX") == "NLGIC"
+    assert matcher.find("NLGX") == "NLG"
+    assert matcher.find("MERKUR HANSE") == "HANSE"
+    assert matcher.find("PAGES") == "AGE"
+    assert matcher.find("SAGES") == "SAGE"
+    assert matcher.find("") is None and matcher.find("BUPA") is None
+    print("✅ Fuzzy patterns keep their priority order.")
+
+
+def verify_statistics():
+    """Match types and fuzzy hits are counted per call, also when resolved from several threads."""
+    resolver = PortalResolver({"GIG": "GIG"}, {"DAMAN": "DAMAN"})
+
+    def worker():
+        for _ in range(500):
+            resolver.resolve("GIG")
+            resolver.resolve("gig")
+            resolver.resolve("Daman National Health")
+
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    stats = resolver.stats()
+    assert stats["matches"] == {EXACT: 2_000, CASE_INSENSITIVE: 2_000, FUZZY: 2_000}
+    assert stats["top_fuzzy_hits"] == [("Daman National Health", "DAMAN", 2_000)]
+    print("✅ Resolution statistics counted.")
+
+
+if __name__ == "__main__":
+    verify_matches_linear_scan()
+    verify_pattern_priority()
+    verify_statistics()
@@ -0,0 +1,156 @@
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+# Ensure src can be imported
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from src.utils.request_workspace import TRASH_DIR_NAME, RequestWorkspace, WorkspaceReaper
+
+
+class RecordingReaper:
+    """Keeps what it is given so the test can look at it before anything is deleted."""
+
+    def __init__(self):
+        self.submitted = []
+
+    def submit(self, path):
+        self.submitted.append(path)
+
+
+def fill(workspace):
+    for folder in (workspace.input_dir, workspace.output_dir("NLG"), workspace.output_dir("GIG")):
+        for i in range(5):
+            with open(os.path.join(folder, f"{i}.xlsx"), "wb") as f:
+                f.write(b"x" * 1024)
+
+
+def verify_detach(tmp):
+    """Cleanup renames the workspace into the trash in one step and leaves the delete to the reaper."""
+    reaper = RecordingReaper()
+    workspace = RequestWorkspace(7, root=tmp, reaper=reaper)
+    fill(workspace)
+    workspace.cleanup()
+    workspace.cleanup()
+
+    detached = os.path.join(tmp, TRASH_DIR_NAME, os.path.basename(workspace.path))
+    assert not os.path.exists(workspace.path)
+    assert reaper.submitted == [detached], reaper.submitted
+    assert len(os.listdir(os.path.join(detached, "output", "nlg"))) == 5, "files deleted on the request thread"
+    print("✅ Finished workspaces detached with a single rename.")
+
+
+def verify_reaper(tmp):
+    """The reaper deletes detached workspaces, and a sweep picks up the ones an earlier run left behind."""
+    reaper = WorkspaceReaper()
+    workspaces = [RequestWorkspace(upload_id, root=tmp, reaper=reaper) for upload_id in range(4)]
+    for workspace in workspaces:
+        fill(workspace)
+    for workspace in workspaces:
+        with workspace:
+            pass
+    reaper.drain()
+    assert os.listdir(os.path.join(tmp, TRASH_DIR_NAME)) == []
+    assert os.listdir(tmp) == [TRASH_DIR_NAME]
+
+    # Detached but never deleted, e.g. the worker was killed
+    crashed = RequestWorkspace(9, root=tmp, reaper=RecordingReaper())
+    fill(crashed)
+    crashed.cleanup()
+    assert reaper.sweep(tmp) == 1
+    reaper.drain()
+    assert os.listdir(os.path.join(tmp, TRASH_DIR_NAME)) == []
+    assert reaper.sweep(os.path.join(tmp, "missing")) == 0
+    print("✅ Reaper removes detached and leftover workspaces.")
+
+
+def verify_stale_workspaces(tmp):
+    """A sweep also reclaims request workspaces whose worker was killed, never those of a live one."""
+    finished = subprocess.run([sys.executable, "-c", "import os; print(os.getpid())"],
+                              capture_output=True, text=True, check=True)
+    dead_pid = int(finished.stdout)
+
+    live = RequestWorkspace(1, root=tmp, reaper=RecordingReaper())
+    killed = os.path.join(tmp, f"request_2_{dead_pid}_0123abcd")
+    old_unowned = os.path.join(tmp, "request_3_89abcdef")
+    new_unowned = os.path.join(tmp, "request_4_fedcba98")
+    unrelated = os.path.join(tmp, "notes")
+    for path in (killed, old_unowned, new_unowned, unrelated):
+        os.makedirs(os.path.join(path, "input"))
+    an_hour_ago = time.time() - 3600
+    os.utime(old_unowned, (an_hour_ago, an_hour_ago))
+
+    reaper = WorkspaceReaper()
+    assert reaper.sweep(tmp, max_age=600) == 2
+    reaper.drain()
+    assert sorted(os.listdir(tmp)) == sorted([TRASH_DIR_NAME, os.path.basename(live.path),
+                                              os.path.basename(new_unowned), "notes"]), os.listdir(tmp)
+    assert os.listdir(os.path.join(tmp, TRASH_DIR_NAME)) == []
+    print("✅ Workspaces of killed workers swept at startup; live ones kept.")
+
+
+def verify_workspace_error_releases_request():
+    """A workspace that cannot be created still ends the request as Failed rather than leaving it Processing."""
+    import main
+
+    statuses = []
+
+    class RecordingBatch:
+        def __init__(self, *args, **kwargs):
+            pass
+
+        def flush(self, final_status):
+            statuses.append(final_status)
+            return True
+
+    def no_space(upload_id):
+        raise OSError(28, "No space left on device")
+
+    main.RequestWorkspace = no_space
+    main.CensusResultBatch = RecordingBatch
+    main.heartbeat_census_upload = lambda *args: True
+    assert main.process_census_request({"id": 11, "portals": "[]"}) == "Failed"
+    assert statuses == ["Failed"], statuses
+    print("✅ Workspace errors release the request as Failed.")
+
+
+def verify_unreadable_upload_fails_request(tmp):
+    """An upload the DB cannot hand over fails every portal with that reason instead of a parse error."""
+    import main
+
+    failed = {}
+    statuses = []
+
+    class RecordingBatch:
+        def __init__(self, *args, **kwargs):
+            pass
+
+        def add_failed(self, portal, reason):
+            failed[portal] = reason
+
+        def flush(self, final_status):
+            statuses.append(final_status)
+            return True
+
+    main.RequestWorkspace = lambda upload_id: RequestWorkspace(upload_id, root=tmp, reaper=RecordingReaper())
+    main.CensusResultBatch = RecordingBatch
+    main.heartbeat_census_upload = lambda *args: True
+    main.save_census_upload_to_file = lambda upload_id, output_path: False
+    assert main.process_census_request({"id": 12, "portals": '["NLG", "GIG"]'}) == "Failed"
+    assert statuses == ["Failed"]
+    assert failed == {portal: "Census file could not be read from the database" for portal in ("NLG", "GIG")}, failed
+    print("✅ Unreadable uploads fail with a specific reason.")
+
+
+if __name__ == "__main__":
+    with tempfile.TemporaryDirectory() as tmp:
+        verify_detach(tmp)
+    with tempfile.TemporaryDirectory() as tmp:
+        verify_reaper(tmp)
+    with tempfile.TemporaryDirectory() as tmp:
+        verify_stale_workspaces(tmp)
+    verify_workspace_error_releases_request()
+    with tempfile.TemporaryDirectory() as tmp:
+        verify_unreadable_upload_fails_request(tmp)
@@ -0,0 +1,86 @@
+import os
+import sys
+import tempfile
+
+import openpyxl
+
+# Ensure src can be imported
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from src.services.excel_service.template_cache import TemplateCache
+
+
+def make_template(path, title, rows=1):
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws.title = title
+    for row in range(1, rows + 1):
+        ws.cell(row=row, column=1).value = f"header {row}"
+    wb.save(path)
+
+
+def verify_copies_are_independent(tmp):
+    """Callers get fresh workbooks: one request's writes never show up in the next copy."""
+    path = os.path.join(tmp, "template.xlsx")
+    make_template(path, "loader")
+    cache = TemplateCache(max_bytes=10 * 1024 * 1024)
+
+    first = cache.load_workbook(path)
+    first["loader"]["B2"].value = "request 1"
+    second = cache.load_workbook(path)
+    assert second["loader"]["B2"].value is None
+    assert second["loader"]["A1"].value == "header 1"
+    assert (cache.hits, cache.misses) == (1, 1)
+    print("✅ Cached templates hand out independent copies.")
+
+
+def verify_invalidation(tmp):
+    """A changed file is re-parsed; a touched file with the same content is not."""
+    path = os.path.join(tmp, "changing.xlsx")
+    make_template(path, "v1")
+    cache = TemplateCache(max_bytes=10 * 1024 * 1024)
+    assert cache.load_workbook(path).sheetnames == ["v1"]
+
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10_000_000))
+    assert cache.load_workbook(path).sheetnames == ["v1"]
+    assert cache.misses == 1
+
+    make_template(path, "v2")
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 20_000_000))
+    assert cache.load_workbook(path).sheetnames == ["v2"]
+    assert cache.misses == 2
+    print("✅ Templates are reloaded only when their content changes.")
+
+
+def verify_eviction(tmp):
+    """Least recently used snapshots are dropped once the memory cap is exceeded."""
+    paths = []
+    for name in ("a", "b", "c"):
+        path = os.path.join(tmp, f"{name}.xlsx")
+        make_template(path, name, rows=200)
+        paths.append(path)
+
+    probe = TemplateCache(max_bytes=10 * 1024 * 1024)
+    probe.load_workbook(paths[0])
+    one_snapshot = probe.size_bytes
+
+    cache = TemplateCache(max_bytes=int(one_snapshot * 2.5))
+    cache.load_workbook(paths[0])
+    cache.load_workbook(paths[1])
+    cache.load_workbook(paths[0])  # a is now more recent than b
+    cache.load_workbook(paths[2])  # evicts b
+    assert cache.size_bytes <= cache.max_bytes
+    misses = cache.misses
+    cache.load_workbook(paths[0])
+    assert cache.misses == misses
+    cache.load_workbook(paths[1])
+    assert cache.misses == misses + 1
+    print("✅ Cache memory stays under its cap.")
+
+
+if __name__ == "__main__":
+    with tempfile.TemporaryDirectory() as tmp:
+        verify_copies_are_independent(tmp)
+        verify_invalidation(tmp)
+        verify_eviction(tmp)
@@ -0,0 +1,125 @@
+import io
+import os
+import re
+import sys
+import tempfile
+import zipfile
+from datetime import datetime
+
+import openpyxl
+from openpyxl.styles import Font
+
+# Ensure src can be imported
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from src.services.excel_service.template_patch import Block, TemplateSpec, compile_template, open_template
+
+
+def make_template(path):
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws.title = "loader"
+    ws["A1"], ws["B1"], ws["C1"] = "Name", "DOB", "Double"
+    ws["B2"].font = Font(bold=True)  # Styled template cell the values must not lose
+    for row in range(2, 5):
+        ws.cell(row=row, column=3).value = f"=A{row}*2"
+    ws["E1"] = "=COUNTA(A2:A100)"
+    other = wb.create_sheet("Lists")
+    other["A1"] = "kept as is"
+    wb.save(path)
+
+    # Turn C2:C4 into one shared formula, the way Excel saves filled-down formulas
+    with zipfile.ZipFile(path) as package:
+        parts = {info.filename: package.read(info) for info in package.infolist()}
+    sheet = parts["xl/worksheets/sheet1.xml"].decode("utf-8")
+    sheet = sheet.replace("<f>A2*2</f>", '<f t="shared" ref="C2:C4" si="0">A2*2</f>')
+    sheet = re.sub(r"<f>A[34]\*2</f>", '<f t="shared" si="0"/>', sheet)
+    parts["xl/worksheets/sheet1.xml"] = sheet.encode("utf-8")
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as package:
+        for name, data in parts.items():
+            package.writestr(name, data)
+
+
+SPEC = TemplateSpec("", "loader", {"members": Block(2, "A:B", {"B": "DD-MM-YY"}),
+                                   "doubles": Block(2, "C")})
+
+
+def verify_render(tmp):
+    """Values are spliced into the sheet; styles, formulas and the other parts of the package survive."""
+    path = os.path.join(tmp, "template.xlsx")
+    make_template(path)
+    spec = TemplateSpec(path, SPEC.sheet_name, SPEC.blocks)
+    output = io.BytesIO()
+    open_template(spec).render(output, {"members": [["Ali", datetime(1990, 5, 1)], ["Sara", "Invalid DOB"]]})
+
+    wb = openpyxl.load_workbook(io.BytesIO(output.getvalue()))
+    ws = wb["loader"]
+    assert [ws["A2"].value, ws["B2"].value, ws["A3"].value, ws["B3"].value] == ["Ali", datetime(1990, 5, 1), "Sara", "Invalid DOB"]
+    assert ws["B2"].font.bold and ws["B2"].number_format == "DD-MM-YY"
+    assert ws["B3"].number_format == "General"
+    assert [ws[f"C{row}"].value for row in range(2, 5)] == ["=A2*2", "=A3*2", "=A4*2"]
+    assert ws["E1"].value == "=COUNTA(A2:A100)"
+    assert wb["Lists"]["A1"].value == "kept as is"
+
+    with zipfile.ZipFile(path) as template, zipfile.ZipFile(io.BytesIO(output.getvalue())) as result:
+        for name in ("xl/worksheets/sheet2.xml", "xl/theme/theme1.xml"):
+            assert template.read(name) == result.read(name), name
+        assert 'fullCalcOnLoad="1"' in result.read("xl/workbook.xml").decode("utf-8")
+    print("✅ Template blocks are filled without touching the rest of the package.")
+
+
+def verify_shared_formula_master(tmp):
+    """Overwriting the cell that holds a shared formula turns the rest of the group into plain formulas."""
+    path = os.path.join(tmp, "shared.xlsx")
+    make_template(path)
+    output = io.BytesIO()
+    open_template(TemplateSpec(path, SPEC.sheet_name, SPEC.blocks)).render(output, {"doubles": [[7]]})
+
+    ws = openpyxl.load_workbook(io.BytesIO(output.getvalue()))["loader"]
+    assert [ws[f"C{row}"].value for row in range(2, 5)] == [7, "=A3*2", "=A4*2"]
+    print("✅ Shared formulas stay valid when their first cell is overwritten.")
+
+
+def verify_census_in_memory(tmp):
+    """.census() returns the rendered workbook as bytes and only writes a file when a directory is given."""
+    path = os.path.join(tmp, "template.xlsx")
+    make_template(path)
+    template = open_template(TemplateSpec(path, SPEC.sheet_name, SPEC.blocks))
+    blocks = {"members": [["Ali", datetime(1990, 5, 1)]]}
+
+    census = template.census("MemberUpload.xlsx", blocks)
+    rendered = io.BytesIO()
+    template.render(rendered, blocks)
+    assert census.filename == "MemberUpload.xlsx" and census.content == rendered.getvalue()
+    assert openpyxl.load_workbook(census.open())["loader"]["A2"].value == "Ali"
+    assert not os.path.exists(os.path.join(tmp, "debug"))
+
+    template.census("MemberUpload.xlsx", blocks, os.path.join(tmp, "debug"))
+    with open(os.path.join(tmp, "debug", "MemberUpload.xlsx"), "rb") as f:
+        assert f.read() == census.content
+    print("✅ Census output is built in memory; a file is written only for debugging.")
+
+
+def verify_errors(tmp):
+    """Missing templates and sheets fail the way openpyxl does, so mapper error handling is unchanged."""
+    path = os.path.join(tmp, "template.xlsx")
+    make_template(path)
+    try:
+        compile_template(path, "Census")
+        raise AssertionError("missing sheet accepted")
+    except KeyError:
+        pass
+    try:
+        open_template(TemplateSpec(os.path.join(tmp, "missing.xlsx"), "loader", {}))
+        raise AssertionError("missing template accepted")
+    except FileNotFoundError:
+        pass
+    print("✅ Missing templates and sheets raise FileNotFoundError / KeyError.")
+
+
+if __name__ == "__main__":
+    with tempfile.TemporaryDirectory() as tmp:
+        verify_render(tmp)
+        verify_shared_formula_master(tmp)
+        verify_census_in_memory(tmp)
+        verify_errors(tmp)
@@ -0,0 +1,56 @@
+import io
+import os
+import sys
+from datetime import date, datetime
+
+import numpy as np
+import openpyxl
+from openpyxl.styles import Font
+
+# Ensure src can be imported
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from src.services.excel_service.template_writer import write_columns, write_new_sheet, write_rows
+
+
+def verify_write_rows():
+    """Block writes keep template styles and apply column formats only to non-text values."""
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws.cell(row=2, column=2).font = Font(bold=True)  # Styled template cell
+
+    write_rows(ws, [["Ali", datetime(1990, 5, 1)], ["Sara", "Invalid DOB"]], start_row=2, start_column=2,
+               number_formats={3: "DD-MM-YY"})
+    assert ws["B2"].value == "Ali" and ws["B2"].font.bold
+    assert ws["C2"].number_format == "DD-MM-YY"
+    assert ws["C3"].value == "Invalid DOB" and ws["C3"].number_format == "General"
+
+    write_columns(ws, [["x", "y"], [1, 2]], start_row=10)
+    assert [[c.value for c in row] for row in ws["A10:B11"]] == [["x", 1], ["y", 2]]
+    print("✅ write_rows fills template blocks in place.")
+
+
+def verify_write_new_sheet():
+    """The streamed sheet reads back with the same values, types and formats openpyxl would produce."""
+    rows = [
+        [1, "Ali", date(1990, 5, 1), 4500.5, True, np.int64(7)],
+        [2, "  padded  ", datetime(2001, 2, 3, 4, 5, 6), float("nan"), None, "<&>"],
+        [3, "", None, "#N/A", "=1+1", "tab\x07bell"],
+    ]
+    buffer = io.BytesIO()
+    assert write_new_sheet(buffer, rows, header=["No", "Name", "DOB", "Salary", "Flag", "Other"],
+                           sheet_title="Members", number_formats={4: "#,##0.00"}) == 3
+
+    ws = openpyxl.load_workbook(io.BytesIO(buffer.getvalue()))["Members"]
+    assert ws["A1"].value == "No" and ws["A1"].font.bold and ws["A1"].border.left.style == "thin"
+    assert [c.value for c in ws[2]] == [1, "Ali", datetime(1990, 5, 1), 4500.5, True, 7]
+    assert ws["C2"].number_format == "YYYY-MM-DD" and ws["C3"].number_format == "YYYY-MM-DD HH:MM:SS"
+    assert ws["D2"].number_format == "#,##0.00"
+    assert [c.value for c in ws[3]] == [2, "  padded  ", datetime(2001, 2, 3, 4, 5, 6), None, None, "<&>"]
+    assert [c.value for c in ws[4]] == [3, None, None, "#N/A", "=1+1", "tabbell"]
+    print("✅ write_new_sheet streams a readable workbook.")
+
+
+if __name__ == "__main__":
+    verify_write_rows()
+    verify_write_new_sheet()